@@ -3,6 +3,7 @@ from langchain_openai import ChatOpenAI
 
 from agents.prompts import NATURAL_CLARIFICATION_PROMPT
 from agents.state import AgentState
+from services.plan_codec import hydrate_plan_output
 
 def get_natural_clarification_question(router_llm: ChatOpenAI, original_tool_name: str, missing_parameter_name: str) -> str:
     """Generates a more natural-sounding clarification question using an LLM."""
@@ -49,7 +50,8 @@ def prepare_response_payload(final_state: AgentState, final_ai_message_content:
             response_data_for_payload["message"] = final_ai_message_content
         elif final_tool_name_from_turn == 'plan_da_nang_trip':
             determined_intent = "plan_agent"
-            response_data_for_payload["plan_details"] = final_response_data_from_turn
+            # State keeps the compact plan; expand it (with descriptions) only for the API response.
+            response_data_for_payload["plan_details"] = hydrate_plan_output(final_response_data_from_turn)
             
             planner_message_str = None
             if isinstance(final_response_data_from_turn, dict):
@@ -95,9 +97,9 @@ def prepare_response_payload(final_state: AgentState, final_ai_message_content:
             elif final_tool_name_from_turn == "retrieved_available_flights" and persistent_information.get('available_flights'):
                 response_data_for_payload["flights"] = persistent_information['available_flights']
             elif final_tool_name_from_turn == "retrieved_plan" and persistent_information.get('current_trip_plan'):
-                response_data_for_payload["plan_details"] = persistent_information['current_trip_plan']
+                response_data_for_payload["plan_details"] = hydrate_plan_output(persistent_information['current_trip_plan'])
             elif final_tool_name_from_turn == "retrieved_generic_info":
-                response_data_for_payload["stored_information"] = persistent_information
+                response_data_for_payload["stored_information"] = {**persistent_information, "current_trip_plan": hydrate_plan_output(persistent_information.get('current_trip_plan'))}
         elif final_graph_message_obj and isinstance(final_graph_message_obj, AIMessage) and \
              hasattr(final_graph_message_obj, 'tool_calls') and \
              final_graph_message_obj.tool_calls and \
@@ -4,7 +4,7 @@ from dotenv import load_dotenv
 from langsmith import traceable
 from langgraph.graph import StateGraph, END
 from langgraph.checkpoint.mongodb import MongoDBSaver
-from pymongo import MongoClient
+from database.connect import client as shared_mongo_client
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import AnyMessage, SystemMessage, HumanMessage, ToolMessage, AIMessage
 from langchain_community.tools.tavily_search import TavilySearchResults
@@ -13,7 +13,8 @@ from agents.tools import plan_da_nang_trip_tool, show_flights_tool, RequestClari
 from agents.progress_manager import progress_manager
 import json
 import logging
-from services.flight_selection import select_flight_for_booking
+from services.flight_selection import select_flight_for_booking, build_flight_index
+from services.plan_codec import summarize_plan_output
 from .history_manager import summarize_conversation_history, prune_conversation_history
 from langchain.tools import StructuredTool
 from .prompts import (
@@ -93,9 +94,9 @@ class Agent:
         mongodb_uri = os.getenv("MONGODB_URI")
         if not mongodb_uri:
             raise ValueError("MONGODB_URI environment variable not set.")
-        mongo_client = MongoClient(mongodb_uri)
+        # Reuse the application-wide pooled client instead of opening a second pool
         memory = MongoDBSaver(
-            client=mongo_client,
+            client=shared_mongo_client,
             db_name="dntrip",
             collection_name="langgraph_checkpoints"
         )
@@ -662,7 +663,8 @@ class Agent:
                             selection_result = select_flight_for_booking(
                                 available_flights=available_flights,
                                 selection_type=selection_type,
-                                selection_value=selection_value
+                                selection_value=selection_value,
+                                flight_index=current_information.get('available_flights_index')
                             )
                             print(f"Result from select_flight_for_booking: {selection_result}")
 
@@ -709,7 +711,8 @@ class Agent:
                             current_plan_from_state = current_information.get('current_trip_plan')
                             if current_plan_from_state and isinstance(current_plan_from_state, dict):
                                 try:
-                                    tool_args['existing_plan_json'] = json.dumps(current_plan_from_state)
+                                    # The stored plan is already compact; the tool hydrates it itself.
+                                    tool_args['existing_plan_json'] = json.dumps(current_plan_from_state, separators=(",", ":"), ensure_ascii=False)
                                     print(f"Successfully serialized and injected existing plan from state into tool_args. Length: {len(tool_args['existing_plan_json'])}")
                                 except Exception as e:
                                     print(f"Error serializing current_trip_plan from state: {e}. Setting existing_plan_json to None.")
@@ -723,6 +726,12 @@ class Agent:
                             tool_args.pop('user_intention', None)
                         
                         print(f"Planner logic complete. Final tool_args keys for tool call: {list(tool_args.keys())}")
+
+                    if tool_name == self.flight_tool.name and isinstance(tool_args, dict) and tool_args.get('cursor'):
+                        # The LLM asks for 'next'; the real keyset cursor of the last search lives in state.
+                        tool_args['cursor'] = current_information.get('flight_search_next_cursor')
+                        if not tool_args['cursor']:
+                            tool_args.pop('cursor')
                     
                     if isinstance(tool_args, dict):
                         raw_result = tool_to_use.invoke(tool_args)
@@ -737,39 +746,61 @@ class Agent:
                                 if flight_list:
                                     print(f"Storing {len(flight_list)} flights in state['information']['available_flights']")
                                     current_information['available_flights'] = flight_list
+                                    current_information['available_flights_index'] = build_flight_index(flight_list)
+                                    current_information['flight_search_next_cursor'] = parsed_data.get('next_cursor')
                                     origin = tool_args.get('origin_city', 'your specified origin')
                                     date = tool_args.get('date_str', 'the specified date')
-                                    result_content_for_message = f"I found {len(flight_list)} flights for you from {origin} to Da Nang on {date}. Which one would you like to select?"
+                                    if parsed_data.get('date_range'):
+                                        date_range = parsed_data['date_range']
+                                        cheapest_per_date = "; ".join(
+                                            f"{entry['date']}: {entry['cheapest']['price']} ({entry['cheapest']['flight_id']}, {entry['cheapest']['departure_time']})"
+                                            for entry in parsed_data.get('dates', []) if entry.get('cheapest')
+                                        )
+                                        result_content_for_message = f"I found {len(flight_list)} flights for you from {origin} to Da Nang between {date_range['start']} and {date_range['end']}. Cheapest per date: {cheapest_per_date}. Which one would you like to select?"
+                                    else:
+                                        result_content_for_message = f"I found {len(flight_list)} flights for you from {origin} to Da Nang on {date}. Which one would you like to select?"
+                                    if parsed_data.get('next_cursor'):
+                                        result_content_for_message += " More flights are available if you'd like to see them."
                                     current_information['flight_search_completed_awaiting_selection'] = True
                                     current_final_data = result_content_for_message
                                     current_final_tool_name = "flights_found_summary"
                                 else:
                                     result_content_for_message = parsed_data.get('message', "No flights found matching your criteria.")
                                     current_information.pop('available_flights', None)
+                                    current_information.pop('available_flights_index', None)
+                                    current_information.pop('flight_search_next_cursor', None)
                                     current_information['flight_search_completed_awaiting_selection'] = False
                                     current_final_data = result_content_for_message
                                     current_final_tool_name = "flights_not_found_summary"
                             elif isinstance(parsed_data, dict) and ('error' in parsed_data or 'message' in parsed_data):
                                 result_content_for_message = parsed_data.get('error') or parsed_data.get('message')
                                 current_information.pop('available_flights', None)
+                                current_information.pop('available_flights_index', None)
+                                current_information.pop('flight_search_next_cursor', None)
                                 current_information['flight_search_completed_awaiting_selection'] = False
                                 current_final_data = result_content_for_message
                                 current_final_tool_name = "flights_tool_error_or_message"
                             else:
                                 result_content_for_message = "Received an unexpected format for flight data. I couldn't process it."
                                 current_information.pop('available_flights', None)
+                                current_information.pop('available_flights_index', None)
+                                current_information.pop('flight_search_next_cursor', None)
                                 current_information['flight_search_completed_awaiting_selection'] = False
                                 current_final_data = result_content_for_message
                                 current_final_tool_name = "flights_tool_format_error"
                         except json.JSONDecodeError:
                             result_content_for_message = f"The flight information service returned data in an unexpected format (not JSON): {raw_result[:100]}"
                             current_information.pop('available_flights', None)
+                            current_information.pop('available_flights_index', None)
+                            current_information.pop('flight_search_next_cursor', None)
                             current_information['flight_search_completed_awaiting_selection'] = False
                             current_final_data = result_content_for_message
                             current_final_tool_name = "flights_tool_format_error"
                         except Exception as format_err:
                              result_content_for_message = f"An error occurred while processing flight data: {format_err}"
                              current_information.pop('available_flights', None)
+                             current_information.pop('available_flights_index', None)
+                             current_information.pop('flight_search_next_cursor', None)
                              current_information['flight_search_completed_awaiting_selection'] = False
                              current_final_data = result_content_for_message
                              current_final_tool_name = "flights_tool_processing_error"
@@ -782,7 +813,8 @@ class Agent:
                                 current_final_data = parsed_data 
                                 current_final_tool_name = tool_name
                                 current_information['current_trip_plan'] = parsed_data
-                                result_content_for_message = raw_result 
+                                # The LLM gets a short text summary; descriptions are hydrated only at the API edge.
+                                result_content_for_message = summarize_plan_output(parsed_data)
                             elif isinstance(parsed_data, dict) and ('error' in parsed_data or 'message' in parsed_data):
                                 result_content_for_message = parsed_data.get('error') or parsed_data.get('message')
                                 current_final_data = None 
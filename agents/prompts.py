@@ -34,6 +34,8 @@ If the user asks about flights (e.g., 'show me flights to Da Nang on date', 'fin
 - If user's query have both origin city and date, you can directly use the 'show_flight' tool.
 - If EITHER the origin city OR the date is missing or unclear from the user's query, you MUST use the 'request_clarification_tool' to ask for the missing information (e.g., 'missing_parameter_name': 'flight_origin_city' or 'missing_parameter_name': 'flight_date'). Do NOT guess or assume these values.
 - Once you have both origin and date, use the 'show_flight' tool. This tool will find available flights and they will be stored internally for selection.
+- Pass the user's preferences straight to the tool instead of filtering results yourself: 'max_price' for a budget, 'time_of_day' or 'departure_after'/'departure_before' for departure times, 'airlines' for carriers, and 'sort_by' ('price' or 'departure_time'). For "the cheapest flight" use sort_by='price' with page_size=1. If the user wants to see more flights than were shown, call the tool again with the same arguments and cursor='next'.
+- For several days ("this weekend", "the next 3 days", "between May 10 and 12") make ONE 'show_flight' call with date_str as the first day and end_date_str as the last day instead of one call per date.
 - After the 'show_flight' tool successfully finds and stores flights (you will know this from the ToolMessage content like "I found X flights..."), your direct response to the user should ONLY be that confirmation message from the tool (e.g., "I found X flights for you from [Origin] on [Date]. Which one would you like to select?"). DO NOT list the flight details yourself at this stage. Then, WAIT for the user to make a selection.
 
 If the user is looking for specific places, restaurants, or hotels (e.g., 'find top 5 restaurants in Da Nang', 'best hotels near the beach', 'restaurants in Hai Chau district'):
@@ -250,6 +252,8 @@ If the user asks about flights (e.g., 'show me flights to Da Nang on date', 'fin
 - If user's query have both origin city and date, you can directly use the 'show_flight' tool.
 - If EITHER the origin city OR the date is missing or unclear from the user's query, you MUST use the 'request_clarification_tool' to ask for the missing information (e.g., 'missing_parameter_name': 'flight_origin_city' or 'missing_parameter_name': 'flight_date'). Do NOT guess or assume these values.
 - Once you have both origin and date, use the 'show_flight' tool. This tool will find available flights and they will be stored internally for selection.
+- Pass the user's preferences straight to the tool instead of filtering results yourself: 'max_price' for a budget, 'time_of_day' or 'departure_after'/'departure_before' for departure times, 'airlines' for carriers, and 'sort_by' ('price' or 'departure_time'). For "the cheapest flight" use sort_by='price' with page_size=1. If the user wants to see more flights than were shown, call the tool again with the same arguments and cursor='next'.
+- For several days ("this weekend", "the next 3 days", "between May 10 and 12") make ONE 'show_flight' call with date_str as the first day and end_date_str as the last day instead of one call per date.
 - After the 'show_flight' tool successfully finds and stores flights (you will know this from the ToolMessage content like "I found X flights..."), your direct response to the user should ONLY be that confirmation message from the tool (e.g., "I found X flights for you from [Origin] on [Date]. Which one would you like to select?"). DO NOT list the flight details yourself at this stage. Then, WAIT for the user to make a selection.
 
 After flight options have been found by 'show_flight' and you have relayed the confirmation message to the user, if the user then indicates a choice (e.g., "the first one", "book flight X", "the one at 9pm"), you MUST use the 'select_flight_tool'.
@@ -1,7 +1,8 @@
 # tools.py
 from langchain_core.tools import tool, StructuredTool
 from pydantic import BaseModel, Field
-from services.tsp_algorithm import optimize_distance_tour
+from services.tsp_algorithm import plan_best_itinerary, PLANNER_NUM_CANDIDATES
+from services.plan_codec import encode_plan_output, hydrate_plan_output
 from services.flight_picking import get_flights as get_flights_service # Renamed import
 from services.retriever_service import RetrieverService  
 from langchain_openai import ChatOpenAI  
@@ -22,9 +23,10 @@ class TravelPlanArgs(BaseModel):
     user_intention: str = Field(default="create", description="User's intent: 'create' for a new plan, 'modify' to adjust an existing plan. If 'modify', the agent system uses this to load the existing plan from memory. Defaults to 'create'.")
     user_specified_stops: Optional[List[SpecificStop]] = Field(default=None, description="Optional list of specific stops. If user_intention is 'modify', this list should ONLY contain the specific changes (additions/replacements) the user is requesting for the existing plan. If 'create', these are initial stops for a new plan. Each stop: name, day, time_of_day, optional address.")
     existing_plan_json: Optional[str] = Field(default=None, description="Optional JSON string of a complete plan. If user_intention is 'modify', the agent system populates this from memory; the LLM should NOT provide it. If user_intention is 'create' and this is provided, it acts as a base for a new plan (e.g., if user provides an old plan text).")
+    seed: Optional[int] = Field(default=None, description="Optional. The 'seed' of a previously generated plan, to regenerate exactly the same itinerary. Leave empty for a fresh plan.")
 
 @tool("plan_da_nang_trip", args_schema=TravelPlanArgs)
-def plan_da_nang_trip_tool(travel_duration: str, user_intention: str = "create", user_specified_stops: Optional[List[SpecificStop]] = None, existing_plan_json: Optional[str] = None) -> str:
+def plan_da_nang_trip_tool(travel_duration: str, user_intention: str = "create", user_specified_stops: Optional[List[SpecificStop]] = None, existing_plan_json: Optional[str] = None, seed: Optional[int] = None) -> str:
     """
     Plans or modifies a travel itinerary for Da Nang.
     Behavior depends on 'user_intention' and the presence of 'existing_plan_json'.
@@ -36,11 +38,13 @@ def plan_da_nang_trip_tool(travel_duration: str, user_intention: str = "create",
     - If 'existing_plan_json' IS provided (e.g. user pasted an old plan): It uses that as a base for a new plan, incorporating 'user_specified_stops'.
     - If 'existing_plan_json' is NOT provided: A brand new plan is generated based on 'travel_duration' and any 'user_specified_stops'.
 
-    The response is a JSON string with 'base_plan', 'user_specified_stops' (from current call), and 'notes'.
+    The response is a compact JSON string (see services.plan_codec) with 'base_plan', 'places',
+    'user_specified_stops' (from current call), and 'notes'. 'existing_plan_json' may be compact or full.
     """
     print(f"--- Calling Planner Tool ---")
     print(f"  Travel Duration: {travel_duration}")
     print(f"  User Intention: {user_intention}") # Log the intention
+    print(f"  Seed: {seed}")
     if user_specified_stops:
         print(f"  User Specified Stops ({len(user_specified_stops)}):")
         for stop_idx, stop_obj in enumerate(user_specified_stops):
@@ -68,7 +72,7 @@ def plan_da_nang_trip_tool(travel_duration: str, user_intention: str = "create",
 
     if existing_plan_json:
         try:
-            existing_plan_data = json.loads(existing_plan_json)
+            existing_plan_data = hydrate_plan_output(json.loads(existing_plan_json))
             if isinstance(existing_plan_data, dict):
                 parsed_existing_base_plan = existing_plan_data.get('base_plan')
                 # previous_user_specified_stops_from_existing_plan = existing_plan_data.get('user_specified_stops', []) # If needed later
@@ -98,10 +102,13 @@ def plan_da_nang_trip_tool(travel_duration: str, user_intention: str = "create",
     try:
         # Pass the parsed_existing_base_plan and the current user_specified_stops (as deltas/overrides)
         # to the optimizer. The optimizer will handle merging/preserving.
-        optimizer_result = optimize_distance_tour(
+        # A given seed regenerates that exact plan; otherwise the best of several seeded candidates is returned.
+        optimizer_result = plan_best_itinerary(
             travel_duration_str=travel_duration,
             user_specified_stops_for_modification=serialized_current_user_stops, # These are the new/changed stops
-            previous_base_plan_data=parsed_existing_base_plan     # This is the plan to preserve/modify
+            previous_base_plan_data=parsed_existing_base_plan,     # This is the plan to preserve/modify
+            seed=seed,
+            num_candidates=1 if seed is not None else PLANNER_NUM_CANDIDATES
         )
         
         # The optimizer_result is now a dict like {"plan": ..., "message": ...}
@@ -133,7 +140,7 @@ def plan_da_nang_trip_tool(travel_duration: str, user_intention: str = "create",
                     note += f" (Address provided: '{stop_obj.address}')"
                 output["notes"].append(note)
         
-        return json.dumps(output, indent=2, ensure_ascii=False)
+        return json.dumps(encode_plan_output(output), separators=(",", ":"), ensure_ascii=False)
 
     except Exception as e:
         print(f"Error during trip planning: {e}")
@@ -151,22 +158,40 @@ def plan_da_nang_trip_tool(travel_duration: str, user_intention: str = "create",
 # --- Flight Booking Tool ---
 class FlightSearchArgs(BaseModel):
     origin_city: str = Field(description="The departure city name (e.g., 'Hanoi', 'Ho Chi Minh City').")
-    date_str: str = Field(description="The desired departure date. Accepts formats like 'DD/MM/YYYY', 'Month DD, YYYY' (e.g., '19/04/2025', 'April 19, 2025'), or 'Month DD' (e.g., 'May 12'). If the year is omitted from 'Month DD', it will be interpreted for the year 2025, as flight data is specific to this year.")
+    date_str: str = Field(description="The desired departure date. Accepts formats like 'DD/MM/YYYY', 'Month DD, YYYY' (e.g., '19/04/2025', 'April 19, 2025'), or 'Month DD' (e.g., 'May 12'), as well as relative dates like 'tomorrow' or 'next Friday'. If the year is omitted from 'Month DD', it will be interpreted for the year 2025, as flight data is specific to this year.")
     # destination_city: str = Field(description="The destination city name (Optional, currently not used for filtering).", default=None) # Add if filtering becomes possible
+    max_price: Optional[float] = Field(default=None, description="Optional. Maximum ticket price in USD, e.g. 50 for 'under $50'.")
+    time_of_day: Optional[str] = Field(default=None, description="Optional. Departure window: 'early_morning' (before 6am), 'morning' (6am-12pm), 'afternoon' (12pm-6pm) or 'evening' (after 6pm).")
+    departure_after: Optional[str] = Field(default=None, description="Optional. Earliest departure time, e.g. '7:00 am'.")
+    departure_before: Optional[str] = Field(default=None, description="Optional. Latest departure time (exclusive), e.g. '11:00 am'.")
+    airlines: Optional[List[str]] = Field(default=None, description="Optional. Only these airlines, e.g. ['VietJet Air'] or ['Bamboo'].")
+    sort_by: str = Field(default="price", description="Order of results: 'price' (cheapest first, default) or 'departure_time' (earliest first). For 'the cheapest flight' keep 'price' and set page_size=1.")
+    page_size: int = Field(default=20, description="Number of flights to return (1-50).")
+    cursor: Optional[str] = Field(default=None, description="Optional. Use 'next' to get the next page of the previous search's results (same other arguments).")
+    end_date_str: Optional[str] = Field(default=None, description="Optional. Last departure date (inclusive) to search several days at once, e.g. date_str='May 10', end_date_str='May 12' for 'this weekend' or 'the next 3 days'. At most 7 days. Results are grouped by date with the cheapest flight of each date.")
 
 @tool("show_flights", args_schema=FlightSearchArgs)
-def show_flights_tool(origin_city: str, date_str: str) -> str:
+def show_flights_tool(origin_city: str, date_str: str, max_price: Optional[float] = None, time_of_day: Optional[str] = None,
+                      departure_after: Optional[str] = None, departure_before: Optional[str] = None,
+                      airlines: Optional[List[str]] = None, sort_by: str = "price", page_size: int = 20,
+                      cursor: Optional[str] = None, end_date_str: Optional[str] = None) -> str:
     """
     Searches for available flights to Da Nang (DAD) from specified Vietnamese origin cities (Hanoi - HAN, Ho Chi Minh City - SGN)
     for tomorrow and the day after tomorrow in the year 2025.
     Requires the origin city and the departure date.
     It will inform the user if data for other cities or dates is not available.
+    Results can be filtered by maximum price, departure window and airline, sorted by price or departure
+    time, and paged. Several consecutive dates can be searched in one call with end_date_str.
     Returns flight details as a JSON string, or an error/message string.
     """
-    print(f"--- Calling Flight Tool with origin: {origin_city}, date: {date_str} ---")
+    print(f"--- Calling Flight Tool with origin: {origin_city}, date: {date_str}, max_price: {max_price}, time_of_day: {time_of_day}, airlines: {airlines}, sort_by: {sort_by} ---")
     try:
         # Call the flight picking service function
-        flights_result = get_flights_service(origin_city=origin_city, date_str=date_str)
+        flights_result = get_flights_service(
+            origin_city=origin_city, date_str=date_str, max_price=max_price, time_of_day=time_of_day,
+            departure_after=departure_after, departure_before=departure_before, airlines=airlines,
+            sort_by=sort_by, page_size=page_size, cursor=cursor, end_date_str=end_date_str,
+        )
         
         # The service function already returns a dictionary, which can be directly converted to JSON string.
         # It handles errors by returning a dict with an 'error' or 'message' key.
@@ -187,7 +212,7 @@ class RequestClarificationArgs(BaseModel):
 
 # --- Flight Selection Tool ---
 class SelectFlightArgs(BaseModel):
-    selection_type: str = Field(description="The method user wants to select the flight. Can be 'ordinal' (e.g., 'first', '2nd', '3'), 'flight_id' (e.g., 'VietJet Air 1634'), or 'departure_time' (e.g., '9:05 pm', '5am').")
+    selection_type: str = Field(description="The method user wants to select the flight. Can be 'ordinal' (e.g., 'first', '2nd', '3'), 'flight_id' (e.g., 'VietJet Air 1634', 'VJ 1634' or just '1634'), or 'departure_time' (e.g., '9:05 pm', '5am').")
     selection_value: str = Field(description="The specific value corresponding to the selection_type. For 'ordinal', the number or word. For 'flight_id', the flight identifier. For 'departure_time', the time string.")
     # available_flights will be passed by the agent from its state, not directly by the LLM.
 
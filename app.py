@@ -13,12 +13,12 @@ from agents.progress_manager import progress_manager
 from database.user import Users
 from database.conversation import Conversations
 from database.content import Contents
+from database.connect import get_pool_stats
+from database.flight import ensure_flight_indexes
+from services.flight_cache import flight_cache, FLIGHT_SCRAPER_SCHEDULE_TIME
+from services.job_runner import job_runner
 from datetime import timedelta
-import subprocess
 import sys
-import threading
-import schedule
-import time
 
 from flask_jwt_extended import (
     JWTManager,
@@ -42,36 +42,88 @@ llm_agent = LLMAgent()
 
 travel_planner_instance = Agent()
 
-scheduler_running = False
+ensure_flight_indexes() # Idempotent; makes sure flight lookups are index-backed
 
-def run_flight_scraper():
-    """Run the flight scraper script"""
-    try:
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        script_path = os.path.join(current_dir, 'scrapper', 'flight_kayak_final.py')
-        subprocess.run([sys.executable, script_path], cwd=current_dir)
-        print(f"✅ Flight scraper completed at {time.strftime('%H:%M:%S')}")
-    except Exception as e:
-        print(f"❌ Error running flight scraper: {str(e)}")
+FLIGHT_SCRAPER_TIMEOUT_SECONDS = int(os.getenv("FLIGHT_SCRAPER_TIMEOUT_SECONDS", 3 * 60 * 60))
+
+# Scrapers run as subprocesses of the job runner's dispatcher thread, one run per job type at a time
+job_runner.register(
+    "flight_scraper",
+    [sys.executable, os.path.join("scrapper", "flight_kayak_final.py")],
+    timeout_seconds=FLIGHT_SCRAPER_TIMEOUT_SECONDS,
+    # The scraper also invalidates; this covers runs that failed or were cancelled before writing
+    on_finish=lambda job: flight_cache.invalidate(),
+)
+job_runner.start()
 
 def setup_scheduler():
-    """Set up daily midnight scheduler"""
-    global scheduler_running
-    if not scheduler_running:
-        schedule.every().day.at("00:40").do(run_flight_scraper)
-        scheduler_running = True
-        threading.Thread(target=lambda: [schedule.run_pending() or time.sleep(60) for _ in iter(int, 1)], daemon=True).start()
-        print("✅ Flight scraper scheduled for daily midnight runs")
+    """Queue the flight scraper every day at FLIGHT_SCRAPER_SCHEDULE_TIME"""
+    job_runner.schedule_daily("flight_scraper", FLIGHT_SCRAPER_SCHEDULE_TIME)
+    print(f"✅ Flight scraper scheduled for daily runs at {FLIGHT_SCRAPER_SCHEDULE_TIME}")
 
 @app.route('/api/cron/run-now', methods=['POST'])
+@jwt_required()
 def run_now():
-    """Manually trigger flight scraper"""
+    """Manually trigger flight scraper (kept for existing clients; same as POST /api/jobs with type flight_scraper, JWT required)"""
     try:
-        threading.Thread(target=run_flight_scraper, daemon=True).start()
-        return jsonify({"message": "Flight scraper started", "status": "success"}), 200
+        job, created = job_runner.submit("flight_scraper")
+        message = "Flight scraper queued" if created else f"Flight scraper already {job['status']}"
+        return jsonify({"message": message, "status": "success", "job": job}), 202 if created else 200
     except Exception as e:
         return jsonify({"error": str(e), "status": "error"}), 500
 
+# --- Job Endpoints ---
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    """Recent jobs, newest first. Optional query parameters: type, status, limit."""
+    try:
+        limit = int(request.args.get('limit', 50))
+    except ValueError:
+        return jsonify({"error": "'limit' must be an integer"}), 400
+    jobs = job_runner.list(job_type=request.args.get('type'), status=request.args.get('status'), limit=limit)
+    return jsonify({"jobs": jobs, "job_types": job_runner.job_types()}), 200
+
+@app.route('/api/jobs', methods=['POST'])
+@jwt_required()
+def create_job():
+    """Queue a job. Returns 202 with the new job, or 200 with the job of that type already queued or running."""
+    data = request.get_json(silent=True) or {}
+    job_type = data.get('type')
+    if not job_type:
+        return jsonify({"error": "Missing 'type' in request", "job_types": job_runner.job_types()}), 400
+    try:
+        job, created = job_runner.submit(job_type)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"job": job, "created": created}), 202 if created else 200
+
+@app.route('/api/jobs/stats', methods=['GET'])
+def job_stats():
+    """Job counts by status and per-type timings."""
+    return jsonify(job_runner.stats()), 200
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+@jwt_required()
+def get_job(job_id):
+    """Job status and timing, with the last lines of its log (log_lines, default 50). JWT required since the log is scraper output."""
+    try:
+        log_lines = int(request.args.get('log_lines', 50))
+    except ValueError:
+        return jsonify({"error": "'log_lines' must be an integer"}), 400
+    job = job_runner.get(job_id, log_lines=max(0, min(log_lines, 1000)))
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job), 200
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+@jwt_required()
+def cancel_job(job_id):
+    """Cancel a queued job, or stop a running one."""
+    job = job_runner.cancel(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job), 202 if job["status"] == "running" else 200
+
 
 @app.route("/")
 def index():
@@ -183,7 +235,10 @@ def health_check():
         "status": "OK", # Overall status of the Flask app itself
         "components": {
             "travel_planner": travel_app_status
-        }
+        },
+        "mongodb_pool": get_pool_stats(),
+        "flight_cache": flight_cache.stats(),
+        "jobs": job_runner.stats()
     })
 
 # --- SSE Progress Endpoint ---
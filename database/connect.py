@@ -1,10 +1,74 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, monitoring
 import os
+import threading
 from dotenv import load_dotenv
 load_dotenv()
 
 uri = os.getenv("MONGODB_URI")
 
-client = MongoClient(uri)
+# --- Pool tuning (shared by every request handler, the agent checkpointer and flight lookups) ---
+MONGODB_MAX_POOL_SIZE = int(os.getenv("MONGODB_MAX_POOL_SIZE", 50))
+MONGODB_MIN_POOL_SIZE = int(os.getenv("MONGODB_MIN_POOL_SIZE", 0))
+MONGODB_MAX_IDLE_TIME_MS = int(os.getenv("MONGODB_MAX_IDLE_TIME_MS", 300000))
+MONGODB_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", 5000))
+MONGODB_CONNECT_TIMEOUT_MS = int(os.getenv("MONGODB_CONNECT_TIMEOUT_MS", 5000))
+MONGODB_SOCKET_TIMEOUT_MS = int(os.getenv("MONGODB_SOCKET_TIMEOUT_MS", 20000))
+MONGODB_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGODB_WAIT_QUEUE_TIMEOUT_MS", 5000))
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """Counts connection pool events so pool usage can be reported (e.g. on /health)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {"connections_created": 0, "connections_closed": 0, "checked_out": 0,
+                          "checked_in": 0, "checkout_failed": 0, "pools_cleared": 0}
+
+    def _bump(self, counter):
+        with self._lock:
+            self._counters[counter] += 1
+
+    def pool_created(self, event): pass
+    def pool_ready(self, event): pass
+    def pool_closed(self, event): pass
+    def connection_check_out_started(self, event): pass
+    def connection_ready(self, event): pass
+
+    def pool_cleared(self, event): self._bump("pools_cleared")
+    def connection_created(self, event): self._bump("connections_created")
+    def connection_closed(self, event): self._bump("connections_closed")
+    def connection_checked_out(self, event): self._bump("checked_out")
+    def connection_checked_in(self, event): self._bump("checked_in")
+    def connection_check_out_failed(self, event): self._bump("checkout_failed")
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self._counters)
+        stats["open_connections"] = stats["connections_created"] - stats["connections_closed"]
+        stats["in_use"] = stats["checked_out"] - stats["checked_in"]
+        return stats
+
+
+pool_stats_listener = PoolStatsListener()
+
+client = MongoClient(
+    uri,
+    maxPoolSize=MONGODB_MAX_POOL_SIZE,
+    minPoolSize=MONGODB_MIN_POOL_SIZE,
+    maxIdleTimeMS=MONGODB_MAX_IDLE_TIME_MS,
+    serverSelectionTimeoutMS=MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+    connectTimeoutMS=MONGODB_CONNECT_TIMEOUT_MS,
+    socketTimeoutMS=MONGODB_SOCKET_TIMEOUT_MS,
+    waitQueueTimeoutMS=MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+    event_listeners=[pool_stats_listener],
+)
 
 database = client['dntrip']
+
+
+def get_pool_stats():
+    """Connection pool counters for the shared client plus its configured limits."""
+    stats = pool_stats_listener.snapshot()
+    stats["max_pool_size"] = MONGODB_MAX_POOL_SIZE
+    stats["min_pool_size"] = MONGODB_MIN_POOL_SIZE
+    return stats
@@ -0,0 +1,69 @@
+from database.connect import database
+from pymongo import ASCENDING
+from pymongo.errors import PyMongoError
+
+
+db = database['flight_data']
+
+# Lookups filter on origin + date; price as the third key keeps the index usable for cheapest-first scans.
+FLIGHT_INDEXES = [
+    {
+        "name": "departure_airport_code_1_search_date_1_price_1",
+        "keys": [("departure_airport_code", ASCENDING), ("search_date", ASCENDING), ("price", ASCENDING)],
+    },
+    # Filtered/sorted searches (services/flight_picking.py); _id is the keyset pagination tie-breaker.
+    {
+        "name": "departure_airport_code_1_search_date_1_price_minor_1__id_1",
+        "keys": [("departure_airport_code", ASCENDING), ("search_date", ASCENDING), ("price_minor", ASCENDING), ("_id", ASCENDING)],
+    },
+    {
+        "name": "departure_airport_code_1_search_date_1_departure_minutes_1__id_1",
+        "keys": [("departure_airport_code", ASCENDING), ("search_date", ASCENDING), ("departure_minutes", ASCENDING), ("_id", ASCENDING)],
+    },
+]
+
+# Plain inclusion projection: fields are returned as stored, with no per-document reshaping.
+FLIGHT_PROJECTION = {
+    "_id": 0,
+    "price": 1,
+    "date": 1,
+    "flight_id": 1,
+    "flight_time": 1,
+    "departure_airport": 1,
+    "departure_time": 1,
+    "arrival_airport": 1,
+    "arrival_time": 1,
+    "departure_airport_code": 1,
+    "arrival_airport_code": 1,
+    "search_date": 1,
+    "price_minor": 1,
+    "duration_minutes": 1,
+    "departure_minutes": 1,
+    "arrival_minutes": 1,
+    "departure_datetime": 1,
+    "arrival_datetime": 1,
+    "airline": 1,
+}
+
+
+def ensure_flight_indexes(collection=db):
+    """
+    Creates any FLIGHT_INDEXES missing from the flight collection. create_index is a no-op for
+    an identical existing index, so this is safe to call on every startup.
+    Returns the names of indexes that were created.
+    """
+    created = []
+    try:
+        existing = collection.index_information()
+        for index in FLIGHT_INDEXES:
+            if index["name"] in existing:
+                continue
+            collection.create_index(index["keys"], name=index["name"], background=True)
+            created.append(index["name"])
+        if created:
+            print(f"Created flight_data indexes: {created}")
+        else:
+            print("flight_data indexes already present.")
+    except PyMongoError as e:
+        print(f"Error ensuring flight_data indexes: {e}")
+    return created
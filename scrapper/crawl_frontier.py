@@ -0,0 +1,193 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+# Durable crawl state for the hotel crawlers: every discovered URL with its state, retry count and
+# content hash, plus which list pages are finished, in one SQLite file. A crawl that is interrupted
+# resumes from here instead of re-visiting list pages and re-scraping details.
+
+PENDING = "pending"
+IN_PROGRESS = "in_progress"
+DONE = "done"
+FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS urls (
+    url TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    listing_hash TEXT,
+    content_hash TEXT,
+    result_json TEXT,
+    discovered_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS urls_state ON urls (state, attempts);
+CREATE TABLE IF NOT EXISTS pages (
+    page_offset INTEGER PRIMARY KEY,
+    url_count INTEGER NOT NULL,
+    done_at REAL NOT NULL
+);
+"""
+
+
+def content_hash(data):
+    """Stable hash of a JSON-serialisable record (key order does not matter)."""
+    return hashlib.sha256(json.dumps(data, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class CrawlFrontier:
+    """
+    SQLite-backed frontier shared by the threads of one crawler process.
+
+    URL lifecycle: pending -> in_progress (claim) -> done (complete) or failed (fail). A failed URL is
+    claimed again until it has used max_attempts. URLs left in_progress by a crash are released back
+    to pending when the frontier is opened.
+    """
+
+    def __init__(self, path, max_attempts=3):
+        self.path = path
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock() # One connection, serialised; every write commits before the lock is released
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+        released = self.release_in_progress()
+        if released:
+            logging.info(f"Released {released} URL(s) left in progress by an interrupted crawl.")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # --- URLs ---
+
+    def add_url(self, url, listing_hash=None):
+        """
+        Records a discovered URL and returns its state.
+
+        A new URL is pending. A done URL whose listing_hash (a fingerprint of its list-page card)
+        changed since the last crawl is re-queued; an unchanged one stays done, so re-crawls skip it.
+        A URL seen without a fingerprint before just has it recorded.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT state, listing_hash FROM urls WHERE url = ?", (url,)).fetchone()
+            if row is None:
+                self._conn.execute(
+                    "INSERT INTO urls (url, state, listing_hash, discovered_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                    (url, PENDING, listing_hash, now, now))
+                return PENDING
+            if row["state"] == DONE and None not in (listing_hash, row["listing_hash"]) and row["listing_hash"] != listing_hash:
+                self._conn.execute(
+                    "UPDATE urls SET state = ?, attempts = 0, listing_hash = ?, updated_at = ? WHERE url = ?",
+                    (PENDING, listing_hash, now, url))
+                return PENDING
+            if listing_hash is not None and row["listing_hash"] is None:
+                self._conn.execute("UPDATE urls SET listing_hash = ? WHERE url = ?", (listing_hash, url))
+            return row["state"]
+
+    def claim(self):
+        """Moves the next pending (or retryable failed) URL to in_progress and returns it, or None when none is left."""
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT url FROM urls WHERE state = ? OR (state = ? AND attempts < ?) "
+                "ORDER BY state = ?, attempts, discovered_at LIMIT 1",
+                (PENDING, FAILED, self.max_attempts, FAILED)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE urls SET state = ?, updated_at = ? WHERE url = ?", (IN_PROGRESS, time.time(), row["url"]))
+            return row["url"]
+
+    def complete(self, url, result):
+        """Stores the scraped result as done. Returns True if its content differs from the previous crawl's."""
+        new_hash = content_hash(result)
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT content_hash FROM urls WHERE url = ?", (url,)).fetchone()
+            self._conn.execute(
+                "UPDATE urls SET state = ?, last_error = NULL, content_hash = ?, result_json = ?, updated_at = ? WHERE url = ?",
+                (DONE, new_hash, json.dumps(result, ensure_ascii=False), time.time(), url))
+        return row is None or row["content_hash"] != new_hash
+
+    def fail(self, url, error):
+        """Records a failed attempt. Returns True if the URL will be retried."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE urls SET state = ?, attempts = attempts + 1, last_error = ?, updated_at = ? WHERE url = ?",
+                (FAILED, str(error)[:500], time.time(), url))
+            attempts = self._conn.execute("SELECT attempts FROM urls WHERE url = ?", (url,)).fetchone()["attempts"]
+        return attempts < self.max_attempts
+
+    def release_in_progress(self):
+        with self._lock, self._conn:
+            return self._conn.execute("UPDATE urls SET state = ? WHERE state = ?", (PENDING, IN_PROGRESS)).rowcount
+
+    def import_results(self, results):
+        """Seeds done URLs from an existing results list (e.g. a JSON file written before the frontier existed)."""
+        now = time.time()
+        rows = [(r["url"], DONE, content_hash(r), json.dumps(r, ensure_ascii=False), now, now) for r in results if r.get("url")]
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO urls (url, state, content_hash, result_json, discovered_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                rows)
+            return self._conn.total_changes - before
+
+    def urls(self, state=None):
+        with self._lock:
+            if state is None:
+                rows = self._conn.execute("SELECT url FROM urls ORDER BY discovered_at").fetchall()
+            else:
+                rows = self._conn.execute("SELECT url FROM urls WHERE state = ? ORDER BY discovered_at", (state,)).fetchall()
+        return [row["url"] for row in rows]
+
+    def results(self):
+        """The latest scraped result of every URL that has one, in discovery order (re-queued URLs keep their last result)."""
+        with self._lock:
+            rows = self._conn.execute("SELECT result_json FROM urls WHERE result_json IS NOT NULL ORDER BY discovered_at").fetchall()
+        return [json.loads(row["result_json"]) for row in rows]
+
+    def remaining(self):
+        """How many URLs claim() can still hand out (pending plus retryable failures)."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM urls WHERE state = ? OR (state = ? AND attempts < ?)",
+                                      (PENDING, FAILED, self.max_attempts)).fetchone()[0]
+
+    def counts(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT state, COUNT(*) AS n FROM urls GROUP BY state").fetchall()
+        return {row["state"]: row["n"] for row in rows}
+
+    # --- List pages ---
+
+    def mark_page_done(self, page_offset, url_count):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO pages (page_offset, url_count, done_at) VALUES (?, ?, ?)",
+                               (page_offset, url_count, time.time()))
+
+    def next_page_offset(self, page_size):
+        """The first list-page offset (0, page_size, 2*page_size, ...) not yet marked done."""
+        with self._lock:
+            done = {row["page_offset"] for row in self._conn.execute("SELECT page_offset FROM pages")}
+        offset = 0
+        while offset in done:
+            offset += page_size
+        return offset
+
+    def urls_on_done_pages(self):
+        """How many URLs the finished list pages yielded, so a resumed collection knows how far it got."""
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(url_count), 0) FROM pages").fetchone()[0]
+
+    def reset_pages(self):
+        """Forgets finished list pages so a re-crawl walks the list again (URL states are kept)."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM pages")
@@ -0,0 +1,332 @@
+import json
+import logging
+import re
+import threading
+import time
+from html import unescape
+from html.parser import HTMLParser
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Fetch layer for the hotel and place scrapers: try a pooled plain-HTTP request and parse the data the
+# page already ships (schema.org JSON-LD, meta tags), and only fall back to a browser when that is not
+# enough. A detail page then costs one HTTP round trip and a parse instead of seconds of rendering.
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9,vi;q=0.8",
+}
+# Responses that mean "a browser is needed" rather than "the page does not exist"
+BLOCKED_STATUS_CODES = {401, 403, 429, 503}
+BLOCKED_MARKERS = ("captcha", "cf-challenge", "datadome", "px-captcha", "access denied", "enable javascript")
+
+HOTEL_TYPES = {"Hotel", "LodgingBusiness", "Resort", "BedAndBreakfast", "Hostel", "Motel", "Campground"}
+PLACE_TYPES = HOTEL_TYPES | {
+    "LocalBusiness", "Place", "TouristAttraction", "Restaurant", "FoodEstablishment", "CafeOrCoffeeShop", "BarOrPub",
+    "Bakery", "Store", "ShoppingCenter", "Museum", "Park", "Zoo", "Aquarium", "AmusementPark", "StadiumOrArena",
+    "Hospital", "Pharmacy", "LandmarksOrHistoricalBuildings",
+}
+
+
+class PageParser(HTMLParser):
+    """Collects JSON-LD blocks, meta tags, the <title> and the first <h1> of a page in one pass."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.json_ld = []
+        self.meta = {}
+        self.title = ""
+        self.h1 = ""
+        self._capture = None # 'json_ld' / 'title' / 'h1' while inside that element
+        self._buffer = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "script" and (attrs.get("type") or "").lower() == "application/ld+json":
+            self._start("json_ld")
+        elif tag == "meta":
+            key = attrs.get("property") or attrs.get("name") or attrs.get("itemprop")
+            if key and attrs.get("content") is not None and key.lower() not in self.meta:
+                self.meta[key.lower()] = attrs["content"].strip()
+        elif tag == "title" and not self.title:
+            self._start("title")
+        elif tag == "h1" and not self.h1:
+            self._start("h1")
+
+    def handle_endtag(self, tag):
+        if self._capture and tag == {"json_ld": "script"}.get(self._capture, self._capture):
+            text = "".join(self._buffer).strip()
+            if self._capture == "json_ld":
+                self.json_ld.append(text)
+            else:
+                setattr(self, self._capture, re.sub(r"\s+", " ", text))
+            self._capture = None
+
+    def handle_data(self, data):
+        if self._capture:
+            self._buffer.append(data)
+
+    def _start(self, capture):
+        self._capture = capture
+        self._buffer = []
+
+
+def parse_page(html):
+    parser = PageParser()
+    parser.feed(html or "")
+    parser.close()
+    return parser
+
+
+def json_ld_nodes(json_ld_blocks):
+    """All objects in the page's JSON-LD blocks, with @graph containers and top-level lists flattened."""
+    nodes = []
+    for block in json_ld_blocks:
+        try:
+            data = json.loads(block)
+        except ValueError:
+            # Some sites leave trailing commas or HTML comments in the block; skip it rather than guess
+            logging.debug("Skipping JSON-LD block that is not valid JSON.")
+            continue
+        stack = data if isinstance(data, list) else [data]
+        while stack:
+            node = stack.pop(0)
+            if not isinstance(node, dict):
+                continue
+            if isinstance(node.get("@graph"), list):
+                stack.extend(node["@graph"]) # The container itself only carries @context
+                continue
+            nodes.append(node)
+    return nodes
+
+
+def _types(node):
+    value = node.get("@type", [])
+    return set(value if isinstance(value, list) else [value])
+
+
+def find_node(nodes, types):
+    return next((node for node in nodes if _types(node) & types), None)
+
+
+def _text(value):
+    if isinstance(value, dict):
+        value = value.get("name")
+    return unescape(str(value)).strip() if value not in (None, "") else None
+
+
+def format_address(address):
+    """A schema.org address (string or PostalAddress) as one line."""
+    if isinstance(address, str):
+        return _text(address)
+    if not isinstance(address, dict):
+        return None
+    parts = [_text(address.get(key)) for key in ("streetAddress", "addressLocality", "addressRegion", "postalCode", "addressCountry")]
+    return ", ".join(part for part in parts if part) or None
+
+
+def _number(value, cast=float):
+    try:
+        return cast(str(value).replace(",", ""))
+    except (TypeError, ValueError):
+        return None
+
+
+def _rating_fields(node):
+    rating = node.get("aggregateRating") or {}
+    if not isinstance(rating, dict):
+        return None, None
+    value = _number(rating.get("ratingValue"))
+    count = _number(rating.get("reviewCount", rating.get("ratingCount")), int)
+    return (f"{value:g}" if value is not None else None), count
+
+
+def _geo_fields(node):
+    geo = node.get("geo") or {}
+    if not isinstance(geo, dict):
+        return None, None
+    return _number(geo.get("latitude")), _number(geo.get("longitude"))
+
+
+def extract_hotel(html, url):
+    """
+    Hotel fields in the shape final_hotel_tripadvisor writes ({name, price, rating, rating_count, address,
+    description, url, lat, lon}, 'N/A'/None when unknown), from a Hotel/LodgingBusiness JSON-LD node
+    with meta-tag fallbacks. Returns None when the page carries no hotel data at all.
+    """
+    page = parse_page(html)
+    node = find_node(json_ld_nodes(page.json_ld), HOTEL_TYPES)
+    if node is None:
+        return None
+    rating, rating_count = _rating_fields(node)
+    lat, lon = _geo_fields(node)
+    return {
+        "name": _text(node.get("name")) or page.h1 or "N/A",
+        "price": _text(node.get("priceRange")) or "N/A",
+        "rating": rating or "N/A",
+        "rating_count": rating_count if rating_count is not None else "N/A",
+        "address": format_address(node.get("address")) or "N/A",
+        "description": _text(node.get("description")) or page.meta.get("og:description") or page.meta.get("description") or "N/A",
+        "url": url,
+        "lat": lat,
+        "lon": lon,
+    }
+
+
+def extract_place(html, url):
+    """
+    Place fields in the shape googlemaps.py writes ({name, rating, list_rating, description, address,
+    phone, lat, lon}) from a LocalBusiness-like JSON-LD node. Returns None when the page has none.
+    """
+    page = parse_page(html)
+    node = find_node(json_ld_nodes(page.json_ld), PLACE_TYPES)
+    if node is None:
+        return None
+    rating, rating_count = _rating_fields(node)
+    lat, lon = _geo_fields(node)
+    return {
+        "name": _text(node.get("name")) or page.h1 or "N/A",
+        "rating": rating or "N/A",
+        "list_rating": str(rating_count) if rating_count is not None else "N/A",
+        "description": _text(node.get("description")) or page.meta.get("og:description") or "N/A",
+        "address": format_address(node.get("address")) or "N/A",
+        "phone": _text(node.get("telephone")) or "N/A",
+        "lat": lat if lat is not None else "N/A",
+        "lon": lon if lon is not None else "N/A",
+    }
+
+
+def is_complete(record, required_fields):
+    return bool(record) and all(record.get(field) not in (None, "", "N/A") for field in required_fields)
+
+
+class HttpFetcher:
+    """
+    Pooled HTTP client for page fetches: one keep-alive requests.Session per thread (connection pool,
+    retries with backoff on connection errors), and a minimum interval between requests to the same host.
+    """
+
+    def __init__(self, timeout=10, pool_size=8, min_host_interval=0.5, headers=None):
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.min_host_interval = min_host_interval
+        self.headers = dict(DEFAULT_HEADERS, **(headers or {}))
+        self._local = threading.local()
+        self._host_lock = threading.Lock()
+        self._next_slot = {} # host -> monotonic time of its next allowed request
+
+    def _session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size,
+                                  max_retries=Retry(total=2, connect=2, read=1, backoff_factor=0.3, status_forcelist=(502, 504)))
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update(self.headers)
+            self._local.session = session
+        return session
+
+    def _throttle(self, host):
+        with self._host_lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_host_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def get(self, url):
+        """Returns (status_code, html), or (None, None) when the request itself failed."""
+        self._throttle(urlparse(url).netloc)
+        try:
+            response = self._session().get(url, timeout=self.timeout)
+            return response.status_code, response.text
+        except requests.RequestException as e:
+            logging.warning(f"HTTP fetch failed for {url}: {e}")
+            return None, None
+
+
+class FetchLayer:
+    """
+    HTTP-first page extraction with a browser fallback.
+
+    fetch(url, browser_fetch) requests the page over HTTP and runs extractor(html, url). If that gives a
+    record with all required_fields it is returned without touching a browser; otherwise (blocked response,
+    JS-only page, missing fields) browser_fetch(url) is called and its record returned. After
+    max_http_failures consecutive misses on a host, HTTP is skipped for that host for the rest of the run.
+    """
+
+    def __init__(self, extractor, required_fields=("name",), http_fetcher=None, max_http_failures=5):
+        self.extractor = extractor
+        self.required_fields = tuple(required_fields)
+        self.http = http_fetcher or HttpFetcher()
+        self.max_http_failures = max_http_failures
+        self._lock = threading.Lock()
+        self._host_failures = {}
+        self._stats = {"http": 0, "browser": 0, "http_seconds": 0.0, "browser_seconds": 0.0, "http_skipped": 0}
+
+    def _http_enabled(self, host):
+        with self._lock:
+            return self._host_failures.get(host, 0) < self.max_http_failures
+
+    def _record(self, path, seconds):
+        with self._lock:
+            self._stats[path] += 1
+            self._stats[f"{path}_seconds"] += seconds
+
+    def try_http(self, url):
+        """The extracted record if plain HTTP was enough, else None (the reason is logged)."""
+        host = urlparse(url).netloc
+        if not self._http_enabled(host):
+            with self._lock:
+                self._stats["http_skipped"] += 1
+            return None
+        start = time.monotonic()
+        status, html = self.http.get(url)
+        record, reason = None, None
+        if status is None:
+            reason = "request failed"
+        elif status in BLOCKED_STATUS_CODES:
+            reason = f"blocked (HTTP {status})"
+        elif status >= 400:
+            reason = f"HTTP {status}"
+        else:
+            record = self.extractor(html, url)
+            if not is_complete(record, self.required_fields):
+                lowered = (html or "")[:5000].lower()
+                reason = "bot challenge" if any(marker in lowered for marker in BLOCKED_MARKERS) else "no embedded data"
+                record = None
+        with self._lock:
+            self._host_failures[host] = 0 if record else self._host_failures.get(host, 0) + 1
+            if not record and self._host_failures[host] == self.max_http_failures:
+                logging.warning(f"{self.max_http_failures} consecutive HTTP misses on {host}; using the browser only from now on.")
+        if record:
+            self._record("http", time.monotonic() - start)
+        else:
+            logging.info(f"HTTP extraction not usable for {url} ({reason}); falling back to the browser.")
+        return record
+
+    def fetch(self, url, browser_fetch=None):
+        """Returns (record, source) with source 'http' or 'browser'; (None, None) if HTTP missed and there is no browser_fetch."""
+        record = self.try_http(url)
+        if record is not None:
+            return record, "http"
+        if browser_fetch is None:
+            return None, None
+        start = time.monotonic()
+        try:
+            return browser_fetch(url), "browser"
+        finally:
+            self._record("browser", time.monotonic() - start)
+
+    def stats(self):
+        """Pages served by each path with their mean seconds per page."""
+        with self._lock:
+            stats = dict(self._stats)
+        for path in ("http", "browser"):
+            stats[f"{path}_mean_seconds"] = round(stats[f"{path}_seconds"] / stats[path], 3) if stats[path] else None
+        return stats
@@ -9,18 +9,32 @@ import re
 import os
 import logging
 import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from wait_utils import wait_until, wait_timings, pause, element_text
+from crawl_frontier import CrawlFrontier, content_hash, DONE
+from fetch_layer import FetchLayer, extract_hotel
 
 # Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(threadName)s - %(message)s')
+
+# Lines of a list-page card that carry a price ('$45', '1.234.567 ₫', '890,000 VND')
+PRICE_LINE_RE = re.compile(r"[$€£₫]|\bVND\b|\d[\d.,]*\s*(?:đ|d)\b", re.IGNORECASE)
 
 class TripadvisorFullCrawler:
     """
     Combines TripAdvisor URL collection and hotel detail scraping into a single run,
     using separate driver sessions for URL collection and each detail extraction.
+    Progress is checkpointed in a CrawlFrontier (SQLite), so an interrupted crawl resumes where it stopped.
     """
+    # undetected_chromedriver patches the shared chromedriver binary on start; concurrent starts corrupt it
+    _driver_init_lock = threading.Lock()
+
     def __init__(self, output_detail_file="tripadvisor_da_nang_final_details.json", url_target_count=30,
                  url_output_file="scrapper/data/collected_hotel_urls.json",
-                 collect_urls=True, extract_details=True):
+                 collect_urls=True, extract_details=True,
+                 frontier_path="scrapper/data/tripadvisor_crawl_frontier.sqlite3", frontier=None,
+                 detail_workers=1, recrawl=False, use_http_fetch=True):
         self.output_file = output_detail_file
         self.url_target_count = url_target_count
         self.url_output_file = url_output_file
@@ -28,6 +42,13 @@ class TripadvisorFullCrawler:
         self.extract_details = extract_details
         self.final_hotels_data = [] # Store final detailed results
         self.processed_urls_set = set() # Keep track of processed URLs if resuming/re-running
+        self.frontier = frontier or CrawlFrontier(frontier_path) # URL states, retries and finished list pages
+        self.detail_workers = max(1, detail_workers)
+        self.recrawl = recrawl # Walk the list pages again; hotels whose list card is unchanged are not re-scraped
+        self._results_lock = threading.Lock()
+        self._detail_stats = {"new": 0, "changed": 0, "unchanged": 0, "failed": 0}
+        # Detail pages embed schema.org JSON-LD; read it over plain HTTP and only open a browser when that falls short
+        self.fetch_layer = FetchLayer(extract_hotel, required_fields=("name", "address")) if use_http_fetch else None
 
         # --- Driver related attributes initialized to None ---
         self.driver = None
@@ -62,9 +83,8 @@ class TripadvisorFullCrawler:
         # logging.info(f"Using SOCKS5 proxy server: {proxy_server}")
 
         try:
-            self.driver = uc.Chrome(options=opts)
-            logging.info("Waiting a few seconds after driver initialization...")
-            time.sleep(random.uniform(1.5, 3.0)) # Reduced wait
+            with wait_timings.timed("driver_init"), self._driver_init_lock:
+                self.driver = uc.Chrome(options=opts)
             logging.info("Driver initialized.")
             # Initialize waits associated with this driver instance
             self.list_wait = WebDriverWait(self.driver, 20)
@@ -329,9 +349,8 @@ class TripadvisorFullCrawler:
         """Performs a specific button click outside of the date selection."""
         logging.info("Attempting specific outside date button click sequence...")
         try:
-            time.sleep(random.uniform(1.0, 2.0)) # Reduced delay
             h1_element = "//h1[@class='biGQs _P fiohW avBIb KagYY']"
-            h1_element = self.list_wait.until(EC.visibility_of_element_located((By.XPATH, h1_element)))
+            h1_element = wait_until(self.driver, EC.element_to_be_clickable((By.XPATH, h1_element)), "list_heading", timeout=20, raise_on_timeout=True)
             logging.info("h1 element found.")
             h1_element.click()
             logging.info("h1 element clicked.")
@@ -345,24 +364,30 @@ class TripadvisorFullCrawler:
 
 
     def crawl_hotel_urls(self):
-        """Crawls TripAdvisor list pages to collect hotel detail URLs."""
+        """
+        Crawls TripAdvisor list pages to collect hotel detail URLs into the frontier.
+        Starts at the first list page not finished by an earlier run and returns the URLs found in this one.
+        """
         collected_urls = []
         collected_urls_set = set() # Track URLs collected in this specific run
-        offset = 0
         max_hotels_per_page = 30
+        offset = self.frontier.next_page_offset(max_hotels_per_page)
+        # URLs already counted on list pages finished by an interrupted run
+        target_count = self.url_target_count - self.frontier.urls_on_done_pages()
+        if offset:
+            logging.info(f"Resuming URL collection at page offset {offset} ({target_count} URL(s) left to the target).")
 
         try:
             # --- Load initial page (offset 0) and select dates ---
             logging.info(f"Loading initial page for URL collection: {self.base_url}")
-            self.driver.get(self.base_url)
-            time.sleep(random.uniform(2.0, 3.5)) # Reduced wait
+            self.driver.get(self.base_url) # select_outside_date waits for the heading it clicks
             logging.info("Initial page loaded, proceeding to outside date button sequence.")
 
             self.select_outside_date() # Perform button click sequence
             logging.info("Outside date button sequence finished, starting URL collection loop.")
 
             # --- Main URL Collection Loop ---
-            while len(collected_urls) < self.url_target_count:
+            while len(collected_urls) < target_count:
                 # Determine the correct URL for the current offset
                 if offset == 0:
                     # Already on the page after button clicks, or reload if needed
@@ -374,26 +399,24 @@ class TripadvisorFullCrawler:
                     if self.driver.current_url != expected_url:
                         logging.info(f"Navigating to offset {offset}...")
                         self.driver.get(expected_url)
-                        time.sleep(random.uniform(2.0, 4.0)) # Reduced wait
                         logging.info(f"Navigation to {expected_url} complete.")
                         
                         # --- ADD: Re-apply date selection and refresh for offset pages ---
                         logging.info(f"Re-applying outside date selection for offset {offset}...")
                         self.select_outside_date()
                         logging.info(f"Refreshing page after outside date selection for offset {offset}...")
-                        self.driver.refresh()
-                        time.sleep(random.uniform(3.0, 5.0)) # Wait for page refresh
+                        self.driver.refresh() # The list container wait below covers the reload
                         logging.info("Page refreshed.")
                         # --- END ADD ---
 
                 page_url = self.driver.current_url
-                logging.info(f"Now collecting URLs from page: {page_url} (Target: {self.url_target_count}, Current URLs: {len(collected_urls)})")
+                logging.info(f"Now collecting URLs from page: {page_url} (Target: {target_count}, Current URLs: {len(collected_urls)})")
 
                 try:
                     # Wait for the main hotel list container
                     hotel_list_container_selector = "//ol[@class='tAknw f e']"
-                    self.list_wait.until(EC.visibility_of_element_located((By.XPATH, hotel_list_container_selector)))
-                    list_container = self.driver.find_element(By.XPATH, hotel_list_container_selector)
+                    list_container = wait_until(self.driver, EC.visibility_of_element_located((By.XPATH, hotel_list_container_selector)),
+                                                "hotel_list", timeout=20, raise_on_timeout=True)
 
                     # Find hotel 'li' elements
                     hotel_elements_selector = ".//li"
@@ -415,6 +438,7 @@ class TripadvisorFullCrawler:
                         try:
                             hotel_link_element = item.find_element(By.XPATH, hotel_link_selector)
                             hotel_url = hotel_link_element.get_attribute('href')
+                            listing_hash = self._listing_fingerprint(item.text)
 
                             if hotel_url:
                                 # Strip query parameters
@@ -423,12 +447,12 @@ class TripadvisorFullCrawler:
                                     logging.info(f"Found new unique hotel URL: {stripped_url} (Original: {hotel_url})")
                                     collected_urls.append(stripped_url) # Store stripped URL
                                     collected_urls_set.add(stripped_url)
-                                    # --- Call incremental save --- 
-                                    self._append_url_to_file(stripped_url)
-                                    # --- End Call ---
+                                    state = self.frontier.add_url(stripped_url, listing_hash) # Checkpoint immediately
+                                    if state == DONE:
+                                        logging.info(f"Hotel unchanged since the last crawl, detail fetch will be skipped: {stripped_url}")
                                     collected_on_page += 1
-                                    if len(collected_urls) >= self.url_target_count:
-                                        logging.info(f"Reached target URL count of {self.url_target_count}.")
+                                    if len(collected_urls) >= target_count:
+                                        logging.info(f"Reached target URL count of {target_count}.")
                                         break # Exit item loop
                                 else:
                                     logging.debug(f"Already collected URL: {stripped_url}. Skipping.")
@@ -439,20 +463,18 @@ class TripadvisorFullCrawler:
                             logging.debug(f"Could not find primary hotel link ({hotel_link_selector}) in list item {i+1}.")
                         except Exception as item_err:
                              logging.warning(f"Error processing list item {i+1}: {item_err}")
-                        
-                        # --- ADDED: Short delay after processing each item ---
-                        time.sleep(random.uniform(0.2, 0.4)) # Short pause between item checks
-                        # --- END ADDED ---
+
+                    self.frontier.mark_page_done(offset, collected_on_page)
 
                     # Check if target count is reached after processing the page
-                    if len(collected_urls) >= self.url_target_count:
+                    if len(collected_urls) >= target_count:
                         break # Exit outer loop
 
                     logging.info(f"Finished processing items on page {page_url}. Found {collected_on_page} new URLs. Pausing...")
-                    time.sleep(random.uniform(1.0, 2.0)) # Reduced pause
+                    pause("list_page_delay", random.uniform(1.0, 2.0)) # Rate limiting between list pages, not a page wait
 
                     # --- Restart driver before moving to the next page --- 
-                    if len(collected_urls) < self.url_target_count: # Only restart if we need more URLs
+                    if len(collected_urls) < target_count: # Only restart if we need more URLs
                         logging.info(f"Preparing to navigate to next page (offset {offset + max_hotels_per_page}). Restarting driver...")
                         self._quit_driver()
                         if not self._initialize_driver():
@@ -507,16 +529,15 @@ class TripadvisorFullCrawler:
         try:
             # Navigate to the hotel detail URL in the current window
             self.driver.get(hotel_url)
-            logging.info("Waiting after loading hotel detail page...")
-            # Give page time to load dynamic content
-            time.sleep(random.uniform(1.5, 2.5)) # Reduced wait
 
             # --- Wait for and find the main container element ---
             key_container_xpath = "//div[@class='IDaDx Iwmxp cyIij fluiI SMjpI']"
             try:
-                key_container = self.detail_wait.until(EC.visibility_of_element_located((By.XPATH, key_container_xpath)))
+                key_container = wait_until(self.driver, EC.visibility_of_element_located((By.XPATH, key_container_xpath)),
+                                           "detail_key_container", timeout=25, raise_on_timeout=True)
                 logging.info("Key container element found.")
-                time.sleep(0.5) # Short pause after finding container
+                # The heading renders into the container after it becomes visible
+                wait_until(self.driver, element_text(By.XPATH, ".//div[@id='HEADING']", root=key_container), "detail_heading", timeout=3)
             except TimeoutException:
                 logging.error(f"Timeout waiting for key container ({key_container_xpath}) on {hotel_url}")
                 self.driver.save_screenshot(f"error_detail_key_container_timeout_{time.time()}.png")
@@ -665,152 +686,163 @@ class TripadvisorFullCrawler:
 
     # --- Orchestration & Saving ---
     def load_existing_results(self):
-        """Loads existing results from the output file if it exists."""
+        """
+        Seeds the frontier with hotel details from an existing output file (written before the frontier
+        existed, or edited by hand), so those hotels count as done instead of being scraped again.
+        """
         if os.path.exists(self.output_file):
             logging.info(f"Output file {self.output_file} exists. Loading previous details.")
             try:
                 with open(self.output_file, 'r', encoding='utf-8') as f:
-                    self.final_hotels_data = json.load(f)
-                    # Populate processed URLs set from loaded data
-                    self.processed_urls_set = set(hotel.get('url') for hotel in self.final_hotels_data if hotel.get('url'))
-                    logging.info(f"Loaded {len(self.final_hotels_data)} existing hotel details. {len(self.processed_urls_set)} URLs previously processed.")
+                    existing = json.load(f)
+                imported = self.frontier.import_results(existing if isinstance(existing, list) else [])
+                logging.info(f"Loaded {len(existing)} existing hotel details; {imported} were new to the crawl frontier.")
             except (json.JSONDecodeError, IOError) as e:
-                 logging.error(f"Error loading existing detail file {self.output_file}: {e}. Starting fresh list.")
-                 self.final_hotels_data = []
-                 self.processed_urls_set = set()
-                 # Optionally back up corrupted file before overwriting
-                 # os.rename(self.output_file, self.output_file + ".corrupted")
+                 logging.error(f"Error loading existing detail file {self.output_file}: {e}. Relying on the crawl frontier.")
         else:
-            logging.info("No existing output file found. Starting fresh detail list.")
-            self.final_hotels_data = []
-            self.processed_urls_set = set()
+            logging.info("No existing output file found. Starting from the crawl frontier.")
+        self.final_hotels_data = self.frontier.results()
+        self.processed_urls_set = set(hotel.get('url') for hotel in self.final_hotels_data if hotel.get('url'))
+
+    def _load_url_file_into_frontier(self):
+        """Adds URLs from the URL list file (e.g. collected by an older run) to the frontier; known URLs are left as they are."""
+        if not os.path.exists(self.url_output_file) or os.path.getsize(self.url_output_file) == 0:
+            logging.warning(f"URL file {self.url_output_file} not found or empty. Using the URLs already in the crawl frontier.")
+            return
+        try:
+            with open(self.url_output_file, 'r', encoding='utf-8') as f:
+                loaded_urls = json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            logging.error(f"Error reading {self.url_output_file}: {e}. Using the URLs already in the crawl frontier.")
+            return
+        if not isinstance(loaded_urls, list):
+            logging.warning(f"Content in {self.url_output_file} is not a valid list. Using the URLs already in the crawl frontier.")
+            return
+        for url in loaded_urls:
+            self.frontier.add_url(url.split('?')[0])
+        logging.info(f"Loaded {len(loaded_urls)} URLs from {self.url_output_file} into the crawl frontier.")
+
+    def _browser_details(self, url):
+        """Scrapes one detail page in a fresh driver (the fallback when plain HTTP is not enough)."""
+        # --- Initialize driver FOR THIS URL ---
+        if not self._initialize_driver():
+            return {"name": "N/A", "url": url, "error": "driver initialization failed"}
+        try:
+            return self.get_hotel_details(url)
+        except Exception:
+            if self.driver: self.driver.save_screenshot(f"error_detail_loop_unexpected_{time.time()}.png")
+            raise
+        finally:
+            # --- Quit driver AFTER processing THIS URL ---
+            self._quit_driver()
 
+    def _detail_worker(self):
+        """
+        Claims URLs from the frontier until none are left. Each page is first read over plain HTTP
+        through the fetch layer; pages that need rendering are scraped with a fresh driver.
+        Runs in one of detail_workers threads; each thread has its own crawler instance (and driver).
+        """
+        worker = TripadvisorFullCrawler(output_detail_file=self.output_file, url_output_file=self.url_output_file,
+                                        frontier=self.frontier, use_http_fetch=False)
+        while True:
+            url = self.frontier.claim()
+            if url is None:
+                return
+            logging.info(f"--- Processing detail for URL: {url} ({self.frontier.remaining()} more queued) ---")
+
+            source = "browser"
+            try:
+                if self.fetch_layer:
+                    details, source = self.fetch_layer.fetch(url, worker._browser_details)
+                else:
+                    details = worker._browser_details(url)
+                if details and details.get("name") != "N/A":
+                    was_known = url in self.processed_urls_set
+                    changed = self.frontier.complete(url, details)
+                    with self._results_lock:
+                        self.processed_urls_set.add(url)
+                        self._detail_stats["changed" if was_known and changed else "unchanged" if was_known else "new"] += 1
+                        if changed:
+                            # Save incrementally after each successful detail extraction that changed something
+                            self.final_hotels_data = self.frontier.results()
+                            self.save_results()
+                    logging.info(f"Successfully extracted: {details.get('name')} via {source}{'' if changed else ' (unchanged)'}.")
+                else:
+                    self._record_detail_failure(url, (details or {}).get("error") or "no hotel name extracted")
+            except Exception as detail_err:
+                # Catch errors that might happen *outside* get_hotel_details but within this loop iteration
+                logging.error(f"Unexpected error during detail processing for {url}: {detail_err}", exc_info=True)
+                self._record_detail_failure(url, detail_err)
+            finally:
+                if source == "browser":
+                    # Delay *after* quitting driver, before this worker starts its next driver
+                    sleep_time = random.uniform(1.0, 2.5) # Rate limiting between detail pages
+                    logging.debug(f"Sleeping for {sleep_time:.2f} seconds before next URL...")
+                    pause("detail_page_delay", sleep_time)
+
+    def _record_detail_failure(self, url, error):
+        will_retry = self.frontier.fail(url, error)
+        with self._results_lock:
+            self._detail_stats["failed"] += 1
+        logging.warning(f"Detail extraction failed for {url}: {error}. {'Will retry.' if will_retry else 'Giving up after repeated failures.'}")
 
     def run_full_crawl(self):
-        """Orchestrates the full crawl based on control flags."""
+        """Orchestrates the full crawl based on control flags, resuming from the crawl frontier."""
         start_time = time.time()
-        logging.info("--- Starting Full TripAdvisor Crawl ---")
+        logging.info(f"--- Starting Full TripAdvisor Crawl (frontier: {self.frontier.path}, states: {self.frontier.counts()}) ---")
         self.driver = None # Ensure driver starts as None
-        hotel_urls_to_process = [] # Initialize empty list
 
         try:
+            if self.extract_details:
+                # Import existing details results *before* any URL is queued, so already scraped hotels count as done
+                self.load_existing_results()
+
             # --- Phase 1: Collect URLs (Conditional) ---
             if self.collect_urls:
                 logging.info("--- Starting Phase 1: URL Collection (Enabled) ---")
-
-                # --- ADD: Ensure URL output file exists as empty list if starting fresh --- 
-                if not os.path.exists(self.url_output_file) or os.path.getsize(self.url_output_file) == 0:
-                    logging.info(f"Initializing URL output file: {self.url_output_file}")
-                    try:
-                        os.makedirs(os.path.dirname(self.url_output_file) or '.', exist_ok=True)
-                        with open(self.url_output_file, 'w', encoding='utf-8') as f:
-                            json.dump([], f)
-                    except IOError as e:
-                         logging.error(f"Could not initialize URL output file {self.url_output_file}: {e}")
-                         # Decide whether to abort or continue without saving URLs
-                         # return # Option: Abort if file cannot be initialized
-                # --- END ADD ---
+                if self.recrawl:
+                    logging.info("Re-crawl requested: walking the list pages again; unchanged hotels will not be re-scraped.")
+                    self.frontier.reset_pages()
 
                 # Initialize driver FOR URL Collection Phase
                 if not self._initialize_driver():
-                    logging.critical("Failed to initialize driver for URL Collection Phase. Aborting crawl.")
-                    # Ensure collected_urls remains empty or is handled if driver init fails
-                    collected_urls = [] # Ensure it's an empty list
+                    logging.critical("Failed to initialize driver for URL Collection Phase. Continuing with the URLs already in the frontier.")
                 else:
-                    collected_urls = self.crawl_hotel_urls() # This manages its own driver session
-                
+                    try:
+                        collected_urls = self.crawl_hotel_urls() # Checkpoints every URL and finished page in the frontier
+                        logging.info(f"Collected {len(collected_urls)} URLs in this run.")
+                    finally:
+                        self._quit_driver()
+
                 logging.info("--- Finished Phase 1: URL Collection ---")
+                self._save_url_list(self.frontier.urls()) # Plain list export for tools that read the URL file
 
-                if collected_urls:
-                    self._save_url_list(collected_urls)
-                    hotel_urls_to_process = collected_urls # Use collected URLs for Phase 2
-                else:
-                    logging.warning("URL Collection phase ran but did not return any URLs or failed to initialize driver.")
-                    hotel_urls_to_process = [] # Ensure it's empty
-            
             else: # self.collect_urls is False
                 logging.info("--- Skipping Phase 1: URL Collection (Disabled) ---")
                 if self.extract_details: # If we are not collecting, but ARE extracting details...
-                    logging.info(f"Attempting to load URLs from {self.url_output_file} for detail extraction.")
-                    if os.path.exists(self.url_output_file) and os.path.getsize(self.url_output_file) > 0:
-                        try:
-                            with open(self.url_output_file, 'r', encoding='utf-8') as f:
-                                loaded_urls = json.load(f)
-                            if isinstance(loaded_urls, list):
-                                hotel_urls_to_process = loaded_urls
-                                logging.info(f"Successfully loaded {len(hotel_urls_to_process)} URLs from {self.url_output_file}.")
-                            else:
-                                logging.warning(f"Content in {self.url_output_file} is not a valid list. No URLs loaded for processing.")
-                                hotel_urls_to_process = [] 
-                        except json.JSONDecodeError:
-                            logging.error(f"Error decoding JSON from {self.url_output_file}. No URLs loaded for processing.")
-                            hotel_urls_to_process = []
-                        except IOError as e:
-                            logging.error(f"IOError reading {self.url_output_file}: {e}. No URLs loaded for processing.")
-                            hotel_urls_to_process = []
-                    else:
-                        if not os.path.exists(self.url_output_file):
-                            logging.warning(f"URL file {self.url_output_file} not found. No URLs to load for processing.")
-                        else: # File exists but is empty
-                            logging.warning(f"URL file {self.url_output_file} is empty. No URLs to load for processing.")
-                        hotel_urls_to_process = []
-            
+                    self._load_url_file_into_frontier()
+
             # --- Phase 2: Extract Details (Conditional) ---
             if self.extract_details:
-                if not hotel_urls_to_process:
-                    logging.warning("No URLs available to process for detail extraction. Skipping Phase 2.")
+                remaining = self.frontier.remaining()
+                if not remaining:
+                    logging.warning("No URLs left to process for detail extraction. Skipping Phase 2.")
                 else:
-                    logging.info(f"--- Starting Phase 2: Detail extraction (Enabled) for {len(hotel_urls_to_process)} URLs ---")
-                    # Load existing details results *before* starting the loop
-                    self.load_existing_results()
-                    new_details_added = 0
-                    for i, url in enumerate(hotel_urls_to_process):
-                        # Check if URL (or its base) was already processed from loaded data
-                        base_url = url.split('?')[0]
-                        if base_url in self.processed_urls_set:
-                            logging.info(f"Skipping already processed URL ({i+1}/{len(hotel_urls_to_process)}): {base_url}")
-                            continue
-
-                        logging.info(f"--- Processing detail for URL {i+1}/{len(hotel_urls_to_process)}: {url} ---")
-
-                        # --- Initialize driver FOR THIS URL ---
-                        if not self._initialize_driver():
-                            logging.error(f"Failed to initialize driver for URL {url}. Skipping this URL.")
-                            continue # Skip to the next URL if driver init fails
-
-                        details = None # Ensure details is defined
-                        try:
-                            # --- Get details using the newly initialized driver ---
-                            details = self.get_hotel_details(url)
-
-                            # Add details only if valid name found and not already processed
-                            if details and details.get("name") != "N/A":
-                                self.final_hotels_data.append(details)
-                                self.processed_urls_set.add(base_url) # Add base URL to processed set
-                                new_details_added += 1
-                                logging.info(f"Successfully extracted: {details.get('name')}. Total details now: {len(self.final_hotels_data)}")
-                                # Save incrementally after each successful detail extraction
-                                self.save_results()
-                            elif details and details.get("error"): # Handle specific driver init error case
-                                logging.warning(f"Skipping storage for {url} due to error: {details.get('error')}")
-                            else:
-                                logging.warning(f"No valid details extracted for {url} or name was 'N/A'. Skipping storage.")
-
-                        except Exception as detail_err:
-                            # Catch errors that might happen *outside* get_hotel_details but within this loop iteration
-                            logging.error(f"Unexpected error during detail processing loop for {url}: {detail_err}", exc_info=True)
-                            if self.driver: self.driver.save_screenshot(f"error_detail_loop_unexpected_{time.time()}.png")
-                        finally:
-                            # --- Quit driver AFTER processing THIS URL ---
-                            self._quit_driver()
-                            logging.info(f"Driver quit after processing URL {i+1}.")
-
-                            # Delay *after* quitting driver, before starting the next loop iteration (and next driver init)
-                            sleep_time = random.uniform(1.0, 2.5) # Reduced delay
-                            logging.debug(f"Sleeping for {sleep_time:.2f} seconds before next URL...")
-                            time.sleep(sleep_time)
-
-                    logging.info(f"--- Detail extraction phase complete. Added {new_details_added} new hotel details. ---")
+                    logging.info(f"--- Starting Phase 2: Detail extraction (Enabled) for {remaining} URLs ---")
+                    detail_round = 1
+                    # A worker stops once nothing is claimable, but another may still fail a URL after that and make
+                    # it retryable again; run further rounds until nothing is left (each URL has max_attempts tries)
+                    while remaining:
+                        workers = min(self.detail_workers, remaining)
+                        logging.info(f"Detail round {detail_round}: {remaining} URL(s) on {workers} worker(s).")
+                        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="detail") as executor:
+                            for future in [executor.submit(self._detail_worker) for _ in range(workers)]:
+                                future.result()
+                        remaining = self.frontier.remaining()
+                        detail_round += 1
+                    logging.info(f"--- Detail extraction phase complete: {self._detail_stats} ---")
+                    if self.fetch_layer:
+                        logging.info(f"Detail pages by fetch path: {self.fetch_layer.stats()}")
             else:
                  logging.info("--- Skipping Phase 2: Detail Extraction (Disabled) ---")
 
@@ -823,7 +855,9 @@ class TripadvisorFullCrawler:
                  except: pass # Ignore screenshot errors here
         finally:
             # Final save regardless of errors
-            self.save_results()
+            if self.extract_details:
+                self.final_hotels_data = self.frontier.results()
+                self.save_results()
             # Ensure any lingering driver instance is quit (should already be handled in loop/phase 1 finally)
             if self.driver:
                  logging.warning("Driver instance still found in final finally block. Attempting quit.")
@@ -835,6 +869,8 @@ class TripadvisorFullCrawler:
             logging.info(f"--- Full TripAdvisor Crawl Finished ---")
             logging.info(f"Total execution time: {end_time - start_time:.2f} seconds.")
             logging.info(f"Final total hotel details saved: {len(self.final_hotels_data)}")
+            logging.info(f"Crawl frontier states: {self.frontier.counts()}")
+            wait_timings.log_summary("Wait timings for this crawl")
 
 
     def save_results(self):
@@ -843,9 +879,11 @@ class TripadvisorFullCrawler:
         try:
             # Create directory if it doesn't exist
             os.makedirs(os.path.dirname(self.output_file) or '.', exist_ok=True)
-            # Write data
-            with open(self.output_file, 'w', encoding='utf-8') as f:
+            # Write to a temp file and swap it in, so readers of the output never see a half-written file
+            tmp_file = f"{self.output_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
                 json.dump(self.final_hotels_data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_file, self.output_file)
             logging.info(f"Save complete to {self.output_file}")
         except IOError as e:
             logging.error(f"Error saving data to {self.output_file}: {e}")
@@ -871,48 +909,16 @@ class TripadvisorFullCrawler:
             logging.error(f"Error saving URL list data to {self.url_output_file}: {e}")
         except Exception as e:
             logging.error(f"An unexpected error occurred during URL list saving: {e}", exc_info=True)
-    # --- END ADD --- 
-
-    def _append_url_to_file(self, url):
-        """Appends a URL to the URL output file."""
-        if not self.url_output_file:
-            logging.warning("URL output file path not specified. Skipping URL append.")
-            return
+    # --- END ADD ---
 
-        logging.info(f"Appending URL: {url} to {self.url_output_file}")
-        try:
-            # Load existing URLs
-            existing_urls = [] # Default to empty list
-            try:
-                with open(self.url_output_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    if content:
-                         existing_urls = json.loads(content)
-                    if not isinstance(existing_urls, list):
-                        logging.warning(f"URL file {self.url_output_file} does not contain a valid list. Resetting.")
-                        existing_urls = []
-            except FileNotFoundError:
-                 logging.info(f"URL file {self.url_output_file} not found. Creating new file.")
-                 existing_urls = [] # Start fresh if file doesn't exist
-            except json.JSONDecodeError:
-                 logging.warning(f"Could not decode JSON from {self.url_output_file}. Resetting file.")
-                 existing_urls = [] # Start fresh if file is corrupt
-
-            # --- Check for duplicates before appending --- 
-            if url not in existing_urls:
-                # Append new URL
-                existing_urls.append(url)
-
-                # Save updated URLs
-                with open(self.url_output_file, 'w', encoding='utf-8') as f:
-                    json.dump(existing_urls, f, ensure_ascii=False, indent=2)
-                logging.info(f"URL appended successfully to {self.url_output_file}")
-            else:
-                 logging.debug(f"URL {url} already exists in {self.url_output_file}. Skipping append.")
-            # --- End Check --- 
-
-        except IOError as e:
-            logging.error(f"IOError during URL append/save to {self.url_output_file}: {e}")
+    @staticmethod
+    def _listing_fingerprint(card_text):
+        """
+        Hash of a hotel's list-page card without its price lines (prices move daily, the hotel does not).
+        An unchanged fingerprint on a re-crawl means the detail page does not need to be scraped again.
+        """
+        lines = [line.strip() for line in (card_text or "").splitlines() if line.strip() and not PRICE_LINE_RE.search(line)]
+        return content_hash(lines)
 
 
 if __name__ == "__main__":
@@ -920,10 +926,14 @@ if __name__ == "__main__":
     TARGET_URL_COUNT = 66 # How many hotel URLs to aim for (might get slightly more depending on page size)
     OUTPUT_FILE = "scrapper/data/tripadvisor_da_nang_final_details.json" # Final output file path
     URL_LIST_OUTPUT_FILE = "scrapper/data/tripadvisor_da_nang_collected_urls.json" # File for collected URLs
+    FRONTIER_FILE = "scrapper/data/tripadvisor_crawl_frontier.sqlite3" # Crawl state; delete it to start from scratch
+    DETAIL_WORKERS = 2 # Parallel detail pages, each in its own browser
+    USE_HTTP_FETCH = True # Read detail pages over plain HTTP first; the browser is only the fallback
 
     # --- Control Flags --- # 
     RUN_URL_COLLECTION = True  # Set to False to skip URL collection and use existing URL file
     RUN_DETAIL_EXTRACTION = False # Set to False to skip detail extraction
+    RECRAWL = False # True: walk the list pages again and re-scrape hotels whose list card changed; False: resume
     # --------------------- #
 
     logging.info(f"--- Initializing TripAdvisor Full Crawler ---")
@@ -932,6 +942,7 @@ if __name__ == "__main__":
     logging.info(f"URL List Output File: {URL_LIST_OUTPUT_FILE}")
     logging.info(f"Run URL Collection: {RUN_URL_COLLECTION}")
     logging.info(f"Run Detail Extraction: {RUN_DETAIL_EXTRACTION}")
+    logging.info(f"Crawl Frontier: {FRONTIER_FILE} (re-crawl: {RECRAWL}, detail workers: {DETAIL_WORKERS}, HTTP fetch first: {USE_HTTP_FETCH})")
 
     if not RUN_URL_COLLECTION and not RUN_DETAIL_EXTRACTION:
         logging.warning("Both RUN_URL_COLLECTION and RUN_DETAIL_EXTRACTION are set to False. Exiting.")
@@ -940,7 +951,11 @@ if __name__ == "__main__":
                                        url_target_count=TARGET_URL_COUNT,
                                        url_output_file=URL_LIST_OUTPUT_FILE,
                                        collect_urls=RUN_URL_COLLECTION,
-                                       extract_details=RUN_DETAIL_EXTRACTION)
+                                       extract_details=RUN_DETAIL_EXTRACTION,
+                                       frontier_path=FRONTIER_FILE,
+                                       detail_workers=DETAIL_WORKERS,
+                                       recrawl=RECRAWL,
+                                       use_http_fetch=USE_HTTP_FETCH)
         crawler.run_full_crawl()
 
     # Optional: Final verification log
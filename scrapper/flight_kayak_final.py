@@ -1,7 +1,6 @@
 import selenium
 from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import NoSuchElementException, TimeoutException, StaleElementReferenceException
@@ -11,18 +10,50 @@ import json
 import re
 import os
 import logging
+import sys
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import date, timedelta
 from pymongo import MongoClient
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # Project root, for services.* and database.*
+from services.flight_fields import normalize_flight
+from wait_utils import (wait_until, wait_timings, WaitTimings, elements_present, element_text, element_displayed,
+                        scroll_height_grew)
+try:
+    from services.flight_cache import flight_cache
+except ImportError: # Scraper can still run standalone without the app's dependencies
+    flight_cache = None
+try:
+    from database.flight import FLIGHT_INDEXES
+except ImportError:
+    FLIGHT_INDEXES = []
+
+DIALOG_CLOSE_BUTTON_XPATH = "//button[contains(@class, 'close') or contains(@aria-label, 'close') or contains(@aria-label, 'Close')]"
 
 # Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(processName)s - %(levelname)s - %(message)s')
+
+# Number of browser workers for the nightly crawl; each runs one (departure, date) job at a time in its own Chrome
+FLIGHT_SCRAPER_WORKERS = int(os.getenv("FLIGHT_SCRAPER_WORKERS", 2))
+FLIGHT_SCRAPER_HEADLESS = os.getenv("FLIGHT_SCRAPER_HEADLESS", "false").lower() == "true"
+
+def get_flight_collection():
+    client = MongoClient(os.getenv('MONGODB_URI'))
+    db = client["dntrip"]
+    return db["flight_data"]
 
 class KayakFlightCrawler:
-    def __init__(self, output_dir="scrapper/data/flights"):
-        self.driver = webdriver.Chrome()
-        self.driver.maximize_window()
-        self.wait = WebDriverWait(self.driver, 30) # Increased wait time for Kayak
-        self.detail_wait = WebDriverWait(self.driver, 20) # Wait time for detail popup
+    def __init__(self, output_dir="scrapper/data/flights", headless=False):
+        chrome_options = Options()
+        if headless:
+            chrome_options.add_argument("--headless=new")
+            chrome_options.add_argument("--window-size=1920,1080")
+        self.driver = webdriver.Chrome(options=chrome_options)
+        if not headless:
+            self.driver.maximize_window()
+        self.results_timeout = 30 # Seconds to wait for the Kayak results list
+        self.detail_timeout = 20 # Seconds to wait for a detail popup/dialog
         self.output_dir = output_dir
         self.scraped_flights = [] # Holds flights for the current run
         self.all_scraped_flights = [] # Holds flights from ALL runs
@@ -33,11 +64,10 @@ class KayakFlightCrawler:
             logging.info(f"Created output directory: {self.output_dir}")
 
     def _get_mongodb_client(self):
-        client = MongoClient(os.getenv('MONGODB_URI'))
-        db = client["dntrip"]
-        return db["flight_data"]
-    
-    def _get_dates(self):
+        return get_flight_collection()
+
+    @staticmethod
+    def _get_dates():
         """Gets tomorrow's and the day after tomorrow's date."""
         today = date.today()
         tomorrow = today + timedelta(days=1)
@@ -61,14 +91,15 @@ class KayakFlightCrawler:
                 new_url = base_url + "#function"
                 logging.info(f"Closing dialog and returning to main view: {new_url}")
                 self.driver.get(new_url)
-                time.sleep(2)
+                wait_until(self.driver, lambda d: "#dialog" not in d.current_url and d.find_elements(By.XPATH, "//div[contains(@class, 'Fxw9')]"),
+                           "dialog_close_navigate", timeout=10)
                 return True
             
             # Alternative: Try to find and click close button if it exists
             try:
-                close_button = self.driver.find_element(By.XPATH, "//button[contains(@class, 'close') or contains(@aria-label, 'close') or contains(@aria-label, 'Close')]")
+                close_button = self.driver.find_element(By.XPATH, DIALOG_CLOSE_BUTTON_XPATH)
                 close_button.click()
-                time.sleep(1)
+                wait_until(self.driver, EC.invisibility_of_element_located((By.XPATH, DIALOG_CLOSE_BUTTON_XPATH)), "dialog_close_button", timeout=5)
                 logging.info("Closed dialog using close button.")
                 return True
             except NoSuchElementException:
@@ -77,7 +108,7 @@ class KayakFlightCrawler:
             # Alternative: Press Escape key
             try:
                 self.driver.find_element(By.TAG_NAME, 'body').send_keys(Keys.ESCAPE)
-                time.sleep(1)
+                wait_until(self.driver, EC.invisibility_of_element_located((By.XPATH, DIALOG_CLOSE_BUTTON_XPATH)), "dialog_close_escape", timeout=5)
                 logging.info("Closed dialog using Escape key.")
                 return True
             except:
@@ -98,17 +129,17 @@ class KayakFlightCrawler:
             flight_data['price'] = price_element.text.strip()
             logging.info(f"Found price (popup method): {flight_data['price']}")
 
-            time.sleep(1)
-
             # --- Wait for Popup and Extract Details ---
             popup_container_xpath = "//div[contains(@class, 'o-C7-section')]" # Generic popup container selector
-            popup_container_element = self.detail_wait.until(EC.visibility_of_element_located((By.XPATH, popup_container_xpath)))
+            popup_container_element = wait_until(self.driver, EC.visibility_of_element_located((By.XPATH, popup_container_xpath)),
+                                                 "popup_open", timeout=self.detail_timeout, raise_on_timeout=True)
             logging.info("Details popup appeared and container found (popup method).")
-            time.sleep(0.5) # Short pause for content rendering within popup
+            date_xpath_relative = ".//span[@class='X3K_-header-text']" # Relative XPath
+            # Content renders into the popup after it becomes visible
+            wait_until(self.driver, element_text(By.XPATH, date_xpath_relative, root=popup_container_element), "popup_render", timeout=3)
 
             # Date
             try:
-                date_xpath_relative = ".//span[@class='X3K_-header-text']" # Relative XPath
                 date_element = popup_container_element.find_element(By.XPATH, date_xpath_relative)
                 date_text = date_element.text.replace('Depart •', '').strip() # Keep removal just in case
                 flight_data['date'] = date_text
@@ -186,7 +217,7 @@ class KayakFlightCrawler:
                 close_target_element = flight_element.find_element(By.CLASS_NAME, 'nrc6-inner')
                 close_target_element.click()
                 logging.info("Clicked element with class 'nrc6-inner'.")
-                time.sleep(1) # Allow time for potential close action
+                wait_until(self.driver, EC.invisibility_of_element_located((By.XPATH, popup_container_xpath)), "popup_close", timeout=5)
             except TimeoutException:
                 logging.error("Timeout waiting for element with class 'nrc6-inner' to be clickable.")
             except NoSuchElementException:
@@ -221,11 +252,11 @@ class KayakFlightCrawler:
         # Wait for the main details container of the new view
         details_container_xpath = "//div[@class='E69K-leg-wrapper']" 
         try:
-            details_container_element = self.detail_wait.until(
-                EC.visibility_of_element_located((By.XPATH, details_container_xpath))
-            )
+            details_container_element = wait_until(self.driver, EC.visibility_of_element_located((By.XPATH, details_container_xpath)),
+                                                   "dialog_open", timeout=self.detail_timeout, raise_on_timeout=True)
             logging.info("Flight details container (E69K-leg-wrapper) found on new view (dialog method).")
-            time.sleep(0.5) # Allow for content rendering
+            # The price renders into the new view after the leg wrapper
+            wait_until(self.driver, element_text(By.XPATH, "//div[contains(@class, 'jnTP-display-price')]"), "dialog_render", timeout=3)
 
             # --- Extract Price ---
             try:
@@ -422,24 +453,22 @@ class KayakFlightCrawler:
 
         logging.info(f"Navigating to: {search_url}")
         self.driver.get(search_url)
-        time.sleep(10)
         try:
             # --- Handle Potential Overlays (Cookies, etc.) ---
             # --- Wait for Flight Results ---
             # Use class name Fxw9 for the results container
             results_container_xpath = "//div[contains(@class, 'Fxw9')]" # Find div containing class Fxw9
             logging.info(f"Waiting for results container: {results_container_xpath}")
-            # Wait for presence first
-            self.wait.until(EC.presence_of_element_located((By.XPATH, results_container_xpath)))
-            # Then get the element itself
-            results_container_element = self.driver.find_element(By.XPATH, results_container_xpath)
+            results_container_element = wait_until(self.driver, EC.presence_of_element_located((By.XPATH, results_container_xpath)),
+                                                   "results_container", timeout=self.results_timeout, raise_on_timeout=True)
             logging.info("Flight results container element found.")
-            time.sleep(2) # Wait for results to render
 
             # --- Locate Individual Flight Elements ---           
             # Using a relative path from the container element found above
             # Use the specific class name provided by the user
             flight_elements_xpath = ".//div[contains(@class, 'Fxw9-result-item-container')]" 
+            # Results render into the container after it appears
+            wait_until(self.driver, elements_present(By.XPATH, flight_elements_xpath, root=results_container_element), "results_render", timeout=10)
 
             last_height = self.driver.execute_script("return document.body.scrollHeight")
             processed_flight_ids = set() # To avoid processing the same flight multiple times if DOM changes
@@ -456,10 +485,9 @@ class KayakFlightCrawler:
 
                     if not flight_elements:
                          logging.warning("No flight elements found within container. Check selector or wait conditions.")
-                         # Potentially wait longer or check if results actually loaded
-                         time.sleep(5)
-                         # Re-try finding elements within container
-                         flight_elements = results_container_element.find_elements(By.XPATH, flight_elements_xpath)
+                         # Give the results a little longer to load before giving up
+                         flight_elements = wait_until(self.driver, elements_present(By.XPATH, flight_elements_xpath, root=results_container_element),
+                                                      "results_retry", timeout=10)
                          if not flight_elements:
                              logging.error("Still no flight elements found within container. Stopping scrape for this URL.")
                              break
@@ -494,12 +522,11 @@ class KayakFlightCrawler:
                             if not element.is_displayed():
                                 logging.warning(f"Element {i+1} not visible, scrolling.")
                                 self.driver.execute_script("arguments[0].scrollIntoViewIfNeeded(true);", element)
-                                time.sleep(0.5)
+                                wait_until(self.driver, element_displayed(element), "scroll_into_view", timeout=2)
 
                             # Click the element *before* passing it to the scraping function
                             logging.info(f"Clicking element {i+1} to open details...")
-                            element.click()
-                            time.sleep(1) # Allow time for popup transition
+                            element.click() # The detail methods wait for the popup/dialog themselves
 
                             flight_details = self._scrape_flight_details(element)
 
@@ -508,6 +535,7 @@ class KayakFlightCrawler:
                                 flight_details['departure_airport_code'] = departure 
                                 flight_details['arrival_airport_code'] = arrival
                                 flight_details['search_date'] = date_str
+                                normalize_flight(flight_details) # price_minor, departure_minutes, airline for indexed filtering
                                 
                                 self.scraped_flights.append(flight_details)
                                 processed_flight_ids.add(flight_id) # Mark as processed
@@ -540,9 +568,8 @@ class KayakFlightCrawler:
                 # --- Scrolling Logic (if needed) ---
                 logging.info("Scrolling down to check for more results...")
                 self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                time.sleep(3) # Wait for potential new content to load
-
-                new_height = self.driver.execute_script("return document.body.scrollHeight")
+                # Wait for potential new content to load; no growth within the timeout means the end of the results
+                new_height = wait_until(self.driver, scroll_height_grew(last_height), "scroll_load_more", timeout=5) or last_height
                 if new_height == last_height:
                     logging.info("Scroll height did not change. Assuming end of results.")
                     break # Exit outer loop if no more content loads
@@ -598,25 +625,8 @@ class KayakFlightCrawler:
             logging.error(f"Error saving data to {filename}: {e}")
 
     def _update_database(self, all_flights):
-        """Deletes all existing data and inserts the provided list of flights into MongoDB."""
-        if not all_flights:
-            logging.warning("No flights were accumulated, skipping database update.")
-            return
-
-        logging.info(f"\n{'='*30}\nAttempting final database update with {len(all_flights)} accumulated flights...\n{'='*30}")
-        try:
-            # 1. Delete ALL existing data in the collection
-            logging.info(f"Deleting ALL existing documents from collection: {self.db.name}...")
-            delete_result = self.db.delete_many({})
-            logging.info(f"Deleted {delete_result.deleted_count} documents.")
-
-            # 2. Insert all accumulated data
-            logging.info(f"Inserting {len(all_flights)} new documents...")
-            insert_result = self.db.insert_many(all_flights)
-            logging.info(f"Successfully inserted {len(insert_result.inserted_ids)} documents into MongoDB.")
-
-        except Exception as db_final_err:
-            logging.error(f"CRITICAL ERROR during final database update: {db_final_err}", exc_info=True)
+        """Replaces the flight collection with the provided list of flights (see update_flight_database)."""
+        update_flight_database(self.db, all_flights)
 
     def close_driver(self):
         """Closes the WebDriver."""
@@ -625,6 +635,128 @@ class KayakFlightCrawler:
             logging.info("WebDriver closed.")
 
 
+def update_flight_database(collection, all_flights):
+    """
+    Replaces the flight collection with the provided list of flights without an empty window.
+
+    The flights are written to a staging collection, which gets the app's indexes
+    (database/flight.py) before it is renamed over the live collection with dropTarget.
+    The rename is atomic, so readers see either the old snapshot or the new one. If anything
+    fails before the swap, the live collection is left untouched and the staging copy is dropped.
+    """
+    if not all_flights:
+        logging.warning("No flights were accumulated, skipping database update.")
+        return
+
+    logging.info(f"\n{'='*30}\nAttempting final database update with {len(all_flights)} accumulated flights...\n{'='*30}")
+    target_name = collection.name
+    staging = collection.database[f"{target_name}_staging_{int(time.time())}"]
+    try:
+        # 1. Load the new snapshot into a staging collection
+        logging.info(f"Inserting {len(all_flights)} new documents into staging collection {staging.name}...")
+        insert_result = staging.insert_many(all_flights)
+        logging.info(f"Inserted {len(insert_result.inserted_ids)} documents into {staging.name}.")
+
+        # 2. Build indexes before the swap, so the live collection never serves queries without them
+        if not FLIGHT_INDEXES:
+            logging.warning("Flight index definitions unavailable; the live collection will be swapped in without indexes.")
+        for index in FLIGHT_INDEXES:
+            staging.create_index(index["keys"], name=index["name"])
+        logging.info(f"Built {len(FLIGHT_INDEXES)} index(es) on {staging.name}.")
+
+        # 3. Atomically replace the live collection
+        staging.rename(target_name, dropTarget=True)
+        logging.info(f"Swapped {staging.name} into place as {target_name}.")
+    except Exception as db_final_err:
+        logging.error(f"CRITICAL ERROR during final database update, keeping the previous flight data: {db_final_err}", exc_info=True)
+        try:
+            staging.drop()
+        except Exception as drop_err:
+            logging.error(f"Could not drop staging collection {staging.name}: {drop_err}")
+        return
+
+    # 4. Tell the app's flight result cache that flight_data changed
+    if flight_cache is not None:
+        flight_cache.invalidate()
+        logging.info("Flight result cache invalidated.")
+
+
+def _scrape_job(departure, arrival, date_str, target_count, output_dir, headless):
+    """
+    Runs one (departure, date) scrape in its own browser and returns the deduplicated flights
+    together with the worker's wait timings (wait_utils.WaitTimings.as_dict()).
+    Executed in a worker process, so nothing is shared with other jobs but the output directory.
+    """
+    crawler = None
+    wait_timings.reset() # Pool workers are reused across jobs; report each job's waits once
+    try:
+        crawler = KayakFlightCrawler(output_dir=output_dir, headless=headless)
+        logging.info(f"Starting scrape for: {departure} -> {arrival} on {date_str}")
+        with wait_timings.timed("scrape_job"):
+            crawler.scrape_flights(departure, arrival, date_str, target_count=target_count)
+        return crawler.all_scraped_flights, wait_timings.as_dict()
+    finally:
+        if crawler is not None:
+            crawler.close_driver()
+
+
+def run_crawl_pool(departures, arrival, dates, target_count=20, workers=FLIGHT_SCRAPER_WORKERS,
+                   output_dir="scrapper/data/flights", headless=FLIGHT_SCRAPER_HEADLESS):
+    """
+    Scrapes every (departure, date) pair on a pool of isolated browser workers and merges the results.
+
+    Jobs are independent, so wall time is roughly ceil(jobs / workers) single scrapes instead of
+    their sum. Returns (flights, failed_jobs): the merged flights of the jobs that succeeded, in job
+    order, and the (departure, date) pairs whose job failed, so the caller can keep their previous
+    flights (previous_flights_for) before one update_flight_database call.
+
+    The workers' wait timings are merged, logged as per-step histograms, and saved to
+    wait_timings.json in output_dir.
+    """
+    jobs = [(departure, date_str) for departure in departures for date_str in dates]
+    workers = max(1, min(workers, len(jobs)))
+    results = {}
+    timings = WaitTimings()
+    logging.info(f"Running {len(jobs)} flight scrape job(s) on {workers} worker(s).")
+
+    # spawn: each worker starts a clean interpreter rather than forking a process that may hold driver/socket state
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = {
+            executor.submit(_scrape_job, departure, arrival, date_str, target_count, output_dir, headless): (departure, date_str)
+            for departure, date_str in jobs
+        }
+        for future in as_completed(futures):
+            departure, date_str = futures[future]
+            try:
+                results[(departure, date_str)], job_timings = future.result()
+                timings.merge(job_timings)
+                logging.info(f"Job {departure} -> {arrival} on {date_str} returned {len(results[(departure, date_str)])} flights.")
+            except Exception as e:
+                logging.error(f"Job {departure} -> {arrival} on {date_str} failed: {e}", exc_info=True)
+
+    timings.log_summary(f"Wait timings across {len(results)} flight scrape job(s)")
+    os.makedirs(output_dir, exist_ok=True)
+    timings.dump_json(os.path.join(output_dir, "wait_timings.json"))
+
+    failed_jobs = [job for job in jobs if job not in results]
+    if failed_jobs:
+        logging.warning(f"{len(failed_jobs)} of {len(jobs)} scrape job(s) failed: {failed_jobs}.")
+    return [flight for job in jobs for flight in results.get(job, [])], failed_jobs
+
+
+def previous_flights_for(collection, failed_jobs, arrival):
+    """
+    The flights currently stored for the given (departure, date) pairs, to carry over into the new
+    snapshot when their scrape failed, so a failed job does not empty that route until the next run.
+    """
+    flights = []
+    for departure, date_str in failed_jobs:
+        kept = list(collection.find({"departure_airport_code": departure, "arrival_airport_code": arrival, "search_date": date_str}))
+        logging.info(f"Keeping {len(kept)} previous flight(s) for {departure} -> {arrival} on {date_str} (scrape failed).")
+        flights.extend(kept)
+    return flights
+
+
 if __name__ == "__main__":
     DEPARTURE_AIRPORTS = ["HAN", "SGN"]
     # DEPARTURE_AIRPORTS = ["HAN"]
@@ -632,29 +764,28 @@ if __name__ == "__main__":
     ARRIVAL_AIRPORT = "DAD"
     TARGET_FLIGHT_COUNT_PER_RUN = 20 # Adjust as needed
 
-    crawler = KayakFlightCrawler()
-    # Get tomorrow and the day after
-    tomorrow_str, day_after_tomorrow_str = crawler._get_dates()
-    dates_to_scrape = [tomorrow_str, day_after_tomorrow_str]
+    parser = argparse.ArgumentParser(description="Scrape Kayak flights into flight_data.")
+    parser.add_argument("--workers", type=int, default=FLIGHT_SCRAPER_WORKERS, help="Parallel browser workers.")
+    parser.add_argument("--headless", action="store_true", default=FLIGHT_SCRAPER_HEADLESS, help="Run Chrome headless.")
+    args = parser.parse_args()
 
+    all_flights, failed_jobs = [], []
+    exit_code = 0
+    collection = get_flight_collection()
     try:
-        for departure in DEPARTURE_AIRPORTS:
-            for date_str in dates_to_scrape:
-                logging.info(f"""
-{'='*30}
-Starting scrape for: {departure} -> {ARRIVAL_AIRPORT} on {date_str}
-{'='*30}
-""")
-                crawler.scrape_flights(departure, ARRIVAL_AIRPORT, date_str, target_count=TARGET_FLIGHT_COUNT_PER_RUN)
-                time.sleep(5) # Add a small delay between requests
-
+        all_flights, failed_jobs = run_crawl_pool(DEPARTURE_AIRPORTS, ARRIVAL_AIRPORT, KayakFlightCrawler._get_dates(), target_count=TARGET_FLIGHT_COUNT_PER_RUN,
+                                                  workers=args.workers, headless=args.headless)
+        if failed_jobs:
+            all_flights += previous_flights_for(collection, failed_jobs, ARRIVAL_AIRPORT)
     except Exception as e:
         logging.critical(f"An error occurred in the main execution block: {e}", exc_info=True)
+        exit_code = 1
     finally:
-        # --- Final Database Update --- 
-        # Call the dedicated method to handle DB update
-        crawler._update_database(crawler.all_scraped_flights)
-        
-        # --- Close Driver --- 
-        crawler.close_driver()
+        # --- Final Database Update ---
+        # One swap with the merged results of every worker; the workers themselves never touch flight_data
+        update_flight_database(collection, all_flights)
         logging.info("Scraping process finished.")
+
+    if failed_jobs:
+        exit_code = 1 # Refreshed what it could, but the run (and the app's job for it) counts as failed
+    sys.exit(exit_code)
@@ -9,6 +9,7 @@ import json
 from collections import deque
 import re
 import os
+from wait_utils import wait_until, wait_timings, elements_present, scroll_height_grew
 
 class GoogleMapsCrawler:
     def __init__(self):
@@ -112,6 +113,7 @@ class GoogleMapsCrawler:
             self.crawl_keyword()
             
         self.driver.quit()
+        print(f"Wait timings for this crawl:\n{wait_timings.format_summary()}")
     
     def crawl_keyword(self):
         places = []
@@ -129,7 +131,7 @@ class GoogleMapsCrawler:
             search_box.send_keys(Keys.RETURN)
             
             # Wait for results to load
-            time.sleep(3)
+            wait_until(self.driver, elements_present(By.CSS_SELECTOR, "div.Nv2PK"), "search_results", timeout=10)
             
             scrolls = 0
             max_scrolls = 4  # Adjust this number to crawl more results
@@ -165,8 +167,11 @@ class GoogleMapsCrawler:
                         print(f"Processing {self.current_keyword}: {list_info['name']}")
                         
                         # Extract coordinates from URL after clicking
+                        url_before_click = self.driver.current_url
                         element.click()
-                        time.sleep(2)  # Wait for details panel to load
+                        # The place's coordinates (!3d/!4d) appear in the URL once its details panel loads
+                        wait_until(self.driver, lambda d: d.current_url != url_before_click and "!3d" in d.current_url,
+                                   "place_details_url", timeout=5)
                         
                         current_url = self.driver.current_url
                         lat = lon = ""
@@ -178,7 +183,6 @@ class GoogleMapsCrawler:
                             # Skip if we've already processed this location
                             if key in self.list_location_gotten:
                                 print(f"Already processed: {list_info['name']}")
-                                time.sleep(1)
                                 continue
                                 
                             self.list_location_gotten.add(key)
@@ -208,12 +212,9 @@ class GoogleMapsCrawler:
                         if place_data not in places:
                             places.append(place_data)
                             print(f"Added {self.current_keyword}: {place_data['name']}")
-                        
-                        time.sleep(1)  # Wait for list to reload
                     
                     except Exception as e:
                         print(f"Error processing {self.current_keyword}: {str(e)}")
-                        time.sleep(1)
                         continue
                 
                 # Scroll to load more results
@@ -221,20 +222,16 @@ class GoogleMapsCrawler:
                     # Find the results container and scroll it
                     results_container = self.driver.find_element(By.XPATH, "/html/body/div[1]/div[3]/div[8]/div[9]/div/div/div[1]/div[2]/div/div[1]/div/div/div[1]/div[1]")
                     last_height = self.driver.execute_script("return arguments[0].scrollHeight", results_container)
-                    self.driver.execute_script("arguments[0].scrollTo(0, arguments[0].scrollHeight);", results_container)
-                    time.sleep(2)
-                    
-                    # Check if we've reached the end of the scroll
-                    new_height = self.driver.execute_script("return arguments[0].scrollHeight", results_container)
+                    new_height = None
                     i = 0
-                    while new_height == last_height and i < 3:
+                    # Scroll and wait for the list to grow, re-scrolling up to 3 more times before giving up
+                    while new_height is None and i < 4:
                         self.driver.execute_script("arguments[0].scrollTo(0, arguments[0].scrollHeight);", results_container)
-                        time.sleep(2)
+                        new_height = wait_until(self.driver, scroll_height_grew(last_height, results_container), "scroll_load_more", timeout=2)
                         i += 1  # Increment counter
-                        # Check if we've reached the end of the scroll
-                        new_height = self.driver.execute_script("return arguments[0].scrollHeight", results_container)
 
-                    if new_height == last_height:
+                    # Check if we've reached the end of the scroll
+                    if new_height is None:
                         print("Reached end of results or couldn't scroll further")
                         break
                 except Exception as e:
@@ -12,6 +12,7 @@ import json
 import re
 import os
 import logging # Import logging
+from wait_utils import wait_until, wait_timings, document_ready, element_displayed, element_gone, scroll_height_grew
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -34,23 +35,23 @@ class BedlinkerCrawler:
         """Searches for the specified location on the page."""
         logging.info(f"Searching for location: {self.location_name}")
         try:
-            # Increase initial delay after page load
-            time.sleep(5) # Allow more time for page elements to settle
+            wait_until(self.driver, document_ready, "page_ready", timeout=20)
 
             # Wait for the location selection trigger div (using text content)
             
             location_trigger_xpath = "/html/body/div/div/main/div/div[1]/div/div[1]/div/div[1]/div[1]/div/div/div/div/span[1]/input"
             logging.info(f"Waiting for search trigger visibility: {location_trigger_xpath}")
             # Wait for visibility first
-            search_trigger_visible = self.wait.until(
-                EC.visibility_of_element_located((By.XPATH, location_trigger_xpath))
-            )
+            search_trigger_visible = wait_until(self.driver, EC.visibility_of_element_located((By.XPATH, location_trigger_xpath)),
+                                                "search_input", timeout=20, raise_on_timeout=True)
             logging.info("Search trigger div visible.")
 
             search_trigger_visible.send_keys(self.location_name)
             # search_trigger_visible.send_keys(Keys.RETURN)   
 
-            time.sleep(2) # Short wait for input to appear
+            # Wait for the autocomplete suggestions before picking the first one
+            wait_until(self.driver, EC.visibility_of_element_located((By.XPATH, "//div[contains(@class, 'ant-select-item-option')]")),
+                       "location_suggestions", timeout=5)
 
             ActionChains(self.driver)\
                 .key_down(Keys.ARROW_DOWN)\
@@ -63,13 +64,10 @@ class BedlinkerCrawler:
             # )
             # logging.info("Search trigger div visible.")
             # select_location.click()
-            time.sleep(2)
 
-            submit_location = self.wait.until(
-                EC.element_to_be_clickable((By.XPATH, "/html/body/div[1]/div/main/div/div[1]/div/div[1]/div/div[1]/div[7]/button"))
-            )
-            submit_location.click()
-            time.sleep(5)
+            submit_location = wait_until(self.driver, EC.element_to_be_clickable((By.XPATH, "/html/body/div[1]/div/main/div/div[1]/div/div[1]/div/div[1]/div[7]/button")),
+                                         "search_submit", timeout=20, raise_on_timeout=True)
+            submit_location.click() # start_crawl waits for the hotel cards of the results
 
             # # Then wait for clickability
             # logging.info(f"Waiting for search trigger clickability: {location_trigger_xpath}")
@@ -191,15 +189,16 @@ class BedlinkerCrawler:
             detail_button = list_card_element.find_element(By.XPATH, detail_button_xpath)
             # Scroll button into view if necessary
             self.driver.execute_script("arguments[0].scrollIntoViewIfNeeded(true);", detail_button)
-            time.sleep(0.5)
+            wait_until(self.driver, EC.element_to_be_clickable(detail_button), "detail_button_clickable", timeout=2)
             detail_button.click()
             # print(f"Clicked 'Chi tiết' for {list_card_element.find_element(By.CSS_SELECTOR, 'span.ant-typography[style*=\"font-size: 20px\"]').text}") # Log which hotel detail is opened
-            time.sleep(1) # Allow modal transition
 
             # Wait for the detail card to be visible and find description
             detail_card_xpath = "/html/body/div[1]/div/main/div/div[2]"
-            detail_card = self.detail_wait.until(EC.visibility_of_element_located((By.XPATH, detail_card_xpath)))
-            time.sleep(1) # Extra wait for content rendering within the modal
+            detail_card = wait_until(self.driver, EC.visibility_of_element_located((By.XPATH, detail_card_xpath)),
+                                     "detail_card_open", timeout=15, raise_on_timeout=True)
+            # Content renders into the modal after it opens
+            wait_until(self.driver, lambda d: detail_card.text.strip(), "detail_card_render", timeout=3)
 
             try:
                  # More specific selector for description within the detail card's body
@@ -223,7 +222,7 @@ class BedlinkerCrawler:
             close_button = self.detail_wait.until(EC.element_to_be_clickable((By.XPATH, close_button_xpath)))
             close_button.click()
             print("Clicked close button on detail card.")
-            time.sleep(1.5) # Wait for modal to close and list view to stabilize
+            wait_until(self.driver, element_gone(detail_card), "detail_card_close", timeout=5)
 
         except TimeoutException:
             print("Error: Timed out waiting for detail card or close button.")
@@ -234,7 +233,7 @@ class BedlinkerCrawler:
                 if self.driver.find_elements(By.XPATH, close_button_xpath):
                     print("Attempting to force close detail card...")
                     self.driver.find_element(By.XPATH, close_button_xpath).click()
-                    time.sleep(1)
+                    wait_until(self.driver, EC.invisibility_of_element_located((By.XPATH, close_button_xpath)), "detail_card_force_close", timeout=5)
             except Exception as close_err:
                 print(f"Could not force close detail card: {close_err}")
 
@@ -255,9 +254,8 @@ class BedlinkerCrawler:
             print(f"Scrolling down. Current scrollHeight: {last_height}")
 
             self.driver.execute_script("arguments[0].scrollTo(0, arguments[0].scrollHeight);", scroll_pane)
-            time.sleep(5) # Crucial: Wait for content to load after scroll
-
-            new_height = self.driver.execute_script("return arguments[0].scrollHeight", scroll_pane)
+            # Wait for content to load after scroll; no growth within the timeout means the end of the list
+            new_height = wait_until(self.driver, scroll_height_grew(last_height, scroll_pane), "scroll_load_more", timeout=5) or last_height
             print(f"New scrollHeight after scroll: {new_height}")
 
             if new_height == last_height:
@@ -318,7 +316,7 @@ class BedlinkerCrawler:
                         if not card.is_displayed():
                              print(f"Card {card_index + 1} is not visible, scrolling slightly.")
                              self.driver.execute_script("arguments[0].scrollIntoViewIfNeeded(true);", card)
-                             time.sleep(0.5)
+                             wait_until(self.driver, element_displayed(card), "card_scroll_into_view", timeout=2)
                              # Re-check visibility after scroll
                              if not card.is_displayed():
                                  print(f"Card {card_index + 1} still not visible after scroll. Skipping.")
@@ -388,6 +386,7 @@ class BedlinkerCrawler:
             self.save_results() # Save whatever was collected
             self.driver.quit()
             print("WebDriver closed.")
+            print(f"Wait timings for this crawl:\n{wait_timings.format_summary()}")
 
     def save_results(self):
         """Saves the scraped data to a JSON file."""
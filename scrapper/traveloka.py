@@ -4,7 +4,6 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.common.action_chains import ActionChains
 from selenium.webdriver.support import expected_conditions as EC
-from time import sleep
 import datetime
 import pandas as pd
 import glob
@@ -13,6 +12,7 @@ import re
 import pickle
 import os
 import dotenv
+from wait_utils import wait_until, wait_timings, elements_present, element_gone
 
 dotenv.load_dotenv()
 
@@ -46,7 +46,9 @@ class TravelokaCrawler:
             #     driver.add_cookie(cookie)
             for url in url_list:
                 self.driver.get(url)
-                sleep(5)
+                # The page height below is only meaningful once the flight cards have rendered
+                wait_until(self.driver, elements_present(By.XPATH, "//div[@class='css-1dbjc4n r-9nbb9w r-otx420 r-1i1ao36 r-1x4r79x']"),
+                           "flight_cards", timeout=50)
                 wait = WebDriverWait(self.driver, 50)
                 df = pd.DataFrame(columns=['brand', 'flight_id', 'price',
                                             'start_time', 'start_day',
@@ -124,19 +126,17 @@ class TravelokaCrawler:
                         # Wait for element to be clickable
                         # wait.until(EC.element_to_be_clickable(j))
                         # Single click action with ActionChains
-                        ActionChains(self.driver).move_to_element(j).click().perform()
-                        # Add small delay to let the click action complete
-                        sleep(0.5)
+                        ActionChains(self.driver).move_to_element(j).click().perform() # The detail wait below covers the expand
                     except TimeoutException:
                         print(f"Element {i} not clickable, skipping...")
                         continue
                     old_element.append(elements[i])
                 
-                    start_time_elements = wait.until(EC.visibility_of_element_located((
+                    start_time_elements = wait_until(self.driver, EC.visibility_of_element_located((
                         By.XPATH, 
                         "//div[@class='css-1dbjc4n r-e8mqni r-1d09ksm r-1h0z5md r-ttb5dx']" \
                         "//div[@class='css-901oao r-a5wbuh r-1b43r93 r-majxgm r-rjixqe r-5oul0u r-fdjqy7']"
-                        )))
+                        )), "flight_detail_open", timeout=50, raise_on_timeout=True)
 
                     start_time.append(start_time_elements.text)
                     print(start_time_elements.text)
@@ -215,13 +215,14 @@ class TravelokaCrawler:
                     brand = []
                     flight_id = []
                     j.click()
-                    sleep(1)
+                    wait_until(self.driver, element_gone(start_time_elements), "flight_detail_close", timeout=5)
                 new_url = url[53:]
                 df.to_csv(f"../data/PlaneTrip_{new_url}.csv", index=False)
                 df_by_url[new_url] = df
             return df_by_url
         finally:
             self.driver.quit()
+            print(f"Wait timings for this crawl:\n{wait_timings.format_summary()}")
 
     def preprocessing_data(self, df_by_url):
         process_data = {}
@@ -0,0 +1,190 @@
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from selenium.common.exceptions import NoSuchElementException, StaleElementReferenceException, TimeoutException
+
+# Shared wait helper for the Selenium scrapers: instead of a fixed time.sleep after every click,
+# scroll or navigation, poll the DOM condition the sleep was standing in for, starting fast and
+# backing off, and record how long each wait really took so crawl time can be broken down by step.
+
+# Upper bounds (seconds) of the histogram buckets; the last bucket counts everything slower
+HISTOGRAM_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 30)
+
+
+class WaitTimings:
+    """Per-step wait durations for one process, kept as fixed-bucket histograms. Safe to record from several threads."""
+
+    def __init__(self, buckets=HISTOGRAM_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.steps = {}
+        self._lock = threading.Lock()
+
+    def _step(self, step):
+        if step not in self.steps:
+            self.steps[step] = {"count": 0, "timeouts": 0, "total": 0.0, "max": 0.0, "histogram": [0] * (len(self.buckets) + 1)}
+        return self.steps[step]
+
+    def record(self, step, seconds, timed_out=False):
+        bucket = next((i for i, bound in enumerate(self.buckets) if seconds <= bound), len(self.buckets))
+        with self._lock:
+            stats = self._step(step)
+            stats["count"] += 1
+            stats["timeouts"] += 1 if timed_out else 0
+            stats["total"] += seconds
+            stats["max"] = max(stats["max"], seconds)
+            stats["histogram"][bucket] += 1
+
+    @contextmanager
+    def timed(self, step):
+        """Times a block that is not a wait (a whole page, a deliberate delay) under the given step name."""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record(step, time.monotonic() - start)
+
+    def as_dict(self):
+        return {"buckets": list(self.buckets), "steps": {step: dict(stats, histogram=list(stats["histogram"])) for step, stats in self.steps.items()}}
+
+    def merge(self, data):
+        """Adds the histograms from another process's as_dict() (e.g. a crawl worker) into this one."""
+        if not data or tuple(data.get("buckets", ())) != self.buckets:
+            return
+        with self._lock:
+            for step, other in data["steps"].items():
+                stats = self._step(step)
+                for key in ("count", "timeouts", "total"):
+                    stats[key] += other[key]
+                stats["max"] = max(stats["max"], other["max"])
+                stats["histogram"] = [a + b for a, b in zip(stats["histogram"], other["histogram"])]
+
+    def reset(self):
+        self.steps = {}
+
+    def format_summary(self):
+        """A table of steps by total time spent, with each step's duration histogram."""
+        if not self.steps:
+            return "No waits recorded."
+        labels = [f"<={bound:g}s" for bound in self.buckets] + [f">{self.buckets[-1]:g}s"]
+        lines = [f"{'step':32} {'count':>6} {'timeouts':>8} {'total s':>9} {'mean s':>7} {'max s':>7}  " + " ".join(f"{label:>7}" for label in labels)]
+        for step, stats in sorted(self.steps.items(), key=lambda item: item[1]["total"], reverse=True):
+            mean = stats["total"] / stats["count"] if stats["count"] else 0.0
+            lines.append(
+                f"{step[:32]:32} {stats['count']:>6} {stats['timeouts']:>8} {stats['total']:>9.2f} {mean:>7.2f} {stats['max']:>7.2f}  "
+                + " ".join(f"{count:>7}" for count in stats["histogram"])
+            )
+        return "\n".join(lines)
+
+    def log_summary(self, title="Wait timings"):
+        logging.info(f"{title}:\n{self.format_summary()}")
+
+    def dump_json(self, path):
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(self.as_dict(), f, indent=2)
+        except IOError as e:
+            logging.error(f"Error saving wait timings to {path}: {e}")
+
+
+# One registry per process; scrapers record into it and print/dump it when a crawl finishes
+wait_timings = WaitTimings()
+
+
+def wait_until(driver, condition, step, timeout=10, poll=0.05, max_poll=1.0, backoff=1.6,
+               ignored_exceptions=(NoSuchElementException, StaleElementReferenceException),
+               raise_on_timeout=False, timings=None):
+    """
+    Polls condition(driver) until it returns a truthy value, which is returned.
+
+    The first check is immediate, then the poll interval grows from poll by backoff up to max_poll,
+    so fast pages cost milliseconds and slow ones are not hammered. ignored_exceptions raised by the
+    condition count as "not yet". On timeout returns None, or raises TimeoutException when
+    raise_on_timeout is set (for waits the caller already handles as a failure). Each call is
+    recorded under step in timings (the process-wide wait_timings by default).
+    """
+    timings = timings or wait_timings
+    start = time.monotonic()
+    deadline = start + timeout
+    interval = poll
+    while True:
+        try:
+            value = condition(driver)
+        except ignored_exceptions:
+            value = None
+        now = time.monotonic()
+        if value:
+            timings.record(step, now - start)
+            return value
+        if now >= deadline:
+            timings.record(step, now - start, timed_out=True)
+            if raise_on_timeout:
+                raise TimeoutException(f"Timed out after {timeout}s waiting for {step}")
+            logging.debug(f"Wait for {step} timed out after {timeout}s; continuing.")
+            return None
+        time.sleep(min(interval, deadline - now))
+        interval = min(interval * backoff, max_poll)
+
+
+def pause(step, seconds, timings=None):
+    """A deliberate delay (rate limiting, anti-bot jitter) rather than a wait for the page; still recorded."""
+    with (timings or wait_timings).timed(step):
+        time.sleep(seconds)
+
+
+# --- Conditions (callables taking the driver, for wait_until) ---
+
+def document_ready(driver):
+    return driver.execute_script("return document.readyState") == "complete"
+
+
+def scroll_height_grew(last_height, scroll_pane=None):
+    """
+    The new scrollHeight once the page (or scroll_pane element) has grown past last_height,
+    i.e. more results were appended after scrolling.
+    """
+    def condition(driver):
+        if scroll_pane is None:
+            height = driver.execute_script("return document.body.scrollHeight")
+        else:
+            height = driver.execute_script("return arguments[0].scrollHeight", scroll_pane)
+        return height if height > last_height else None
+    return condition
+
+
+def elements_present(by, value, root=None):
+    """The matching elements (under root if given) once there is at least one."""
+    def condition(driver):
+        return (root or driver).find_elements(by, value) or None
+    return condition
+
+
+def element_text(by, value, root=None):
+    """The element's stripped text once it has rendered some."""
+    def condition(driver):
+        return (root or driver).find_element(by, value).text.strip() or None
+    return condition
+
+
+def element_gone(element):
+    """True once a previously found element is hidden or detached (a closed modal or popup)."""
+    def condition(driver):
+        try:
+            return not element.is_displayed()
+        except StaleElementReferenceException:
+            return True
+    return condition
+
+
+def element_displayed(element):
+    def condition(driver):
+        return element.is_displayed()
+    return condition
+
+
+def url_changed(old_url):
+    def condition(driver):
+        return driver.current_url != old_url
+    return condition
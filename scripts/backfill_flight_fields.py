@@ -0,0 +1,69 @@
+"""
+One-off migration: adds the normalised flight fields (services/flight_fields.py) to flight_data
+documents scraped before the scraper started writing them.
+
+Usage (from the project root):
+    python scripts/backfill_flight_fields.py            # only documents missing a field
+    python scripts/backfill_flight_fields.py --all      # recompute every document
+    python scripts/backfill_flight_fields.py --dry-run  # report without writing
+"""
+import argparse
+import os
+import sys
+
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_ROOT)
+
+from database.flight import db as flight_collection, ensure_flight_indexes
+from services.flight_fields import NORMALIZED_FLIGHT_FIELDS, normalized_flight_fields
+
+# Only the display strings the normalised fields are derived from
+SOURCE_PROJECTION = {"price": 1, "flight_id": 1, "flight_time": 1, "departure_time": 1, "arrival_time": 1, "search_date": 1}
+
+
+def backfill_flight_fields(collection=flight_collection, recompute_all=False, batch_size=500, dry_run=False):
+    """Sets the normalised fields on matching documents with batched bulk writes. Returns a stats dict."""
+    query = {} if recompute_all else {"$or": [{field: {"$exists": False}} for field in NORMALIZED_FLIGHT_FIELDS]}
+    stats = {"scanned": 0, "updated": 0, "unparsed_price": 0, "unparsed_departure": 0}
+    pending = []
+
+    def flush():
+        if pending and not dry_run:
+            result = collection.bulk_write(pending, ordered=False)
+            stats["updated"] += result.modified_count
+        elif pending:
+            stats["updated"] += len(pending)
+        pending.clear()
+
+    for document in collection.find(query, SOURCE_PROJECTION):
+        stats["scanned"] += 1
+        fields = normalized_flight_fields(document)
+        if fields["price_minor"] is None:
+            stats["unparsed_price"] += 1
+        if fields["departure_minutes"] is None:
+            stats["unparsed_departure"] += 1
+        pending.append(UpdateOne({"_id": document["_id"]}, {"$set": fields}))
+        if len(pending) >= batch_size:
+            flush()
+    flush()
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill normalised price/time/duration fields on flight_data.")
+    parser.add_argument("--all", action="store_true", help="Recompute the fields on every document, not only incomplete ones.")
+    parser.add_argument("--batch-size", type=int, default=500, help="Updates per bulk write.")
+    parser.add_argument("--dry-run", action="store_true", help="Count the documents that would change without writing.")
+    args = parser.parse_args()
+
+    try:
+        result_stats = backfill_flight_fields(recompute_all=args.all, batch_size=args.batch_size, dry_run=args.dry_run)
+        print(f"Backfill {'(dry run) ' if args.dry_run else ''}finished: {result_stats}")
+        if not args.dry_run:
+            ensure_flight_indexes()
+    except PyMongoError as e:
+        print(f"Error backfilling flight_data: {e}")
+        sys.exit(1)
@@ -0,0 +1,126 @@
+"""
+Micro-benchmark of services/date_parser.parse_flight_date against the strptime-loop
+parse_date_string it replaced (kept below as legacy_parse_date_string).
+
+Reports per-call latency for the legacy function, the new parser without its lru_cache, and the
+cached path, and checks that the new parser agrees with every date the legacy one could parse.
+
+Usage (from the project root):
+    python scripts/benchmark_date_parser.py --runs 2000
+"""
+import argparse
+import contextlib
+import io
+import os
+import re
+import sys
+import time
+from datetime import date, datetime
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_ROOT)
+
+from services.date_parser import parse_flight_date, _parse_folded
+from services.geocode_cache import normalize_place_name
+
+CORPUS = [
+    "25/04/2025", "2025-04-25", "April 25, 2025", "Apr 25, 2025", "25 Apr 2025", "25 April 2025",
+    "25/04", "Apr 26", "April 26", "27 Apr", "27 April", "May 10", "15/11",
+    "19th April 2025", "19th April", "April 19th", "May 1st", "invalid-date", "Mon, May 12",
+    "tomorrow", "next Friday", "ngày 19 tháng 4", "thứ sáu tới", "in 3 days",
+]
+FIXED_TODAY = date(2025, 5, 14)
+
+
+def legacy_parse_date_string(date_str: str) -> str | None:
+    """Copy of the previous services/flight_picking.parse_date_string, kept as the benchmark baseline."""
+    date_str = date_str.strip()
+    DEFAULT_YEAR = 2025
+    formats_to_try = [
+        ("%d/%m/%Y", False),
+        ("%Y-%m-%d", False),
+        ("%b %d, %Y", False),
+        ("%B %d, %Y", False),
+        ("%d %b %Y", False),
+        ("%d %B %Y", False),
+        ("%d/%m", True),
+        ("%b %d", True),
+        ("%B %d", True),
+        ("%d %b", True),
+        ("%d %B", True),
+    ]
+
+    for fmt, assume_default_year in formats_to_try:
+        try:
+            date_obj = datetime.strptime(date_str, fmt)
+            if assume_default_year:
+                date_obj = date_obj.replace(year=DEFAULT_YEAR)
+            return date_obj.strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+
+    date_str_cleaned = re.sub(r"(\d+)(st|nd|rd|th)", r"\\1", date_str, flags=re.IGNORECASE)
+    if date_str_cleaned != date_str:
+        for fmt, assume_default_year in formats_to_try:
+            try:
+                date_obj = datetime.strptime(date_str_cleaned, fmt)
+                if assume_default_year:
+                    date_obj = date_obj.replace(year=DEFAULT_YEAR)
+                return date_obj.strftime("%Y-%m-%d")
+            except ValueError:
+                continue
+
+    print(f"Warning: Could not parse date string '{date_str}' with known formats.")
+    return None
+
+
+def uncached_parse(text):
+    return _parse_folded.__wrapped__(normalize_place_name(text), FIXED_TODAY.isoformat())
+
+
+def cached_parse(text):
+    return parse_flight_date(text, today=FIXED_TODAY)
+
+
+def time_per_call_us(parse, runs):
+    """Mean microseconds per call over runs passes of the corpus (legacy warnings are discarded)."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        for _ in range(runs):
+            for text in CORPUS:
+                parse(text)
+        elapsed = time.perf_counter() - start
+    return elapsed / (runs * len(CORPUS)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the flight date parser against the legacy strptime loop.")
+    parser.add_argument("--runs", type=int, default=1000, help="Passes over the input corpus per parser.")
+    args = parser.parse_args()
+
+    print(f"{'input':26} {'legacy':>12} {'new':>12}")
+    disagreements = 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        legacy_results = [legacy_parse_date_string(text) for text in CORPUS]
+    for text, legacy_result in zip(CORPUS, legacy_results):
+        new_result = uncached_parse(text)
+        marker = ""
+        if legacy_result is not None and legacy_result != new_result:
+            disagreements += 1
+            marker = "  <-- differs"
+        print(f"{text:26} {str(legacy_result):>12} {str(new_result):>12}{marker}")
+
+    legacy_us = time_per_call_us(legacy_parse_date_string, args.runs)
+    uncached_us = time_per_call_us(uncached_parse, args.runs)
+    cached_us = time_per_call_us(cached_parse, args.runs)
+    print(f"\nPer call over {len(CORPUS)} inputs x {args.runs} runs:")
+    print(f"  legacy strptime loop : {legacy_us:8.2f} us")
+    print(f"  tokenising parser    : {uncached_us:8.2f} us ({legacy_us / uncached_us:.1f}x faster)")
+    print(f"  tokenising + cache   : {cached_us:8.2f} us ({legacy_us / cached_us:.1f}x faster)")
+    print(f"Disagreements on dates the legacy parser understood: {disagreements}")
+    if disagreements:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
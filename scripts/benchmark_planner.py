@@ -0,0 +1,283 @@
+"""
+Benchmarks services/tsp_algorithm.optimize_distance_tour on synthetic catalogs.
+
+Runs the create and modify paths for every (catalog size, trip length) pair, with and
+without custom stops that need geocoding, and writes p50/p95 latency plus route km to JSON.
+
+Usage (from the project root):
+    python scripts/benchmark_planner.py --sizes 1000,10000,100000 --days 1,7,30 --runs 5
+    python scripts/benchmark_planner.py --output new.json --compare old.json
+    python scripts/benchmark_planner.py --sizes 1000 --days 1,7,30 --candidates 4,8
+
+With --candidates, plan_best_itinerary's candidate step is also timed in-process and on the warm shared
+process pool, to choose PLANNER_PARALLEL_MIN_CANDIDATE_DAYS for the host.
+
+Geocoding is stubbed with a fixed latency (--geocode-latency-ms) unless --live-geocoding is set,
+in which case custom stops go through the real Google Maps lookup and its caches.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import zlib
+
+import numpy as np
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_ROOT)
+
+import services.tsp_algorithm as tsp_algorithm
+from services.planner_catalog import PlannerCatalog
+
+# Loose Da Nang bounding box for synthetic coordinates.
+LAT_RANGE = (15.95, 16.15)
+LON_RANGE = (108.15, 108.30)
+SLOT_CHOICES = ["morning", "afternoon", "evening"]
+NUM_CUSTOM_STOPS = 5
+
+
+def build_synthetic_catalog(num_places, seed):
+    """Builds a PlannerCatalog with num_places must-visit places, a third as many restaurants and some hotels."""
+    rng = random.Random(seed)
+
+    def coords():
+        return (round(rng.uniform(*LAT_RANGE), 6), round(rng.uniform(*LON_RANGE), 6))
+
+    must_visit_places = [
+        {
+            "place": f"Synthetic Place {i}",
+            "location": coords(),
+            "priority": rng.choice([1, 2, 3]),
+            "times": set(rng.sample(SLOT_CHOICES, rng.randint(1, len(SLOT_CHOICES)))),
+            "description": f"Synthetic attraction number {i}.",
+        }
+        for i in range(num_places)
+    ]
+    restaurants = [
+        {"place": f"Synthetic Restaurant {i}", "location": coords(), "description": f"Synthetic restaurant number {i}."}
+        for i in range(max(1, num_places // 3))
+    ]
+    hotels = [
+        {"place": f"Synthetic Hotel {i}", "location": coords(), "description": f"Synthetic hotel number {i}."}
+        for i in range(max(10, num_places // 100))
+    ]
+    return PlannerCatalog(must_visit_places, restaurants, hotels)
+
+
+def make_geocode_stub(latency_seconds):
+    """Replacement for get_place_coords_if_in_da_nang that sleeps like a network call and always succeeds."""
+    def geocode_stub(place_name, api_key=None, address=None, use_cache=True):
+        time.sleep(latency_seconds)
+        digest = zlib.crc32(place_name.encode("utf-8")) # Stable across runs, unlike hash()
+        return {
+            "name": place_name,
+            "location": (LAT_RANGE[0] + (digest % 1000) / 5000, LON_RANGE[0] + (digest // 1000 % 1000) / 7000),
+            "description": f"User-specified visit: {place_name}",
+            "type": "custom_verified",
+        }
+    return geocode_stub
+
+
+def make_custom_stops(days, run_index):
+    """Custom stops unknown to every dataset, so each one needs a geocoding lookup."""
+    return [
+        {
+            "name": f"Benchmark Custom Stop {run_index}-{i}",
+            "day": (i % days) + 1,
+            "time_of_day": SLOT_CHOICES[i % len(SLOT_CHOICES)],
+            "address": f"{i} Benchmark Street, Da Nang",
+        }
+        for i in range(NUM_CUSTOM_STOPS)
+    ]
+
+
+def total_route_km(plan):
+    if not plan:
+        return 0.0
+    return sum(stop.get("distance_from_previous_km", 0.0) for day in plan.get("daily_plans", []) for stop in day.get("route", []))
+
+
+def time_planner_call(**kwargs):
+    """Runs one planner call with its (very chatty) stdout discarded. Returns (seconds, result)."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        result = tsp_algorithm.optimize_distance_tour(**kwargs)
+        elapsed = time.perf_counter() - start
+    return elapsed, result
+
+
+def run_case(catalog, path, days, with_geocoding, runs, seed):
+    """Times one benchmark case and returns its summary dict."""
+    durations, route_km = [], []
+    for run_index in range(runs):
+        run_seed = seed + run_index
+        stops = make_custom_stops(days, run_index) if with_geocoding else None
+        previous_plan = None
+        if path == "modify":
+            # Untimed base plan, then the timed modification on top of it.
+            _, base = time_planner_call(travel_duration_str=days, seed=run_seed, catalog=catalog)
+            previous_plan = base["plan"]
+            if stops is None:
+                stops = [
+                    {"name": catalog.must_visit_places[(run_index * 7 + i) % len(catalog.must_visit_places)]["place"],
+                     "day": (i % days) + 1, "time_of_day": "afternoon"}
+                    for i in range(2)
+                ]
+        elapsed, result = time_planner_call(
+            travel_duration_str=days,
+            user_specified_stops_for_modification=stops,
+            previous_base_plan_data=previous_plan,
+            seed=run_seed,
+            catalog=catalog,
+        )
+        if result.get("plan") is None:
+            raise RuntimeError(f"Planner returned no plan for {path}/{days}d: {result.get('message')}")
+        durations.append(elapsed * 1000)
+        route_km.append(total_route_km(result["plan"]))
+
+    return {
+        "runs": runs,
+        "p50_ms": round(float(np.percentile(durations, 50)), 3),
+        "p95_ms": round(float(np.percentile(durations, 95)), 3),
+        "mean_ms": round(float(np.mean(durations)), 3),
+        "mean_route_km": round(float(np.mean(route_km)), 2),
+    }
+
+
+def run_candidate_case(days, num_candidates, runs, seed):
+    """Times planning num_candidates candidates in-process and on the shared pool. Returns its summary dict."""
+    candidate_args = [(days, [], None, seed + i) for i in range(num_candidates)]
+    timings = {"in_process": [], "pool": []}
+    pool = tsp_algorithm.get_candidate_pool()
+    for _ in range(runs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            [tsp_algorithm._plan_candidate(args) for args in candidate_args]
+            timings["in_process"].append((time.perf_counter() - start) * 1000)
+            start = time.perf_counter()
+            list(pool.map(tsp_algorithm._plan_candidate, candidate_args))
+            timings["pool"].append((time.perf_counter() - start) * 1000)
+    summary = {f"{mode}_p50_ms": round(float(np.percentile(values, 50)), 3) for mode, values in timings.items()}
+    summary["pool_workers"] = tsp_algorithm.PLANNER_POOL_WORKERS
+    summary["uses_pool_by_default"] = tsp_algorithm.use_candidate_pool(num_candidates, days)
+    return summary
+
+
+def start_candidate_pool(catalog):
+    """A fresh, warmed-up shared pool whose (forked) workers plan on the synthetic catalog."""
+    tsp_algorithm.get_planner_catalog = lambda: catalog
+    tsp_algorithm._discard_candidate_pool(tsp_algorithm.get_candidate_pool())
+    warm_up = [(1, [], None, seed) for seed in range(2 * tsp_algorithm.PLANNER_POOL_WORKERS)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        list(tsp_algorithm.get_candidate_pool().map(tsp_algorithm._plan_candidate, warm_up))
+
+
+def case_key(path, num_places, days, with_geocoding):
+    return f"{path}|places={num_places}|days={days}|geocoding={'yes' if with_geocoding else 'no'}"
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_results(current, baseline_path):
+    """Prints the p50/p95 change of every case that also exists in the baseline file."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    baseline_cases = baseline.get("results", {})
+    print(f"\nComparison against {baseline_path} (revision {baseline.get('meta', {}).get('git_revision')}):")
+    print(f"{'case':60} {'p50 ms':>18} {'p95 ms':>18} {'km':>14}")
+    for key, result in current["results"].items():
+        old = baseline_cases.get(key)
+        if not old:
+            continue
+
+        def delta(field):
+            if not old.get(field):
+                return f"{result[field]:.1f}"
+            return f"{result[field]:.1f} ({(result[field] - old[field]) / old[field] * 100:+.0f}%)"
+
+        print(f"{key:60} {delta('p50_ms'):>18} {delta('p95_ms'):>18} {delta('mean_route_km'):>14}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Da Nang trip planner on synthetic catalogs.")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Comma-separated catalog sizes (number of places).")
+    parser.add_argument("--days", default="1,3,7,30", help="Comma-separated trip lengths in days.")
+    parser.add_argument("--runs", type=int, default=5, help="Timed runs per case.")
+    parser.add_argument("--seed", type=int, default=1234, help="Base seed for catalogs and plans.")
+    parser.add_argument("--paths", default="create,modify", help="Planner paths to time: create, modify or both.")
+    parser.add_argument("--geocode-latency-ms", type=float, default=100.0, help="Simulated latency of one stubbed geocoding call.")
+    parser.add_argument("--live-geocoding", action="store_true", help="Use the real geocoding service instead of the stub.")
+    parser.add_argument("--output", default="planner_benchmark.json", help="Where to write the JSON results.")
+    parser.add_argument("--compare", help="Earlier results file to compare against.")
+    parser.add_argument("--candidates", default="", help="Comma-separated candidate counts to time in-process vs on the process pool.")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    day_counts = [int(days) for days in args.days.split(",") if days]
+    candidate_counts = [int(count) for count in args.candidates.split(",") if count]
+    paths = [path.strip() for path in args.paths.split(",") if path.strip()]
+
+    if not args.live_geocoding:
+        tsp_algorithm.get_place_coords_if_in_da_nang = make_geocode_stub(args.geocode_latency_ms / 1000)
+    # Load the gazetteer up front so its one-off file read is not timed.
+    with contextlib.redirect_stdout(io.StringIO()):
+        tsp_algorithm.gazetteer.lookup("warm up")
+
+    output = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+        "catalog_build_ms": {},
+        "results": {},
+        "candidate_results": {},
+    }
+
+    for num_places in sizes:
+        start = time.perf_counter()
+        catalog = build_synthetic_catalog(num_places, args.seed)
+        output["catalog_build_ms"][str(num_places)] = round((time.perf_counter() - start) * 1000, 3)
+        print(f"Catalog with {num_places} places built in {output['catalog_build_ms'][str(num_places)]} ms")
+
+        for days in day_counts:
+            for path in paths:
+                for with_geocoding in (False, True):
+                    key = case_key(path, num_places, days, with_geocoding)
+                    result = run_case(catalog, path, days, with_geocoding, args.runs, args.seed)
+                    output["results"][key] = result
+                    print(f"{key:60} p50={result['p50_ms']:.1f}ms p95={result['p95_ms']:.1f}ms km={result['mean_route_km']}")
+
+        if candidate_counts:
+            start_candidate_pool(catalog)
+            for days in day_counts:
+                for num_candidates in candidate_counts:
+                    key = f"candidates|places={num_places}|days={days}|n={num_candidates}"
+                    result = run_candidate_case(days, num_candidates, args.runs, args.seed)
+                    output["candidate_results"][key] = result
+                    print(f"{key:60} in-process={result['in_process_p50_ms']:.1f}ms pool={result['pool_p50_ms']:.1f}ms "
+                          f"(workers={result['pool_workers']}, pool by default: {result['uses_pool_by_default']})")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(output, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        compare_results(output, args.compare)
+
+
+if __name__ == "__main__":
+    main()
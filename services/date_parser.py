@@ -0,0 +1,215 @@
+import re
+from calendar import monthrange
+from datetime import date, timedelta
+from functools import lru_cache
+
+from services.geocode_cache import normalize_place_name
+from services.duration_parser import VIETNAMESE_DIGITS, VIETNAMESE_TEN
+
+# Flight data is for this year; explicit dates without a year are read in it.
+DEFAULT_YEAR = 2025
+
+# One precompiled tokenizer over the diacritic-folded text ('ngày 19 tháng 4' -> 'ngay 19 thang 4').
+_TOKEN_RE = re.compile(
+    r"(?P<ymd>\d{4}-\d{1,2}-\d{1,2})"
+    r"|(?P<dmy>\d{1,2}[/.-]\d{1,2}(?:[/.-]\d{2,4})?)"
+    r"|(?P<num>\d{1,4})(?:st|nd|rd|th)?"
+    r"|(?P<word>[a-z]+)"
+)
+
+MONTHS = {
+    "jan": 1, "january": 1, "feb": 2, "february": 2, "mar": 3, "march": 3, "apr": 4, "april": 4,
+    "may": 5, "jun": 6, "june": 6, "jul": 7, "july": 7, "aug": 8, "august": 8,
+    "sep": 9, "sept": 9, "september": 9, "oct": 10, "october": 10, "nov": 11, "november": 11,
+    "dec": 12, "december": 12,
+}
+# Folded Vietnamese month words used after 'thang' ('tháng giêng' = January, 'tháng chạp' = December)
+VIETNAMESE_MONTH_WORDS = {"gieng": 1, "chap": 12}
+ORDINAL_DAY_WORDS = {
+    "first": 1, "second": 2, "third": 3, "fourth": 4, "fifth": 5, "sixth": 6, "seventh": 7,
+    "eighth": 8, "ninth": 9, "tenth": 10,
+}
+WEEKDAYS = {
+    "mon": 0, "monday": 0, "tue": 1, "tues": 1, "tuesday": 1, "wed": 2, "wednesday": 2,
+    "thu": 3, "thur": 3, "thurs": 3, "thursday": 3, "fri": 4, "friday": 4,
+    "sat": 5, "saturday": 5, "sun": 6, "sunday": 6,
+}
+# 'thứ hai' (Monday) .. 'thứ bảy' (Saturday); Sunday is 'chủ nhật'
+VIETNAMESE_WEEKDAY_NUMBERS = {2: 0, 3: 1, 4: 2, 5: 3, 6: 4, 7: 5}
+RELATIVE_DAY_PHRASES = (
+    # Longest phrases first; matched on whole tokens
+    (("day", "after", "tomorrow"), 2),
+    (("ngay", "kia"), 2),
+    (("ngay", "mot"), 2),
+    (("ngay", "mai"), 1),
+    (("hom", "nay"), 0),
+    (("tomorrow",), 1),
+    (("today",), 0),
+    (("tonight",), 0),
+)
+NEXT_WORDS = {"next", "toi", "sau"}
+# Words after a number that make it a time of day ('3pm', '3h', '3 giờ'), never a year
+TIME_SUFFIXES = {"am", "pm", "h", "gio", "oclock"}
+DAY_COUNT_UNITS = {"day", "days", "ngay"}
+
+
+def _valid(year, month, day):
+    return year >= 1 and 1 <= month <= 12 and 1 <= day <= monthrange(year, month)[1]
+
+
+def _expand_year(year):
+    return year + 2000 if year < 100 else year
+
+
+def _iso(year, month, day):
+    return f"{year:04d}-{month:02d}-{day:02d}"
+
+
+def _is_time_of_day(folded, matches, index, words):
+    """Whether the number token at index is an hour: followed by ':' ('3:30') or a time word ('3pm', '3h', '3 giờ')."""
+    if folded[matches[index].end():matches[index].end() + 1] == ":":
+        return True
+    return index + 1 < len(words) and words[index + 1] in TIME_SUFFIXES
+
+
+@lru_cache(maxsize=1024)
+def _parse_folded(folded, today_iso):
+    today = date.fromisoformat(today_iso)
+    matches = list(_TOKEN_RE.finditer(folded))
+    tokens = [(match.lastgroup, match.group(match.lastgroup), match.group()) for match in matches]
+    words = [value if kind == "word" else None for kind, value, _ in tokens]
+
+    # Fixed relative phrases ('tomorrow', 'ngày mai'); they only apply when no explicit date is given below
+    relative_offset = None
+    if words == ["mai"]:
+        relative_offset = 1 # A lone 'mai' (tomorrow); inside a sentence it is usually a name ('Mai Châu')
+    for index in range(len(tokens)):
+        for phrase, offset in RELATIVE_DAY_PHRASES:
+            if relative_offset is None and tuple(words[index:index + len(phrase)]) == phrase:
+                relative_offset = offset
+
+    day = month = year = None
+    weekday = None
+    next_weekday = False
+    pending_number = None     # A bare number waiting to learn whether it is a day or a count
+    expect = None             # 'month'/'day'/'year' after Vietnamese 'thang'/'ngay'/'nam'
+    vietnamese_weekday = False
+    last_date_index = None    # Index of the latest token that gave the day or month
+
+    for index, (kind, value, raw) in enumerate(tokens):
+        if kind == "ymd":
+            y, m, d = (int(part) for part in value.split("-"))
+            year, month, day = y, m, d
+            last_date_index = index
+            continue
+        if kind == "dmy":
+            parts = [int(part) for part in re.split(r"[/.-]", value)]
+            day, month = parts[0], parts[1]
+            if len(parts) == 3:
+                year = _expand_year(parts[2])
+            last_date_index = index
+            continue
+        if kind == "num":
+            number = int(value)
+            if vietnamese_weekday:
+                weekday = VIETNAMESE_WEEKDAY_NUMBERS.get(number)
+                vietnamese_weekday = False
+            elif expect == "month":
+                month = number
+                last_date_index = index
+            elif expect == "day":
+                day = number
+                last_date_index = index
+            elif expect == "year" or number >= 1000:
+                year = _expand_year(number)
+            elif raw != value and day is None:
+                day = number # '19th'
+                last_date_index = index
+            elif month is not None and day is None:
+                day = number # 'April 19'
+                last_date_index = index
+            elif (day is not None and month is not None and year is None and last_date_index == index - 1
+                  and not _is_time_of_day(folded, matches, index, words)):
+                year = _expand_year(number) # 'April 19 25', but not '12/5 at 3pm' or '12/5 3h'
+            else:
+                pending_number = number
+            expect = None
+            continue
+
+        # Words
+        if expect == "month" and (value in VIETNAMESE_MONTH_WORDS or value in VIETNAMESE_DIGITS or value == VIETNAMESE_TEN):
+            if value in VIETNAMESE_MONTH_WORDS:
+                month = VIETNAMESE_MONTH_WORDS[value]
+            elif value == VIETNAMESE_TEN:
+                following = words[index + 1] if index + 1 < len(words) else None
+                month = 10 + (VIETNAMESE_DIGITS.get(following, 0) if following in ("mot", "hai") else 0)
+            elif not (index > 0 and words[index - 1] == VIETNAMESE_TEN):
+                month = VIETNAMESE_DIGITS[value]
+            last_date_index = index
+            expect = None
+            continue
+        if vietnamese_weekday and value in VIETNAMESE_DIGITS:
+            weekday = VIETNAMESE_WEEKDAY_NUMBERS.get(VIETNAMESE_DIGITS[value])
+            vietnamese_weekday = False
+            continue
+        if value == "thu" and index + 1 < len(tokens) and (
+                words[index + 1] in VIETNAMESE_DIGITS or (tokens[index + 1][0] == "num" and 2 <= int(tokens[index + 1][1]) <= 7)):
+            vietnamese_weekday = True # 'thu sau' / 'thu 6'; a lone 'thu' is Thursday
+            continue
+        if value in MONTHS:
+            month = MONTHS[value]
+            last_date_index = index
+            if pending_number is not None and day is None:
+                day, pending_number = pending_number, None # '19 April'
+        elif value in WEEKDAYS:
+            weekday = WEEKDAYS[value]
+        elif value == "thang":
+            expect = "month"
+            if pending_number is not None and day is None:
+                day, pending_number = pending_number, None # '19 thang 4'
+        elif value == "ngay":
+            if pending_number is not None:
+                # '3 ngay nua' / '3 ngay toi' = in 3 days
+                return (today + timedelta(days=pending_number)).isoformat()
+            expect = "day"
+        elif value == "nam":
+            expect = "year"
+        elif value == "chu" and index + 1 < len(words) and words[index + 1] == "nhat":
+            weekday = 6
+        elif value in NEXT_WORDS:
+            next_weekday = True
+        elif value in DAY_COUNT_UNITS and pending_number is not None:
+            return (today + timedelta(days=pending_number)).isoformat() # 'in 3 days'
+        elif value in ORDINAL_DAY_WORDS and day is None:
+            day = ORDINAL_DAY_WORDS[value]
+
+    if pending_number is not None and day is None and month is not None:
+        day = pending_number
+
+    if day is not None and month is not None:
+        year = year or DEFAULT_YEAR
+        return _iso(year, month, day) if _valid(year, month, day) else None
+    if relative_offset is not None:
+        return (today + timedelta(days=relative_offset)).isoformat()
+    if weekday is not None:
+        # 'friday'/'this friday' = the coming one (today counts); 'next friday'/'thứ sáu tới' = strictly after today
+        days_ahead = (weekday - today.weekday()) % 7
+        if next_weekday and days_ahead == 0:
+            days_ahead = 7
+        return (today + timedelta(days=days_ahead)).isoformat()
+    return None
+
+
+def parse_flight_date(text, today=None):
+    """
+    Parses a free-text departure date into 'YYYY-MM-DD' in a single tokenising pass, or None.
+
+    Understands numeric dates ('19/04/2025', '2025-04-19', '19/4'), English and Vietnamese month
+    names and ordinals ('April 19th', '19 Apr 2025', 'ngày 19 tháng 4', 'tháng năm 12'), and
+    relative dates ('tomorrow', 'ngày mai', 'in 3 days', 'next Friday', 'thứ sáu tới'). Explicit
+    dates without a year use DEFAULT_YEAR; relative dates are counted from today.
+    """
+    if not isinstance(text, str) or not text.strip():
+        return None
+    today = today or date.today()
+    return _parse_folded(normalize_place_name(text), today.isoformat())
@@ -0,0 +1,167 @@
+import re
+from functools import lru_cache
+
+from services.geocode_cache import normalize_place_name
+
+# One precompiled tokenizer; the text is diacritic-folded first ('5 ngày 4 đêm' -> '5 ngay 4 dem').
+_TOKEN_RE = re.compile(r"(?P<num>\d+)|(?P<word>[a-z]+)|(?P<dash>[-~–—])")
+
+ENGLISH_NUMBERS = {
+    "a": 1, "an": 1, "one": 1, "single": 1, "two": 2, "couple": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12,
+    "thirteen": 13, "fourteen": 14, "fifteen": 15, "sixteen": 16, "seventeen": 17,
+    "eighteen": 18, "nineteen": 19, "twenty": 20, "thirty": 30, "forty": 40, "fifty": 50,
+    "sixty": 60, "seventy": 70, "eighty": 80, "ninety": 90,
+}
+# Words that combine with a following unit word ('twenty one', 'twenty-one' = 21)
+ENGLISH_TENS = {word for word, value in ENGLISH_NUMBERS.items() if value >= 20}
+ENGLISH_UNITS = {"one", "two", "three", "four", "five", "six", "seven", "eight", "nine"}
+# Folded Vietnamese digits; 'mot'/'lam'/'tu' also cover the 'mốt'/'lăm'/'tư' forms used after 'mươi'.
+VIETNAMESE_DIGITS = {
+    "mot": 1, "hai": 2, "ba": 3, "bon": 4, "tu": 4, "nam": 5, "lam": 5,
+    "sau": 6, "bay": 7, "tam": 8, "chin": 9,
+}
+VIETNAMESE_TEN = "muoi"
+
+DAY_UNITS = {"day", "days", "ngay"}
+NIGHT_UNITS = {"night", "nights", "dem"}
+WEEK_UNITS = {"week", "weeks", "tuan"}
+WEEKEND_UNITS = {"weekend", "weekends"}
+FORTNIGHT_UNITS = {"fortnight"}
+# Tour-package shorthand: '5D4N' (days/nights) or '3N2D' ('3 ngày 2 đêm'); the first figure is the days.
+SHORTHAND_UNITS = {"d", "n"}
+RANGE_WORDS = {"to", "or", "den", "toi", "hoac"}
+# 'ngày mai' / 'ngày kia' are 'tomorrow' / 'the day after', not a length of stay
+RELATIVE_DAY_WORDS = {"mai", "kia"}
+# 'next week' / 'tuần sau' / 'tuần này' say when the trip is, not how long it lasts; English puts
+# the word before the unit, Vietnamese after it
+RELATIVE_WEEK_WORDS = {"next", "this", "last", "toi", "nay"}
+VIETNAMESE_RELATIVE_WEEK_WORDS = {"sau", "toi", "nay", "truoc"}
+
+WEEKEND_DAYS = 2
+LONG_WEEKEND_DAYS = 3
+# Longer "trips" are typos or unit mix-ups ('10000 days'); the planner gets None instead
+MAX_TRIP_DAYS = 30
+
+
+@lru_cache(maxsize=1024)
+def parse_travel_duration(text):
+    """
+    Parses a free-text trip duration into a number of days in a single pass, or None.
+
+    Understands digits and English/Vietnamese number words ('three', 'ba', 'mười hai'),
+    ranges (the upper bound wins: '3-4 days' -> 4), days/nights ('5 ngay 4 dem' -> 5,
+    '2 nights' -> 3, '3N2D' -> 3), weeks ('a week' -> 7, '1 week 2 days' -> 9) and weekends
+    ('weekend'/'cuối tuần' -> 2, 'long weekend' -> 3). Input that is only a number is read as days.
+    English compounds ('twenty one', 'twenty-one') are one number, not a range. Durations above
+    MAX_TRIP_DAYS and 'ngày mai' (tomorrow) are not durations and give None.
+    """
+    if not isinstance(text, str):
+        return None
+    folded = normalize_place_name(text)
+
+    quantity = None          # Number waiting for its unit
+    range_start = None       # Lower bound of an 'N-M' / 'N to M' range
+    previous_word = None
+    vietnamese_open = False  # quantity is a Vietnamese numeral that may still take 'muoi'/units
+    english_tens_open = False  # quantity is an English tens word that may still take a unit ('twenty one')
+    days = weeks = nights = 0
+    weekend_days = 0
+    only_numbers = True      # A bare '3' means 3 days; a stray number inside a sentence does not
+
+    matches = list(_TOKEN_RE.finditer(folded))
+    for index, match in enumerate(matches):
+        kind, token = match.lastgroup, match.group()
+        next_token = matches[index + 1].group() if index + 1 < len(matches) else None
+
+        if previous_word in WEEK_UNITS and token in VIETNAMESE_RELATIVE_WEEK_WORDS:
+            previous_word = token
+            continue # 'tuan sau' / 'tuan toi': not the digit 6 or a range
+        if kind == "dash" and english_tens_open and next_token in ENGLISH_UNITS:
+            continue # 'twenty-one': a hyphenated compound, not a range
+        if kind == "dash" or token in RANGE_WORDS:
+            if quantity is not None:
+                range_start = quantity
+            vietnamese_open = english_tens_open = False
+            previous_word = token
+            continue
+
+        value = None
+        if kind == "num":
+            value = int(token)
+            vietnamese_open = english_tens_open = False
+        elif token in ENGLISH_UNITS and english_tens_open:
+            quantity += ENGLISH_NUMBERS[token]
+            english_tens_open = False
+            previous_word = token
+            continue
+        elif token in ENGLISH_NUMBERS:
+            value = ENGLISH_NUMBERS[token]
+            vietnamese_open = False
+            english_tens_open = token in ENGLISH_TENS
+        elif token == VIETNAMESE_TEN:
+            # 'muoi' = 10, 'hai muoi' = 20; a following digit adds units ('hai muoi mot' = 21).
+            value = (quantity if vietnamese_open and quantity and quantity < 10 else 1) * 10
+            vietnamese_open = True
+        elif token in VIETNAMESE_DIGITS:
+            digit = VIETNAMESE_DIGITS[token]
+            if vietnamese_open and quantity and quantity % 10 == 0 and previous_word == VIETNAMESE_TEN:
+                value = quantity + digit
+            else:
+                value = digit
+            vietnamese_open = True
+            english_tens_open = False
+
+        if value is not None:
+            quantity = max(range_start, value) if range_start is not None else value
+            range_start = None
+            previous_word = token
+            continue
+
+        english_tens_open = False
+        amount = quantity if quantity is not None else 1
+        if token in DAY_UNITS and next_token in RELATIVE_DAY_WORDS:
+            only_numbers = False
+            previous_word = token
+            continue
+        elif token in DAY_UNITS:
+            days = amount
+        elif token in NIGHT_UNITS:
+            nights = amount
+        elif token in WEEK_UNITS and previous_word == "cuoi":
+            weekend_days = WEEKEND_DAYS
+        elif token in WEEK_UNITS and (quantity is None or previous_word in RELATIVE_WEEK_WORDS
+                                      or next_token in VIETNAMESE_RELATIVE_WEEK_WORDS):
+            only_numbers = False
+            previous_word = token
+            continue
+        elif token in WEEK_UNITS:
+            weeks = quantity
+        elif token in WEEKEND_UNITS:
+            weekend_days = LONG_WEEKEND_DAYS if previous_word == "long" else WEEKEND_DAYS
+        elif token in SHORTHAND_UNITS and quantity is not None:
+            if days:
+                nights = amount
+            else:
+                days = amount
+        elif token in FORTNIGHT_UNITS:
+            weeks = 2 * amount
+        else:
+            only_numbers = False
+            previous_word = token
+            continue
+
+        quantity, range_start, vietnamese_open = None, None, False
+        previous_word = token
+
+    if days or weeks:
+        total = weeks * 7 + days
+    elif nights:
+        total = nights + 1
+    elif weekend_days:
+        total = weekend_days
+    elif only_numbers and quantity is not None:
+        total = quantity
+    else:
+        return None
+    return total if 0 < total <= MAX_TRIP_DAYS else None
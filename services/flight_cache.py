@@ -0,0 +1,122 @@
+import copy
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# flight_data is rebuilt once a day by the scheduled scraper (see app.setup_scheduler).
+FLIGHT_SCRAPER_SCHEDULE_TIME = os.getenv("FLIGHT_SCRAPER_SCHEDULE_TIME", "00:40")
+# Upper bound on how long any entry lives, in case the scraper is delayed or skipped.
+FLIGHT_CACHE_MAX_TTL_SECONDS = int(os.getenv("FLIGHT_CACHE_MAX_TTL_SECONDS", 6 * 60 * 60))
+FLIGHT_CACHE_MAX_ENTRIES = int(os.getenv("FLIGHT_CACHE_MAX_ENTRIES", 512))
+# Touched by every writer of flight_data; lets the scraper (a separate process) invalidate the app's cache.
+FLIGHT_CACHE_MARKER_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scrapper", "data", "flights", ".flight_data_version"
+)
+
+
+def seconds_until_next_scrape(now=None, schedule_time=FLIGHT_SCRAPER_SCHEDULE_TIME):
+    """Seconds from now until the next daily scraper run at schedule_time ('HH:MM')."""
+    now = now or datetime.now()
+    hour, minute = (int(part) for part in schedule_time.split(":"))
+    next_run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if next_run <= now:
+        next_run += timedelta(days=1)
+    return (next_run - now).total_seconds()
+
+
+def _marker_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class FlightResultCache:
+    """
+    In-process cache of flight search results keyed by (origin_code, date_iso[, filters]).
+
+    Entries expire at the next scheduled scrape (capped at FLIGHT_CACHE_MAX_TTL_SECONDS) and are
+    dropped as soon as the flight_data marker file changes, which the scraper touches after
+    rewriting the collection. Only successful results should be stored.
+    """
+
+    def __init__(self, marker_path=FLIGHT_CACHE_MARKER_PATH, max_entries=FLIGHT_CACHE_MAX_ENTRIES,
+                 max_ttl_seconds=FLIGHT_CACHE_MAX_TTL_SECONDS):
+        self.marker_path = marker_path
+        self.max_entries = max_entries
+        self.max_ttl_seconds = max_ttl_seconds
+        self._lock = threading.Lock()
+        self._entries = {} # key -> (expires_at monotonic, value)
+        self._marker_seen = _marker_mtime(marker_path)
+        self._counters = {"hits": 0, "misses": 0, "expired": 0, "invalidations": 0}
+
+    @staticmethod
+    def make_key(origin_code, date_iso, **filters):
+        """Hashable key; filters (if any) are included in sorted order so argument order does not matter."""
+        return (origin_code, date_iso) + tuple(sorted((name, repr(value)) for name, value in filters.items() if value is not None))
+
+    def _check_marker_locked(self):
+        current = _marker_mtime(self.marker_path)
+        if current != self._marker_seen:
+            self._marker_seen = current
+            if self._entries:
+                self._entries.clear()
+                self._counters["invalidations"] += 1
+
+    def get(self, key):
+        """Returns (found, value). value is a deep copy, so callers may modify it freely."""
+        with self._lock:
+            self._check_marker_locked()
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self._entries[key]
+                self._counters["expired"] += 1
+                entry = None
+            if entry is None:
+                self._counters["misses"] += 1
+                return False, None
+            self._counters["hits"] += 1
+            value = entry[1]
+        return True, copy.deepcopy(value)
+
+    def set(self, key, value):
+        ttl = min(seconds_until_next_scrape(), self.max_ttl_seconds)
+        with self._lock:
+            self._check_marker_locked()
+            if key not in self._entries and len(self._entries) >= self.max_entries:
+                # Evict the entry closest to expiry
+                oldest_key = min(self._entries, key=lambda k: self._entries[k][0])
+                del self._entries[oldest_key]
+            self._entries[key] = (time.monotonic() + ttl, copy.deepcopy(value))
+
+    def invalidate(self, touch_marker=True):
+        """
+        Drops every cached result. With touch_marker (the default) the marker file is updated too,
+        so other processes sharing this checkout drop their entries on their next lookup.
+        """
+        if touch_marker:
+            try:
+                os.makedirs(os.path.dirname(self.marker_path), exist_ok=True)
+                with open(self.marker_path, "w", encoding="utf-8") as f:
+                    f.write(datetime.now().isoformat())
+            except OSError as e:
+                print(f"Warning: could not update flight cache marker {self.marker_path}: {e}")
+        with self._lock:
+            self._marker_seen = _marker_mtime(self.marker_path)
+            self._entries.clear()
+            self._counters["invalidations"] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else None
+        return stats
+
+
+flight_cache = FlightResultCache()
@@ -0,0 +1,118 @@
+import re
+from datetime import datetime, timedelta
+
+# Scraped flights keep Kayak's display strings ("$55", "10:45 pm", "VietJet Air 1650").
+# These helpers derive the numeric/normalised fields that flight_data is queried and sorted on.
+
+_PRICE_NUMBER_RE = re.compile(r"\d[\d.,]*")
+_CLOCK_RE = re.compile(r"^\s*(\d{1,2})(?:[:.h](\d{2}))?\s*([ap])?\.?\s*m?\.?\s*$", re.IGNORECASE)
+_FLIGHT_NUMBER_RE = re.compile(r"\s+[A-Z]{0,3}\d+[A-Z]?$", re.IGNORECASE)
+_DURATION_RE = re.compile(r"^\s*(?:(\d+)\s*h(?:ours?|rs?)?)?\s*(?:(\d+)\s*m(?:in(?:ute)?s?)?)?\s*$", re.IGNORECASE)
+
+# Every field normalize_flight adds; documents missing any of them are picked up by scripts/backfill_flight_fields.py.
+NORMALIZED_FLIGHT_FIELDS = (
+    "price_minor", "duration_minutes", "departure_minutes", "arrival_minutes",
+    "departure_datetime", "arrival_datetime", "airline", "airline_key",
+)
+
+
+def parse_price_minor(price):
+    """'$55' -> 5500, '$1,234.50' -> 123450. Returns None when no amount can be read."""
+    if isinstance(price, (int, float)):
+        return int(round(price * 100))
+    if not isinstance(price, str):
+        return None
+    match = _PRICE_NUMBER_RE.search(price)
+    if not match:
+        return None
+    number = match.group().rstrip(".,")
+    # A trailing ',dd' or '.dd' is a decimal part; other separators group thousands
+    decimal_match = re.search(r"[.,](\d{1,2})$", number)
+    if decimal_match:
+        whole = re.sub(r"[.,]", "", number[:decimal_match.start()]) or "0"
+        return int(whole) * 100 + int(decimal_match.group(1).ljust(2, "0"))
+    return int(re.sub(r"[.,]", "", number)) * 100
+
+
+def parse_clock_minutes(time_str):
+    """'10:45 pm' -> 1365, '5am' -> 300, '22:45' -> 1365 (minutes after midnight). None if unparsable."""
+    if not isinstance(time_str, str):
+        return None
+    match = _CLOCK_RE.match(time_str)
+    if not match:
+        return None
+    hour, minute, meridiem = int(match.group(1)), int(match.group(2) or 0), (match.group(3) or "").lower()
+    if minute > 59:
+        return None
+    if meridiem:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if meridiem == "p" else 0)
+    elif hour > 23 or match.group(2) is None:
+        return None # A bare '5' is not a time
+    return hour * 60 + minute
+
+
+def parse_duration_minutes(duration_str):
+    """'1h 20m' -> 80, '2h' -> 120, '45m' -> 45. None if unparsable."""
+    if not isinstance(duration_str, str):
+        return None
+    match = _DURATION_RE.match(duration_str)
+    if not match or not (match.group(1) or match.group(2)):
+        return None
+    return int(match.group(1) or 0) * 60 + int(match.group(2) or 0)
+
+
+def local_datetimes(search_date, departure_minutes, arrival_minutes, duration_minutes=None):
+    """
+    ISO local datetimes (Vietnam time, no offset) for departure and arrival on search_date.
+    The arrival is taken as departure + duration when the duration is known, otherwise it rolls
+    over to the next day when its clock time is earlier than the departure ('10:45 pm' -> '12:05 am').
+    """
+    try:
+        day = datetime.strptime(search_date, "%Y-%m-%d")
+    except (TypeError, ValueError):
+        return None, None
+    if departure_minutes is None:
+        return None, None
+    departure = day + timedelta(minutes=departure_minutes)
+    if duration_minutes is not None:
+        arrival = departure + timedelta(minutes=duration_minutes)
+    elif arrival_minutes is not None:
+        arrival = day + timedelta(minutes=arrival_minutes, days=1 if arrival_minutes < departure_minutes else 0)
+    else:
+        arrival = None
+    return departure.isoformat(timespec="minutes"), arrival.isoformat(timespec="minutes") if arrival else None
+
+
+def parse_airline(flight_id):
+    """'VietJet Air 1650' -> 'VietJet Air'. Returns None for missing/'N/A' ids."""
+    if not isinstance(flight_id, str) or not flight_id.strip() or flight_id.strip().upper() == "N/A":
+        return None
+    airline = _FLIGHT_NUMBER_RE.sub("", flight_id.strip())
+    return airline or None
+
+
+def normalized_flight_fields(flight):
+    """The normalised fields for one scraped flight record."""
+    airline = parse_airline(flight.get("flight_id"))
+    duration_minutes = parse_duration_minutes(flight.get("flight_time"))
+    departure_minutes = parse_clock_minutes(flight.get("departure_time"))
+    arrival_minutes = parse_clock_minutes(flight.get("arrival_time"))
+    departure_datetime, arrival_datetime = local_datetimes(flight.get("search_date"), departure_minutes, arrival_minutes, duration_minutes)
+    return {
+        "price_minor": parse_price_minor(flight.get("price")),
+        "duration_minutes": duration_minutes,
+        "departure_minutes": departure_minutes,
+        "arrival_minutes": arrival_minutes,
+        "departure_datetime": departure_datetime,
+        "arrival_datetime": arrival_datetime,
+        "airline": airline,
+        "airline_key": airline.lower() if airline else None,
+    }
+
+
+def normalize_flight(flight):
+    """Adds the normalised fields to a scraped flight record in place and returns it."""
+    flight.update(normalized_flight_fields(flight))
+    return flight
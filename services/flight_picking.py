@@ -1,74 +1,51 @@
 import json
 import os
 import re
-from datetime import datetime
+import base64
+from datetime import datetime, timedelta
 import traceback # Added for better error logging
-from pymongo.mongo_client import MongoClient
 import pymongo
+from bson import ObjectId
+from bson.errors import InvalidId
+from database.flight import db as flight_collection, FLIGHT_PROJECTION
+from services.flight_cache import flight_cache
+from services.flight_fields import parse_clock_minutes
+from services.date_parser import parse_flight_date
 from dotenv import load_dotenv
 load_dotenv()
 
 FLIGHT_DATA_DIR = "../scrapper/data/flights" # Relative path from services directory
 
+DEFAULT_FLIGHT_PAGE_SIZE = 20
+MAX_FLIGHT_PAGE_SIZE = 50
+MAX_FLIGHT_SEARCH_DAYS = int(os.getenv("MAX_FLIGHT_SEARCH_DAYS", 7)) # Longest date range one search may cover
+# sort_by value -> normalised numeric field written by the scraper (services/flight_fields.py)
+FLIGHT_SORT_FIELDS = {"price": "price_minor", "departure_time": "departure_minutes"}
+# Named departure windows as [start, end) minutes after midnight
+FLIGHT_TIME_WINDOWS = {
+    "early_morning": (0, 6 * 60),
+    "morning": (6 * 60, 12 * 60),
+    "afternoon": (12 * 60, 18 * 60),
+    "evening": (18 * 60, 24 * 60),
+}
+
 def get_mongodb_client():
-    client = MongoClient(os.getenv('MONGODB_URI'))
-    db = client["dntrip"]
-    return db["flight_data"]
+    """Returns the flight_data collection on the application-wide pooled client (database/connect.py)."""
+    return flight_collection
 
-# --- New Date Parsing Function ---
+# --- Date Parsing Function ---
 def parse_date_string(date_str: str) -> str | None:
     """
     Parses a date string in various formats (DD/MM/YYYY, YYYY-MM-DD, Month DD, YYYY, DD/MM, Month DD etc.)
     and returns it in ISO format (YYYY-MM-DD).
-    Handles month names (abbreviated and full). Assumes year 2025 if not provided.
+    Handles month names (abbreviated and full), ordinals ('19th April'), Vietnamese dates ('ngày 19 tháng 4')
+    and relative dates ('tomorrow', 'next Friday'). Assumes year 2025 if not provided.
     Returns None if parsing fails.
     """
-    date_str = date_str.strip()
-    DEFAULT_YEAR = 2025
-    formats_to_try = [
-        # Formats with year (priority)
-        ("%d/%m/%Y", False),
-        ("%Y-%m-%d", False),
-        ("%b %d, %Y", False),
-        ("%B %d, %Y", False),
-        ("%d %b %Y", False),
-        ("%d %B %Y", False),
-
-        # Formats without year (will default to DEFAULT_YEAR)
-        # Assuming DD/MM for numeric only based on existing DD/MM/YYYY
-        ("%d/%m", True),      # e.g. 19/04
-        ("%b %d", True),      # e.g. Apr 19
-        ("%B %d", True),      # e.g. April 19
-        ("%d %b", True),      # e.g. 19 Apr
-        ("%d %B", True),      # e.g. 19 April
-    ]
-
-    # Attempt parsing with original string
-    for fmt, assume_default_year in formats_to_try:
-        try:
-            date_obj = datetime.strptime(date_str, fmt)
-            if assume_default_year:
-                # If strptime defaults to year 1900 for formats like %m/%d,
-                # or if we explicitly know the format lacks a year.
-                date_obj = date_obj.replace(year=DEFAULT_YEAR)
-            return date_obj.strftime("%Y-%m-%d")
-        except ValueError:
-            continue
-
-    # Handle cases like "April 19th 2025" or "April 19th" by removing "st", "nd", "rd", "th"
-    date_str_cleaned = re.sub(r"(\d+)(st|nd|rd|th)", r"\\1", date_str, flags=re.IGNORECASE)
-    if date_str_cleaned != date_str: # Only proceed if cleaning changed the string
-         for fmt, assume_default_year in formats_to_try:
-             try:
-                 date_obj = datetime.strptime(date_str_cleaned, fmt)
-                 if assume_default_year:
-                     date_obj = date_obj.replace(year=DEFAULT_YEAR)
-                 return date_obj.strftime("%Y-%m-%d")
-             except ValueError:
-                 continue
-
-    print(f"Warning: Could not parse date string '{date_str}' with known formats.")
-    return None
+    date_iso = parse_flight_date(date_str)
+    if date_iso is None:
+        print(f"Warning: Could not parse date string '{date_str}' with known formats.")
+    return date_iso
 
 # --- Function to get flights from JSON (preserved) ---
 def _get_flights_from_json_file(origin_city: str, origin_code: str, date_iso: str) -> dict:
@@ -112,51 +89,96 @@ def _get_flights_from_json_file(origin_city: str, origin_code: str, date_iso: st
         traceback.print_exc()
         return {"error": "An internal error occurred while retrieving flight data from JSON."}
 
+# --- Keyset pagination cursors ---
+def _encode_cursor(sort_by: str, last_flight: dict) -> str:
+    """Opaque cursor pointing just past last_flight in (sort field, _id) order."""
+    payload = {"s": sort_by, "v": last_flight.get(FLIGHT_SORT_FIELDS[sort_by]), "id": str(last_flight["_id"])}
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode("utf-8")).decode("ascii")
+
+def _decode_cursor(cursor: str, sort_by: str):
+    """Returns (last_value, last_id) or raises ValueError for a malformed cursor or one from another sort order."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        last_id = ObjectId(payload["id"])
+    except (ValueError, TypeError, KeyError, InvalidId) as e:
+        raise ValueError(f"Invalid pagination cursor: {e}") from e
+    if payload.get("s") != sort_by:
+        raise ValueError(f"Pagination cursor was issued for sort_by='{payload.get('s')}', not '{sort_by}'.")
+    return payload.get("v"), last_id
+
+def _build_flight_query(origin_code: str, date_iso, filters: dict) -> dict:
+    """
+    Mongo query for one origin plus the normalised-field filters (price ceiling, departure window, airlines).
+    date_iso is a single 'YYYY-MM-DD' or a (start, end) tuple for an inclusive date range.
+    """
+    if isinstance(date_iso, tuple):
+        date_criteria = {"$gte": date_iso[0], "$lte": date_iso[1]}
+    else:
+        date_criteria = date_iso
+    query = {"departure_airport_code": origin_code, "search_date": date_criteria}
+    if filters.get("max_price_minor") is not None:
+        query["price_minor"] = {"$lte": filters["max_price_minor"]}
+    departure_range = {}
+    if filters.get("departure_after_minutes") is not None:
+        departure_range["$gte"] = filters["departure_after_minutes"]
+    if filters.get("departure_before_minutes") is not None:
+        departure_range["$lt"] = filters["departure_before_minutes"]
+    if departure_range:
+        query["departure_minutes"] = departure_range
+    if filters.get("airlines"):
+        # Anchored prefixes on the lower-cased airline name ('vietjet' matches 'vietjet air')
+        query["airline_key"] = {"$in": [re.compile("^" + re.escape(name.strip().lower())) for name in filters["airlines"]]}
+    return query
+
 # --- Function to get flights from MongoDB ---
-def get_flight_data_from_db(origin_code: str, date_iso: str) -> dict:
+def get_flight_data_from_db(origin_code: str, date_iso: str, filters: dict | None = None, sort_by: str = "price",
+                            page_size: int = DEFAULT_FLIGHT_PAGE_SIZE, cursor: str | None = None) -> dict:
     """
-    Gets flight data from MongoDB based on origin airport code and date.
+    Gets one page of flights from MongoDB for an origin airport code and date.
+
+    filters may hold max_price_minor, departure_after_minutes, departure_before_minutes and airlines;
+    they run against the normalised fields (price_minor, departure_minutes, airline_key) and are
+    served by the compound indexes in database/flight.py. Results are ordered by sort_by with _id
+    as tie-breaker, and next_cursor (None on the last page) continues after the last flight returned.
     """
     collection = get_mongodb_client()
     if collection is None:
         return {"error": "Database connection failed. Cannot retrieve flight data."}
 
-    # Match the date format used in your DB (assuming it's YYYY-MM-DD)
-    # If your DB stores dates differently, adjust the query format here.
-    # Assuming 'departure_airport_code' and 'search_date' are the correct DB fields based on current code
-    query = {"departure_airport_code": origin_code, "search_date": date_iso}
-    # Corrected projection: Exclude _id and use rename syntax based on current query fields
-    projection = {
-        "_id": 0,                      # EXCLUDE _id for JSON compatibility
-        "price": "$price",              # Assumes DB field is 'price'
-        "date": "$date",                # Assumes DB field is 'date'
-        "flight_id": "$flight_id",      # Assumes DB field is 'flight_id'
-        "flight_time": "$flight_time",    # Assumes DB field is 'flight_time'
-        "departure_airport": "$departure_airport", # Assumes DB field is 'departure_airport'
-        "departure_time": "$departure_time", # Assumes DB field is 'departure_time'
-        "arrival_airport": "$arrival_airport",   # Assumes DB field is 'arrival_airport'
-        "arrival_time": "$arrival_time",     # Assumes DB field is 'arrival_time'
-        "departure_airport_code": "$departure_airport_code", # Keep as is
-        "arrival_airport_code": "$arrival_airport_code",   # Assumes DB field is 'arrival_airport_code'
-        "search_date": "$search_date"      # Keep as is
-    }
+    filters = filters or {}
+    sort_field = FLIGHT_SORT_FIELDS[sort_by]
+    query = _build_flight_query(origin_code, date_iso, filters)
+    if cursor:
+        try:
+            last_value, last_id = _decode_cursor(cursor, sort_by)
+        except ValueError as e:
+            return {"error": str(e)}
+        after_value = {"$gt": last_value} if last_value is not None else {"$ne": None} # Nulls sort first
+        query = {"$and": [query, {"$or": [{sort_field: after_value}, {sort_field: last_value, "_id": {"$gt": last_id}}]}]}
+    # Plain inclusion projection; _id is fetched only to build the next cursor and is removed below
+    projection = dict(FLIGHT_PROJECTION, _id=1)
 
     try:
-        print(f"Querying MongoDB: Collection='{collection.name}', Query={query}") # Removed projection from log for brevity
-        # Add limit to avoid fetching excessive data, adjust as needed
-        cursor = collection.find(query, projection).limit(20) # Limit query size
-        # CRITICAL FIX: Ensure cursor is consumed into a list *before* returning
-        flights = list(cursor) # Execute query and convert to list
+        print(f"Querying MongoDB: Collection='{collection.name}', Query={query}, sort_by={sort_by}, page_size={page_size}")
+        # One extra document tells whether another page exists
+        cursor_result = collection.find(query, projection).sort([(sort_field, pymongo.ASCENDING), ("_id", pymongo.ASCENDING)]).limit(page_size + 1)
+        flights = list(cursor_result) # Execute query and convert to list
         print(f"Flights found: {len(flights)}") # Optional: Log how many flights were found
 
         if not flights:
             # More specific message
+            if cursor:
+                return {"message": f"No more flights for origin '{origin_code}' and date '{date_iso}'."}
+            if filters:
+                return {"message": f"No flights found in database matching origin '{origin_code}', date '{date_iso}' and the requested filters."}
             return {"message": f"No flights found in database matching origin '{origin_code}' and date '{date_iso}'."}
-        else:
-             # Limit to 10 flights for the final response if more were found
-            #  return {"source": "mongodb", "flights": flights[:10]}
-             return {"source": "mongodb", "flights": flights}
 
+        has_more = len(flights) > page_size
+        flights = flights[:page_size]
+        next_cursor = _encode_cursor(sort_by, flights[-1]) if has_more else None
+        for flight in flights:
+            flight.pop("_id", None)
+        return {"source": "mongodb", "flights": flights, "next_cursor": next_cursor}
 
     except pymongo.errors.PyMongoError as e:
         print(f"Error querying MongoDB: {e}")
@@ -167,18 +189,99 @@ def get_flight_data_from_db(origin_code: str, date_iso: str) -> dict:
         traceback.print_exc()
         return {"error": "An internal error occurred while retrieving flight data from DB."}
 
+# Per-date cheapest flight, computed over all matching flights (not only the returned page).
+# $min compares the sub-documents by their first field, price_minor; unpriced flights yield null, which $min ignores.
+_CHEAPEST_ACCUMULATOR = {"$min": {"$cond": [
+    {"$gt": ["$price_minor", None]},
+    {"price_minor": "$price_minor", "price": "$price", "flight_id": "$flight_id", "departure_time": "$departure_time"},
+    None,
+]}}
+
+def get_flight_data_for_date_range(origin_code: str, start_iso: str, end_iso: str, filters: dict | None = None,
+                                   sort_by: str = "price", page_size: int = DEFAULT_FLIGHT_PAGE_SIZE) -> dict:
+    """
+    Gets flights for every date from start_iso to end_iso (inclusive) with one aggregation.
+
+    The $match is a range on search_date behind the origin equality, so it uses the same compound
+    indexes as single-date searches; flights are grouped per date and each date keeps its first
+    page_size flights in sort_by order. The result lists every requested date (also dates without
+    flights) with its cheapest flight, plus all flights flattened in date order for selection.
+    """
+    collection = get_mongodb_client()
+    if collection is None:
+        return {"error": "Database connection failed. Cannot retrieve flight data."}
+
+    filters = filters or {}
+    sort_field = FLIGHT_SORT_FIELDS[sort_by]
+    pipeline = [
+        {"$match": _build_flight_query(origin_code, (start_iso, end_iso), filters)},
+        {"$sort": {"search_date": 1, sort_field: 1, "_id": 1}},
+        {"$project": FLIGHT_PROJECTION},
+        {"$group": {"_id": "$search_date", "flights": {"$push": "$$ROOT"}, "flight_count": {"$sum": 1}, "cheapest": _CHEAPEST_ACCUMULATOR}},
+        {"$project": {"flights": {"$slice": ["$flights", page_size]}, "flight_count": 1, "cheapest": 1}},
+    ]
+
+    try:
+        print(f"Aggregating MongoDB: Collection='{collection.name}', origin={origin_code}, dates={start_iso}..{end_iso}, filters={filters}")
+        groups = {group["_id"]: group for group in collection.aggregate(pipeline)}
+    except pymongo.errors.PyMongoError as e:
+        print(f"Error querying MongoDB: {e}")
+        traceback.print_exc()
+        return {"error": "An error occurred while querying the flight database."}
+
+    dates = []
+    all_flights = []
+    day = datetime.strptime(start_iso, "%Y-%m-%d")
+    while day.strftime("%Y-%m-%d") <= end_iso:
+        date_iso = day.strftime("%Y-%m-%d")
+        group = groups.get(date_iso, {})
+        flights = group.get("flights", [])
+        dates.append({
+            "date": date_iso,
+            "flight_count": group.get("flight_count", 0),
+            "cheapest": group.get("cheapest"),
+            "flights": flights,
+        })
+        all_flights.extend(flights)
+        day += timedelta(days=1)
+    print(f"Flights found: {len(all_flights)} across {len(dates)} date(s)")
+
+    if not all_flights:
+        return {"message": f"No flights found in database for origin '{origin_code}' between {start_iso} and {end_iso}{' matching the requested filters' if filters else ''}."}
+    priced_days = [entry["cheapest"] | {"date": entry["date"]} for entry in dates if entry["cheapest"]]
+    return {
+        "source": "mongodb",
+        "date_range": {"start": start_iso, "end": end_iso},
+        "dates": dates,
+        "cheapest_overall": min(priced_days, key=lambda summary: summary["price_minor"]) if priced_days else None,
+        "flights": all_flights, # Flattened in date order, so ordinal selection works across the whole range
+        "next_cursor": None,
+    }
+
 # --- Modified get_flights Function (Now uses MongoDB primarily) ---
-def get_flights(origin_city: str, date_str: str) -> dict:
+def get_flights(origin_city: str, date_str: str, max_price: float | None = None, departure_after: str | None = None,
+                departure_before: str | None = None, time_of_day: str | None = None, airlines: list[str] | None = None,
+                sort_by: str = "price", page_size: int = DEFAULT_FLIGHT_PAGE_SIZE, cursor: str | None = None,
+                end_date_str: str | None = None) -> dict:
     """
-    Gets flight information for a specific origin city and date.
+    Gets flight information for a specific origin city and date, or for a date range when end_date_str is given.
 
     Args:
         origin_city: The name of the origin city (e.g., "Hanoi", "Ho Chi Minh City").
         date_str: The desired date string in a recognizable format (e.g., "19/04/2025", "April 19, 2025").
+        max_price: Optional price ceiling in the listed currency (USD), e.g. 50.
+        departure_after / departure_before: Optional departure window bounds, e.g. "6:00 am", "14:30".
+        time_of_day: Optional named departure window: early_morning, morning, afternoon or evening.
+        airlines: Optional airline names or name prefixes, e.g. ["VietJet", "Bamboo Airways"].
+        sort_by: "price" (cheapest first) or "departure_time" (earliest first).
+        page_size: Flights per page (capped at MAX_FLIGHT_PAGE_SIZE).
+        cursor: next_cursor from a previous call with the same arguments, to get the following page.
+        end_date_str: Optional last date (inclusive) of a range starting at date_str, at most
+                      MAX_FLIGHT_SEARCH_DAYS days; page_size then applies per date and cursor is not used.
 
     Returns:
-        A dictionary containing either the flight data (up to 10 flights)
-        or an error/message.
+        A dictionary containing either one page of flight data plus next_cursor (for a range: flights
+        grouped by date with per-date cheapest summaries, plus the flattened list), or an error/message.
     """
     print(f"--- Getting flights for Origin: {origin_city}, Date String: {date_str} ---")
 
@@ -208,11 +311,61 @@ def get_flights(origin_city: str, date_str: str) -> dict:
     date_iso = parse_date_string(date_str)
     if not date_iso:
         return {"error": f"Sorry, I couldn't understand the date '{date_str}'. Please use formats like DD/MM/YYYY, YYYY-MM-DD, or Month DD, YYYY."}
-
-    # 3. Fetch data from MongoDB
-    print(f"Attempting to fetch data from MongoDB for {origin_code} on {date_iso}")
-    db_result = get_flight_data_from_db(origin_code, date_iso)
+    end_date_iso = None
+    if end_date_str:
+        end_date_iso = parse_date_string(end_date_str)
+        if not end_date_iso:
+            return {"error": f"Sorry, I couldn't understand the end date '{end_date_str}'. Please use formats like DD/MM/YYYY, YYYY-MM-DD, or Month DD, YYYY."}
+        span_days = (datetime.strptime(end_date_iso, "%Y-%m-%d") - datetime.strptime(date_iso, "%Y-%m-%d")).days + 1
+        if span_days < 1:
+            return {"error": f"The end date {end_date_iso} is before the start date {date_iso}."}
+        if span_days > MAX_FLIGHT_SEARCH_DAYS:
+            return {"error": f"Please search at most {MAX_FLIGHT_SEARCH_DAYS} days at a time (requested {span_days})."}
+        if end_date_iso == date_iso:
+            end_date_iso = None # A one-day range is an ordinary search
+
+    # 3. Validate filters, sorting and paging
+    if sort_by not in FLIGHT_SORT_FIELDS:
+        return {"error": f"Unknown sort_by '{sort_by}'. Use one of: {', '.join(FLIGHT_SORT_FIELDS)}."}
+    page_size = max(1, min(int(page_size or DEFAULT_FLIGHT_PAGE_SIZE), MAX_FLIGHT_PAGE_SIZE))
+    filters = {}
+    if max_price is not None:
+        try:
+            filters["max_price_minor"] = int(round(float(str(max_price).lstrip("$").replace(",", "")) * 100))
+        except ValueError:
+            return {"error": f"Sorry, I couldn't understand the maximum price '{max_price}'. Please give a number like 50."}
+    if time_of_day:
+        window = FLIGHT_TIME_WINDOWS.get(time_of_day.strip().lower().replace(" ", "_"))
+        if window is None:
+            return {"error": f"Unknown time_of_day '{time_of_day}'. Use one of: {', '.join(FLIGHT_TIME_WINDOWS)}."}
+        filters["departure_after_minutes"], filters["departure_before_minutes"] = window
+    for bound_name, bound_value in (("departure_after", departure_after), ("departure_before", departure_before)):
+        if bound_value:
+            minutes = parse_clock_minutes(bound_value)
+            if minutes is None:
+                return {"error": f"Sorry, I couldn't understand the time '{bound_value}'. Please use formats like '6:00 am' or '18:30'."}
+            filters[f"{bound_name}_minutes"] = minutes # Explicit bounds narrow/override the named window
+    if airlines:
+        filters["airlines"] = sorted({name.strip() for name in airlines if name and name.strip()})
+
+    # 4. Serve from the in-process cache when possible (flight_data only changes once a day)
+    if end_date_iso:
+        cursor = None # Range results are not paged
+    cache_key = flight_cache.make_key(origin_code, date_iso, end_date=end_date_iso, sort_by=sort_by, page_size=page_size, cursor=cursor, **filters)
+    found, cached_result = flight_cache.get(cache_key)
+    if found:
+        print(f"Flight cache hit for {origin_code} on {date_iso}{f' to {end_date_iso}' if end_date_iso else ''}")
+        return cached_result
+
+    # 5. Fetch data from MongoDB
+    print(f"Attempting to fetch data from MongoDB for {origin_code} on {date_iso}{f' to {end_date_iso}' if end_date_iso else ''} with filters {filters}")
+    if end_date_iso:
+        db_result = get_flight_data_for_date_range(origin_code, date_iso, end_date_iso, filters=filters, sort_by=sort_by, page_size=page_size)
+    else:
+        db_result = get_flight_data_from_db(origin_code, date_iso, filters=filters, sort_by=sort_by, page_size=page_size, cursor=cursor)
     # db_result = _get_flights_from_json_file(origin_city, origin_code, date_iso)
+    if "flights" in db_result: # Messages and errors are not cached, so a retry can still succeed
+        flight_cache.set(cache_key, db_result)
 
     return db_result # Return result primarily from MongoDB
 
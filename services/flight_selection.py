@@ -1,32 +1,136 @@
 import re
-from datetime import datetime
+import difflib
 from typing import Optional
+from services.flight_fields import parse_clock_minutes, parse_airline
+
+FLIGHT_INDEX_VERSION = 1
+FUZZY_FLIGHT_ID_CUTOFF = 0.8
+
+# IATA codes of the carriers flying to Da Nang, keyed by the (lower-cased) names users and Kayak use.
+AIRLINE_IATA_CODES = {
+    "vietjet air": "vj", "vietjet": "vj",
+    "vietnam airlines": "vn", "vietnam airline": "vn",
+    "bamboo airways": "qh", "bamboo": "qh",
+    "vietravel airlines": "vu", "vietravel": "vu",
+    "pacific airlines": "bl", "pacific": "bl",
+}
+ORDINAL_WORDS = {
+    "first": 1, "second": 2, "third": 3, "fourth": 4, "fifth": 5,
+    "sixth": 6, "seventh": 7, "eighth": 8, "ninth": 9, "tenth": 10,
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+}
+_IATA_BY_COMPACT_NAME = {re.sub(r"[^a-z0-9]", "", name): code for name, code in AIRLINE_IATA_CODES.items()}
+_ORDINAL_SUFFIX_RE = re.compile(r"^(\d+)\s*(st|nd|rd|th)?$")
+_FLIGHT_NUMBER_RE = re.compile(r"(\d+)\s*$")
+
+def _departure_minutes(flight: dict) -> Optional[int]:
+    """Stored departure_minutes (written at scrape time); parses the display string only for legacy documents."""
+    minutes = flight.get("departure_minutes")
+    if minutes is None and "departure_minutes" not in flight:
+        minutes = parse_clock_minutes(flight.get("departure_time"))
+    return minutes
+
+def _compact(text: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", text.lower())
+
+def flight_id_keys(flight_id: str) -> list[str]:
+    """
+    Lookup keys for a flight id, most specific first: the compacted id ('vietjetair1650'),
+    the IATA form ('vj1650') and the bare flight number ('1650').
+    Also used on user input, so 'VJ 1650', 'vietjet 1650' and 'VietJet Air 1650' meet on 'vj1650'.
+    """
+    if not isinstance(flight_id, str) or not flight_id.strip():
+        return []
+    text = flight_id.strip().lower()
+    keys = [_compact(text)]
+    number_match = _FLIGHT_NUMBER_RE.search(text)
+    if number_match:
+        number = number_match.group(1)
+        prefix = text[:number_match.start()].strip()
+        airline = (parse_airline(flight_id) or prefix).lower()
+        iata = AIRLINE_IATA_CODES.get(airline) or AIRLINE_IATA_CODES.get(prefix)
+        if iata is None and re.fullmatch(r"[a-z0-9]{2}", _compact(prefix)):
+            iata = _compact(prefix) # Already an IATA code ('VJ 1650', 'VJ1650')
+        if iata:
+            keys.append(f"{iata}{number}")
+        keys.append(number)
+    return list(dict.fromkeys(key for key in keys if key))
+
+def build_flight_index(available_flights: list[dict]) -> dict:
+    """
+    Prebuilt lookups over a flight search result, stored next to available_flights in agent state.
 
-def _parse_time(time_str: str) -> Optional[datetime.time]:
+    by_flight_id maps every key from flight_id_keys to list positions and by_departure_minutes maps
+    minutes-after-midnight (as str, to stay JSON-friendly) to positions; ordinals index the list directly.
+    """
+    by_flight_id = {}
+    by_departure_minutes = {}
+    for position, flight in enumerate(available_flights):
+        for key in flight_id_keys(flight.get("flight_id", "")):
+            by_flight_id.setdefault(key, []).append(position)
+        minutes = _departure_minutes(flight)
+        if minutes is not None:
+            by_departure_minutes.setdefault(str(minutes), []).append(position)
+    return {
+        "version": FLIGHT_INDEX_VERSION,
+        "count": len(available_flights),
+        "by_flight_id": by_flight_id,
+        "by_departure_minutes": by_departure_minutes,
+    }
+
+def _parse_ordinal(value: str) -> Optional[int]:
+    if value in ORDINAL_WORDS:
+        return ORDINAL_WORDS[value]
+    match = _ORDINAL_SUFFIX_RE.match(value)
+    return int(match.group(1)) if match else None
+
+def _airline_part(flight_id: str) -> str:
+    """Compacted id without its flight number ('VietJet Air 1650' -> 'vietjetair')."""
+    return _compact(_FLIGHT_NUMBER_RE.sub("", flight_id or ""))
+
+def _airline_similarity(user_airline: str, flight_id: str) -> float:
+    flight_airline = _airline_part(flight_id)
+    flight_iata = AIRLINE_IATA_CODES.get((parse_airline(flight_id) or "").lower())
+    if flight_iata and flight_iata in (user_airline, _IATA_BY_COMPACT_NAME.get(user_airline)):
+        return 1.0
+    # Also compare against the same-length prefix, so abbreviations ('bamboo', 'vietjet') score high
+    return max(difflib.SequenceMatcher(None, user_airline, flight_airline).ratio(),
+               difflib.SequenceMatcher(None, user_airline, flight_airline[:len(user_airline)]).ratio())
+
+def _positions_for_flight_id(available_flights: list[dict], flight_index: dict, selection_value: str) -> list[int]:
     """
-    Parses time strings like '10:45 pm', '9:00 AM', '14:30', '9am', '5 pm'.
-    Returns a datetime.time object or None if parsing fails.
+    Exact key lookups, most specific first. A bare flight number shared by several airlines is narrowed
+    with a fuzzy comparison of the airline the user typed ('Vietjett 1650'); a different flight number
+    never matches. Input without a number ('Bamboo') selects every flight of the closest airline.
     """
-    time_str = time_str.strip().lower()
-    
-    # Attempt to convert "9am" to "9:00 am", "5 pm" to "5:00 pm"
-    # Handles "9am", "9 am", "5pm", "5 pm"
-    match_short_time = re.fullmatch(r"(\\d{1,2})\\s*(am|pm)", time_str)
-    if match_short_time:
-        time_str = f"{match_short_time.group(1)}:00 {match_short_time.group(2)}"
-
-    formats_to_try = ["%I:%M %p", "%H:%M"]  # Handles "10:45 pm", "09:00 am", "14:30"
-    for fmt in formats_to_try:
-        try:
-            return datetime.strptime(time_str, fmt).time()
-        except ValueError:
+    by_flight_id = flight_index["by_flight_id"]
+    user_keys = flight_id_keys(selection_value)
+    user_airline = _airline_part(selection_value)
+    for key in user_keys:
+        positions = by_flight_id.get(key)
+        if not positions:
             continue
-    return None
+        if key.isdigit() and len(positions) > 1 and user_airline:
+            scores = {position: _airline_similarity(user_airline, available_flights[position].get("flight_id", "")) for position in positions}
+            best = max(scores.values())
+            if best >= FUZZY_FLIGHT_ID_CUTOFF:
+                positions = [position for position in positions if scores[position] == best]
+        return positions
+    if user_keys and user_keys[-1].isdigit():
+        return [] # The flight number itself is not in the list
+    if not user_airline:
+        return []
+    scores = {position: _airline_similarity(user_airline, flight.get("flight_id", "")) for position, flight in enumerate(available_flights)}
+    best = max(scores.values(), default=0.0)
+    if best < FUZZY_FLIGHT_ID_CUTOFF:
+        return []
+    return [position for position, score in scores.items() if score == best]
 
 def select_flight_for_booking(
     available_flights: list[dict],
     selection_type: str,
-    selection_value: str 
+    selection_value: str,
+    flight_index: Optional[dict] = None
 ) -> dict:
     """
     Selects a specific flight from a list based on structured criteria.
@@ -35,9 +139,11 @@ def select_flight_for_booking(
         available_flights: A list of flight dictionaries.
         selection_type: Type of selection: "ordinal", "flight_id", "departure_time".
         selection_value: The value for selection (user's input).
-                         - For "ordinal": "1", "2nd", "first".
-                         - For "flight_id": The flight ID string e.g., "VietJet Air 1634".
+                         - For "ordinal": "1", "2nd", "first", "last".
+                         - For "flight_id": The flight ID string e.g., "VietJet Air 1634", "VJ 1634" or "1634".
                          - For "departure_time": Time string e.g., "9:00 am", "10:45 pm", "14:30", "9pm".
+        flight_index: The build_flight_index result stored with available_flights; built here when
+                      missing or stale, so lookups are dictionary hits either way.
 
     Returns:
         A dictionary with "status" and either "flight" (on success) or "message".
@@ -45,27 +151,16 @@ def select_flight_for_booking(
     """
     if not available_flights:
         return {"status": "error_no_flights", "message": "No flights available to select from."}
+    if not flight_index or flight_index.get("version") != FLIGHT_INDEX_VERSION or flight_index.get("count") != len(available_flights):
+        flight_index = build_flight_index(available_flights)
 
     found_flights = []
     normalized_selection_value = selection_value.strip().lower()
 
     if selection_type == "ordinal":
-        ordinal_map = {
-            "first": 1, "second": 2, "third": 3, "fourth": 4, "fifth": 5,
-            "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
-            "1st": 1, "2nd": 2, "3rd": 3, "4th": 4, "5th": 5
-        }
-        
-        idx = -1
-        if normalized_selection_value in ordinal_map:
-            idx = ordinal_map[normalized_selection_value]
-        else:
-            try:
-                # Remove "st", "nd", "rd", "th" if present after a digit, then convert to int
-                cleaned_val = re.sub(r"(\\d+)(st|nd|rd|th)", r"\\1", normalized_selection_value)
-                idx = int(cleaned_val)
-            except ValueError:
-                return {"status": "error_bad_input", "message": f"Invalid ordinal value: '{selection_value}'. Please use numbers (e.g., '1', '2nd') or words (e.g., 'first')."}
+        idx = len(available_flights) if normalized_selection_value == "last" else _parse_ordinal(normalized_selection_value)
+        if idx is None:
+            return {"status": "error_bad_input", "message": f"Invalid ordinal value: '{selection_value}'. Please use numbers (e.g., '1', '2nd') or words (e.g., 'first')."}
 
         if 1 <= idx <= len(available_flights):
             found_flights.append(available_flights[idx - 1])
@@ -73,26 +168,18 @@ def select_flight_for_booking(
             return {"status": "not_found", "message": f"Invalid selection: '{selection_value}'. Please pick a number between 1 and {len(available_flights)}."}
 
     elif selection_type == "flight_id":
-        target_flight_id_lower = normalized_selection_value
-        for flight in available_flights:
-            if flight.get("flight_id", "").strip().lower() == target_flight_id_lower:
-                found_flights.append(flight)
-        
+        found_flights = [available_flights[position] for position in _positions_for_flight_id(available_flights, flight_index, selection_value)]
+
         if not found_flights:
              return {"status": "not_found", "message": f"No flight found with ID '{selection_value}'. Please check the ID or select by order/time."}
 
     elif selection_type == "departure_time":
-        target_time_obj = _parse_time(selection_value) # Use original selection_value for parsing
-        if not target_time_obj:
+        target_minutes = parse_clock_minutes(selection_value) # Only the user's input is parsed here
+        if target_minutes is None:
             return {"status": "error_bad_input", "message": f"Invalid time format for departure time: '{selection_value}'. Please use HH:MM AM/PM, HH:MM (24h), or e.g., '9am'."}
 
-        for flight in available_flights:
-            flight_dep_time_str = flight.get("departure_time")
-            if flight_dep_time_str:
-                flight_time_obj = _parse_time(flight_dep_time_str)
-                if flight_time_obj and flight_time_obj == target_time_obj:
-                    found_flights.append(flight)
-        
+        found_flights = [available_flights[position] for position in flight_index["by_departure_minutes"].get(str(target_minutes), [])]
+
         if not found_flights:
              return {"status": "not_found", "message": f"No flight found departing at '{selection_value}'. Please check the time or select by order/ID."}
     else:
@@ -133,6 +220,12 @@ if __name__ == '__main__':
         ("flight_id", "Bamboo Airways 160"),
         ("flight_id", "NonExistent ID"),
         ("flight_id", "vietjet air 1650"), # Case-insensitivity test
+        ("flight_id", "VJ 1650"),          # IATA alias
+        ("flight_id", "QH160"),            # IATA alias without space
+        ("flight_id", "Vietjett 1622"),    # Misspelt airline, exact number
+        ("flight_id", "VJ 1651"),          # Different number: not found
+        ("flight_id", "Vietravel"),        # Airline only
+        ("ordinal", "last"),
         ("departure_time", "4:30 pm"),
         ("departure_time", "05:00 am"), # Leading zero test
         ("departure_time", "9:05 PM"),   # Case-insensitivity for AM/PM
@@ -146,7 +239,7 @@ if __name__ == '__main__':
 
     print("--- Running select_flight_for_booking Test Cases ---")
     for sel_type, sel_val in test_cases:
-        print(f"\\nTesting: type='{sel_type}', value='{sel_val}'")
+        print(f"\nTesting: type='{sel_type}', value='{sel_val}'")
         result = select_flight_for_booking(sample_flights, sel_type, sel_val)
         print(result)
         if result['status'] == 'success':
@@ -155,7 +248,7 @@ if __name__ == '__main__':
             print(f"Matched {len(result['matched_flights'])} flights.")
 
 
-    print("\\n--- Testing _parse_time ---")
+    print("\n--- Testing parse_clock_minutes ---")
     time_tests = ["10:45 pm", "9:00 AM", "14:30", "9am", "5 pm", "10 pm", "05:30", "5:30pm", "badtime"]
     for t_str in time_tests:
-        print(f"Parsing '{t_str}': {_parse_time(t_str)}") 
\ No newline at end of file
+        print(f"Parsing '{t_str}': {parse_clock_minutes(t_str)}") 
\ No newline at end of file
@@ -0,0 +1,135 @@
+import difflib
+import json
+import os
+import threading
+
+from services.geocode_cache import normalize_place_name
+
+GAZETTEER_DATA_PATH = os.environ.get("GAZETTEER_DATA_PATH", "scrapper/data")
+# Earlier files win when several datasets contain the same name.
+GAZETTEER_SOURCES = [
+    "must.json",
+    "restaurants.json",
+    "combined_data.json",
+    "tripadvisor_da_nang_final_details.json",
+]
+FUZZY_MATCH_CUTOFF = float(os.environ.get("GAZETTEER_FUZZY_CUTOFF", 0.9))
+
+# Loose Da Nang bounding box; records outside it (e.g. lat/lon 0.0 placeholders) are skipped.
+DA_NANG_BOUNDS = {"min_lat": 15.85, "max_lat": 16.25, "min_lon": 107.8, "max_lon": 108.45}
+
+# Files whose records carry no 'category' field.
+SOURCE_DEFAULT_CATEGORIES = {
+    "restaurants.json": "restaurant",
+    "tripadvisor_da_nang_final_details.json": "hotel",
+}
+FOOD_CATEGORIES = {"restaurant", "cafe"}
+
+
+def _parse_coords(record):
+    """Returns (lat, lon) as floats if the record has usable Da Nang coordinates, else None."""
+    try:
+        lat, lon = float(record.get("lat")), float(record.get("lon"))
+    except (TypeError, ValueError):
+        return None
+    if not (DA_NANG_BOUNDS["min_lat"] <= lat <= DA_NANG_BOUNDS["max_lat"]
+            and DA_NANG_BOUNDS["min_lon"] <= lon <= DA_NANG_BOUNDS["max_lon"]):
+        return None
+    return lat, lon
+
+
+class Gazetteer:
+    """
+    In-memory name index over every scraped Da Nang dataset.
+
+    Names are matched after diacritic folding ('Bà Nà Hills' == 'ba na hills'), with a
+    difflib fallback for near-misses, so custom stops that already exist locally never
+    reach the Google Maps API. Data is loaded lazily on the first lookup.
+    """
+
+    def __init__(self, data_path: str = GAZETTEER_DATA_PATH, sources=None, fuzzy_cutoff: float = FUZZY_MATCH_CUTOFF):
+        self.data_path = data_path
+        self.sources = list(sources) if sources is not None else list(GAZETTEER_SOURCES)
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self._entries_by_name = None
+        self._names = []
+        self._load_lock = threading.Lock()
+
+    def _load(self):
+        entries_by_name = {}
+        for filename in self.sources:
+            file_path = os.path.join(self.data_path, filename)
+            try:
+                with open(file_path, "r", encoding="utf-8") as f:
+                    records = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError) as e:
+                print(f"Warning: Gazetteer could not load {file_path}. Error: {e}")
+                continue
+
+            category_default = SOURCE_DEFAULT_CATEGORIES.get(filename, "place")
+            for record in records:
+                name = record.get("name")
+                key = normalize_place_name(name)
+                coords = _parse_coords(record)
+                if not key or coords is None:
+                    continue
+                entries_by_name.setdefault(key, []).append({
+                    "name": name,
+                    "location": coords,
+                    "address": record.get("address", ""),
+                    "category": (record.get("category") or category_default).lower(),
+                    "description": record.get("description", ""),
+                    "source_file": filename,
+                    **{field: record[field] for field in ("opening_hours", "visit_duration_minutes") if record.get(field)},
+                })
+
+        self._names = list(entries_by_name.keys())
+        self._entries_by_name = entries_by_name
+        print(f"Gazetteer loaded {len(self._names)} distinct place names from {len(self.sources)} source file(s).")
+
+    def _ensure_loaded(self):
+        if self._entries_by_name is None:
+            with self._load_lock:
+                if self._entries_by_name is None:
+                    self._load()
+
+    def lookup(self, name: str, address: str | None = None):
+        """
+        Finds a local record for a place name.
+
+        Tries a folded exact match first, then the closest fuzzy match above the cutoff.
+        When several records share the name, the one whose address contains the given
+        address wins. Returns the entry dict (name, location, address, category,
+        description, source_file, match) or None.
+        """
+        key = normalize_place_name(name)
+        if not key:
+            return None
+        self._ensure_loaded()
+
+        match_type = "exact"
+        candidates = self._entries_by_name.get(key)
+        if not candidates:
+            close = difflib.get_close_matches(key, self._names, n=1, cutoff=self.fuzzy_cutoff)
+            if not close:
+                return None
+            candidates = self._entries_by_name[close[0]]
+            match_type = "fuzzy"
+
+        chosen = candidates[0]
+        folded_address = normalize_place_name(address)
+        if folded_address and len(candidates) > 1:
+            chosen = next(
+                (c for c in candidates if folded_address in normalize_place_name(c["address"])),
+                chosen,
+            )
+        return {**chosen, "match": match_type}
+
+    def reload(self):
+        """Drops the loaded index so the next lookup re-reads the data files."""
+        with self._load_lock:
+            self._entries_by_name = None
+            self._names = []
+
+
+gazetteer = Gazetteer()
@@ -0,0 +1,157 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+GEOCODE_CACHE_PATH = os.environ.get("GEOCODE_CACHE_PATH", "scrapper/data/geocode_cache.db")
+POSITIVE_TTL_SECONDS = int(os.environ.get("GEOCODE_CACHE_TTL_SECONDS", 30 * 24 * 3600))  # 30 days
+NEGATIVE_TTL_SECONDS = int(os.environ.get("GEOCODE_CACHE_NEGATIVE_TTL_SECONDS", 24 * 3600))  # 1 day
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_place_name(text: str | None) -> str:
+    """
+    Normalises a place name or address for lookups: case-folded, Vietnamese
+    diacritics removed ('Đà Nẵng' -> 'da nang') and whitespace collapsed.
+    """
+    if not text:
+        return ""
+    folded = unicodedata.normalize("NFKD", text.replace("đ", "d").replace("Đ", "D"))
+    folded = "".join(ch for ch in folded if not unicodedata.combining(ch))
+    return _WHITESPACE_RE.sub(" ", folded.casefold()).strip()
+
+
+class GeocodeCache:
+    """
+    Persistent geocode cache backed by SQLite so it is shared by every worker process
+    and survives restarts.
+
+    Entries are keyed by (namespace, normalised name + address). A stored value of None
+    is a negative entry (e.g. "not in Da Nang") and uses the shorter negative TTL.
+    """
+
+    def __init__(self, db_path: str = GEOCODE_CACHE_PATH,
+                 positive_ttl: int = POSITIVE_TTL_SECONDS,
+                 negative_ttl: int = NEGATIVE_TTL_SECONDS):
+        self.db_path = db_path
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._stats = {"hits": 0, "negative_hits": 0, "misses": 0, "expired": 0, "stores": 0, "errors": 0}
+        self._initialized = False
+        self._init_lock = threading.Lock()
+
+    @staticmethod
+    def make_key(name: str, address: str | None = None) -> str:
+        """Builds the cache key from the normalised place name and optional address."""
+        return f"{normalize_place_name(name)}|{normalize_place_name(address)}"
+
+    def _connection(self) -> sqlite3.Connection:
+        """Returns this thread's connection, creating the schema on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")  # Concurrent readers across processes
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    conn.execute(
+                        """CREATE TABLE IF NOT EXISTS geocode_cache (
+                               namespace TEXT NOT NULL,
+                               cache_key TEXT NOT NULL,
+                               value TEXT,
+                               created_at REAL NOT NULL,
+                               expires_at REAL NOT NULL,
+                               PRIMARY KEY (namespace, cache_key)
+                           )"""
+                    )
+                    conn.commit()
+                    self._initialized = True
+        return conn
+
+    def _bump(self, counter: str):
+        with self._stats_lock:
+            self._stats[counter] += 1
+
+    def get(self, namespace: str, key: str):
+        """
+        Looks up a cached entry.
+
+        Returns:
+            tuple: (found, value). found is False on a miss or expired entry;
+                   value is None for a negative entry.
+        """
+        try:
+            row = self._connection().execute(
+                "SELECT value, expires_at FROM geocode_cache WHERE namespace = ? AND cache_key = ?",
+                (namespace, key),
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Warning: Geocode cache read failed for '{key}': {e}")
+            self._bump("errors")
+            return False, None
+
+        if row is None:
+            self._bump("misses")
+            return False, None
+
+        value_json, expires_at = row
+        if expires_at < time.time():
+            self._bump("expired")
+            self._bump("misses")
+            return False, None
+
+        if value_json is None:
+            self._bump("negative_hits")
+            return True, None
+
+        self._bump("hits")
+        return True, json.loads(value_json)
+
+    def set(self, namespace: str, key: str, value):
+        """Stores a value (or None for a negative entry) with the matching TTL."""
+        now = time.time()
+        ttl = self.positive_ttl if value is not None else self.negative_ttl
+        value_json = json.dumps(value, ensure_ascii=False) if value is not None else None
+        try:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO geocode_cache (namespace, cache_key, value, created_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+                (namespace, key, value_json, now, now + ttl),
+            )
+            conn.commit()
+            self._bump("stores")
+        except sqlite3.Error as e:
+            print(f"Warning: Geocode cache write failed for '{key}': {e}")
+            self._bump("errors")
+
+    def purge_expired(self) -> int:
+        """Deletes expired rows and returns how many were removed."""
+        try:
+            conn = self._connection()
+            cursor = conn.execute("DELETE FROM geocode_cache WHERE expires_at < ?", (time.time(),))
+            conn.commit()
+            return cursor.rowcount
+        except sqlite3.Error as e:
+            print(f"Warning: Geocode cache purge failed: {e}")
+            return 0
+
+    def stats(self) -> dict:
+        """Returns hit/miss counters for this process plus the overall hit rate."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["negative_hits"] + stats["misses"]
+        stats["lookups"] = lookups
+        stats["hit_rate"] = round((stats["hits"] + stats["negative_hits"]) / lookups, 4) if lookups else 0.0
+        return stats
+
+
+geocode_cache = GeocodeCache()
@@ -1,10 +1,41 @@
 import requests
+from requests.adapters import HTTPAdapter
 import os
+import threading
+import time
+import argparse
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 import json
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # Allows running this file as a script
+from services.geocode_cache import geocode_cache
+from services.rate_limiter import RateLimiter
 
 load_dotenv()
 
+GEOCODE_URL = (os.getenv("GOOGLEMAPS_BASE_URL") or "https://maps.googleapis.com") + "/maps/api/geocode/json"
+GEOCODE_TIMEOUT = (float(os.getenv("GOOGLEMAPS_CONNECT_TIMEOUT", 3)), float(os.getenv("GOOGLEMAPS_READ_TIMEOUT", 5)))
+GEOCODE_QPS = float(os.getenv("GOOGLEMAPS_QPS", 10))
+GEOCODE_BATCH_WORKERS = int(os.getenv("GEOCODE_BATCH_WORKERS", 8))
+GEOCODE_CHECKPOINT_EVERY = int(os.getenv("GEOCODE_CHECKPOINT_EVERY", 25))
+ADDRESS_CACHE_NAMESPACE = "address"
+
+_session = None
+_session_lock = threading.Lock()
+_rate_limiter = RateLimiter(GEOCODE_QPS, burst=max(1, int(GEOCODE_QPS)))
+
+def _get_session():
+    """Returns one shared keep-alive session with a connection pool sized for the batch workers."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            pool_size = max(GEOCODE_BATCH_WORKERS, 1)
+            _session.mount("https://", HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size))
+            _session.mount("http://", HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size))
+        return _session
+
 def get_geocode_data(address):
     api_key = os.getenv('GOOGLEMAPS_API_KEY')
 
@@ -17,77 +48,149 @@ def get_geocode_data(address):
     }
 
     try:
-        response = requests.get("https://maps.googleapis.com/maps/api/geocode/json", params=params)
+        _rate_limiter.acquire()
+        response = _get_session().get(GEOCODE_URL, params=params, timeout=GEOCODE_TIMEOUT)
         response.raise_for_status()  # Raise an exception for HTTP errors
         data = response.json()
+        # OVER_QUERY_LIMIT / REQUEST_DENIED etc. come back as HTTP 200 with no results; report them as errors
+        if data.get('status') not in ('OK', 'ZERO_RESULTS'):
+            return f"Geocoding API returned status {data.get('status')}: {data.get('error_message', '')}".strip()
         return data['results']
     except requests.exceptions.RequestException as e:
         return f"An error occurred: {e}"
-    except KeyError:
+    except (KeyError, ValueError):
         return "Unable to parse response data."
-    
+
+def has_coordinates(item):
+    """True if a record already has usable (non-zero) lat/lon values."""
+    try:
+        return float(item.get("lat")) != 0.0 and float(item.get("lon")) != 0.0
+    except (TypeError, ValueError):
+        return False
+
+def geocode_address_cached(address):
+    """
+    Geocodes one address through the persistent cache.
+
+    Returns (location, error): location is {"lat": ..., "lng": ...} or None when the API has
+    no result; error is a message when the lookup failed and should be retried on a later run.
+    """
+    cache_key = geocode_cache.make_key(address)
+    found, cached_location = geocode_cache.get(ADDRESS_CACHE_NAMESPACE, cache_key)
+    if found:
+        return cached_location, None
+
+    geocode_result = get_geocode_data(address)
+    if isinstance(geocode_result, str): # Error message returned by get_geocode_data; not cached
+        return None, geocode_result
+
+    location = None
+    if geocode_result:
+        # Assuming the first result is the most relevant one
+        location = geocode_result[0].get("geometry", {}).get("location")
+        if not (location and "lat" in location and "lng" in location):
+            location = None
+    geocode_cache.set(ADDRESS_CACHE_NAMESPACE, cache_key, location)
+    return location, None
+
+def _write_json_atomically(data, json_file_path):
+    """Writes to a temp file and swaps it in, so an interrupted run never leaves a truncated file."""
+    tmp_path = f"{json_file_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, json_file_path)
+
+def batch_geocode_file(json_file_path, max_workers=GEOCODE_BATCH_WORKERS, checkpoint_every=GEOCODE_CHECKPOINT_EVERY):
+    """
+    Fills in lat/lon for every record of a scraped JSON dataset that has an address but no coordinates.
+
+    Addresses are de-duplicated and resolved concurrently (bounded by max_workers and the
+    GOOGLEMAPS_QPS rate limit) through the persistent geocode cache. The file is rewritten
+    atomically every checkpoint_every resolved addresses, so a re-run after a crash resumes
+    from the records that still lack coordinates. Returns a stats dict.
+    """
+    with open(json_file_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    stats = {"records": len(data), "already_geocoded": 0, "missing_address": 0,
+             "unique_addresses": 0, "updated": 0, "not_found": 0, "errors": 0}
+    records_by_address = {}
+    for item in data:
+        if has_coordinates(item):
+            stats["already_geocoded"] += 1
+            continue
+        address = (item.get("address") or "").strip()
+        if not address:
+            stats["missing_address"] += 1
+            continue
+        records_by_address.setdefault(address, []).append(item)
+    stats["unique_addresses"] = len(records_by_address)
+
+    if not records_by_address:
+        print(f"Nothing to geocode in {json_file_path}: {stats}")
+        return stats
+
+    print(f"Geocoding {len(records_by_address)} unique address(es) with {max_workers} worker(s)...")
+    started = time.perf_counter()
+    completed_since_checkpoint = 0
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(geocode_address_cached, address): address for address in records_by_address}
+            for future in as_completed(futures):
+                address = futures[future]
+                try:
+                    location, error = future.result()
+                except Exception as e:
+                    location, error = None, str(e)
+
+                if error:
+                    stats["errors"] += 1
+                    print(f"Could not get geocode data for {address}: {error}")
+                elif location is None:
+                    stats["not_found"] += 1
+                    print(f"No geocode results for {address}")
+                else:
+                    for item in records_by_address[address]:
+                        item["lat"] = str(location["lat"])
+                        item["lon"] = str(location["lng"])
+                        stats["updated"] += 1
+                    completed_since_checkpoint += 1
+
+                if completed_since_checkpoint >= checkpoint_every:
+                    _write_json_atomically(data, json_file_path)
+                    completed_since_checkpoint = 0
+                    print(f"Checkpoint saved ({stats['updated']} record(s) updated so far).")
+    finally:
+        # Also persists progress when interrupted (e.g. Ctrl+C) or when a worker raised.
+        if stats["updated"]:
+            _write_json_atomically(data, json_file_path)
+
+    stats["elapsed_seconds"] = round(time.perf_counter() - started, 2)
+    stats["cache"] = geocode_cache.stats()
+    return stats
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fill in missing lat/lon in a scraped dataset using the Geocoding API.")
+    parser.add_argument("--file", default="tripadvisor_da_nang_final_details.json", help="File name inside scrapper/data.")
+    parser.add_argument("--workers", type=int, default=GEOCODE_BATCH_WORKERS, help="Concurrent geocoding requests.")
+    parser.add_argument("--checkpoint-every", type=int, default=GEOCODE_CHECKPOINT_EVERY, help="Resolved addresses between checkpoint writes.")
+    args = parser.parse_args()
+
     # Ensure GOOGLEMAPS_API_KEY is set
     api_key = os.getenv('GOOGLEMAPS_API_KEY')
     if not api_key:
         print("Error: GOOGLEMAPS_API_KEY environment variable is not set.")
         print("Please set it before running the script (e.g., in a .env file).")
     else:
-        file_name = "tripadvisor_da_nang_final_details.json"
+        current_script_dir = os.path.dirname(os.path.abspath(__file__))
+        project_root = os.path.dirname(current_script_dir)
+        json_file_path = os.path.join(project_root, "scrapper", "data", args.file)
         try:
-            current_script_dir = os.path.dirname(os.path.abspath(__file__))
-            project_root = os.path.dirname(current_script_dir) 
-            json_file_path = os.path.join(project_root, "scrapper", "data", file_name)
-
-            with open(json_file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            result_stats = batch_geocode_file(json_file_path, max_workers=args.workers, checkpoint_every=args.checkpoint_every)
+            print(f"Batch geocoding finished: {json.dumps(result_stats)}")
         except FileNotFoundError:
             print(f"Error: The file {json_file_path} was not found.")
-            data = [] # Avoid further errors
         except json.JSONDecodeError:
             print(f"Error: Could not decode JSON from {json_file_path}.")
-            data = [] # Avoid further errors
-        except Exception as e:
-            print(f"An unexpected error occurred while reading {json_file_path}: {e}")
-            data = []
-
-        if not data:
-            print("No data loaded, exiting.")
-        else:
-            updated_count = 0
-            for item in data:
-                address = item.get("address")
-                if address:
-                    print(f"Processing address: {address}")
-                    geocode_result = get_geocode_data(address)
-                    
-                    if isinstance(geocode_result, str): # Error message returned by get_geocode_data
-                        print(f"Could not get geocode data for {address}: {geocode_result}")
-                        continue
-
-                    if geocode_result and len(geocode_result) > 0:
-                        # Assuming the first result is the most relevant one
-                        location = geocode_result[0].get("geometry", {}).get("location")
-                        if location and "lat" in location and "lng" in location:
-                            item["lat"] = str(location["lat"])
-                            item["lon"] = str(location["lng"])
-                            print(f"Updated lat/lon for {item.get('name', address)} to {item['lat']}, {item['lon']}")
-                            updated_count += 1
-                        else:
-                            print(f"Could not find lat/lon in geocode response for {address}. Response: {geocode_result[0]}")
-                    else:
-                        print(f"No geocode results for {address}")
-                else:
-                    print(f"Skipping item due to missing address: {item.get('name', 'Unknown item')}")
-            
-            if updated_count > 0:
-                try:
-                    with open(json_file_path, 'w', encoding='utf-8') as f:
-                        json.dump(data, f, ensure_ascii=False, indent=2)
-                    print(f"Successfully updated {updated_count} entries in {json_file_path}")
-                except IOError as e:
-                    print(f"Error: Could not write updated data to {json_file_path}: {e}")
-                except Exception as e:
-                    print(f"An unexpected error occurred while writing to {json_file_path}: {e}")
-            else:
-                print("No entries were updated.")
\ No newline at end of file
+        except IOError as e:
+            print(f"Error: Could not write updated data to {json_file_path}: {e}")
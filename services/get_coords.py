@@ -1,61 +1,110 @@
 import googlemaps
 import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from services.geocode_cache import geocode_cache
+from services.rate_limiter import RateLimiter
 
 API_KEY = os.environ.get("GOOGLEMAPS_API_KEY")
+GEOCODE_CACHE_NAMESPACE = "da_nang_place"
 
-def get_place_coords_if_in_da_nang(place_name: str, api_key: str = API_KEY):
+# --- Shared client configuration ---
+# GOOGLEMAPS_BASE_URL lets tests point the client at a local stub server (e.g. "http://127.0.0.1:8765").
+GOOGLEMAPS_BASE_URL = os.environ.get("GOOGLEMAPS_BASE_URL")
+GOOGLEMAPS_CONNECT_TIMEOUT = float(os.environ.get("GOOGLEMAPS_CONNECT_TIMEOUT", 3))
+GOOGLEMAPS_READ_TIMEOUT = float(os.environ.get("GOOGLEMAPS_READ_TIMEOUT", 5))
+GOOGLEMAPS_RETRY_TIMEOUT = int(os.environ.get("GOOGLEMAPS_RETRY_TIMEOUT", 15))
+GOOGLEMAPS_QPS = float(os.environ.get("GOOGLEMAPS_QPS", 10))
+GOOGLEMAPS_POOL_SIZE = int(os.environ.get("GOOGLEMAPS_POOL_SIZE", 10))
+
+_gmaps_client = None
+_gmaps_client_key = None
+_gmaps_client_lock = threading.Lock()
+_gmaps_rate_limiter = RateLimiter(GOOGLEMAPS_QPS, burst=max(1, int(GOOGLEMAPS_QPS)))
+
+def get_gmaps_client(api_key: str = API_KEY, base_url: str | None = None):
+    """
+    Returns the process-wide googlemaps.Client, creating it on first use.
+
+    The client reuses one keep-alive requests.Session with a pooled adapter, so repeated
+    lookups skip TLS and session setup. It is safe to share between threads.
+    """
+    global _gmaps_client, _gmaps_client_key
+    base_url = base_url or GOOGLEMAPS_BASE_URL
+    with _gmaps_client_lock:
+        if _gmaps_client is None or _gmaps_client_key != (api_key, base_url):
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=GOOGLEMAPS_POOL_SIZE, pool_maxsize=GOOGLEMAPS_POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+
+            client_kwargs = {
+                "key": api_key,
+                "connect_timeout": GOOGLEMAPS_CONNECT_TIMEOUT,
+                "read_timeout": GOOGLEMAPS_READ_TIMEOUT,
+                "retry_timeout": GOOGLEMAPS_RETRY_TIMEOUT,
+                "queries_per_second": max(1, int(GOOGLEMAPS_QPS)),
+                "requests_session": session,
+            }
+            if base_url:
+                client_kwargs["base_url"] = base_url
+
+            if _gmaps_client is not None:
+                _gmaps_client.session.close()
+            _gmaps_client = googlemaps.Client(**client_kwargs)
+            _gmaps_client_key = (api_key, base_url)
+        return _gmaps_client
+
+def reset_gmaps_client():
+    """Closes and drops the shared client (e.g. after changing the key or base URL in tests)."""
+    global _gmaps_client, _gmaps_client_key
+    with _gmaps_client_lock:
+        if _gmaps_client is not None:
+            _gmaps_client.session.close()
+        _gmaps_client = None
+        _gmaps_client_key = None
+
+def _rate_limited_geocode(gmaps, query: str):
+    """Sends one geocode request through the shared client-side rate limiter."""
+    _gmaps_rate_limiter.acquire()
+    return gmaps.geocode(query)
+
+def get_place_coords_if_in_da_nang(place_name: str, api_key: str = API_KEY, address: str | None = None, use_cache: bool = True):
     """
     Checks if a place is in Da Nang and returns its coordinates if found.
+    Results are served from the persistent geocode cache when possible; both
+    "found in Da Nang" and "not in Da Nang" outcomes are cached, API errors are not.
 
     Args:
         place_name (str): The name of the place to search for (e.g., "Fahasa Bookstore").
         api_key (str): Your Google Maps API key.
+        address (str, optional): Address given by the user, used as part of the cache key.
+        use_cache (bool): Set to False to bypass the cache and always query the API.
 
     Returns:
         dict: A dictionary with "lat" and "lng" if the place is in Da Nang,
               None otherwise.
     """
+    cache_key = geocode_cache.make_key(place_name, address)
+    if use_cache:
+        found, cached_place = geocode_cache.get(GEOCODE_CACHE_NAMESPACE, cache_key)
+        if found:
+            if cached_place is None:
+                print(f"Geocode cache hit (negative) for '{place_name}': not in Da Nang.")
+                return None
+            print(f"Geocode cache hit for '{place_name}': {cached_place.get('location')}")
+            cached_place["name"] = place_name
+            cached_place["location"] = tuple(cached_place["location"])
+            return cached_place
+
     if not api_key:
         print("Error: Google Maps API key not found. Please set the GOOGLEMAPS_API_KEY environment variable or pass it as an argument.")
         return None
 
-    gmaps = googlemaps.Client(key=api_key)
-
     try:
-        # Attempt 1: Geocode the place name as is
-        # print(f"Attempting to geocode: '{place_name}'")
-        geocode_result_attempt1 = gmaps.geocode(place_name)
-        # For the first attempt, the query_used_for_api is the place_name itself,
-        # and the original_name_to_match is also the place_name.
-        place_found_in_da_nang = _parse_geocode_results(
-            geocode_results=geocode_result_attempt1, 
-            query_used_for_api=place_name, 
-            original_name_to_match=place_name, 
-            target_city_name="Da Nang"
-        )
-        if place_found_in_da_nang:
-            return place_found_in_da_nang
-
-        # Attempt 2: If not found, try appending ", Da Nang" to the query
-        # print(f"'{place_name}' not found in Da Nang on first attempt or no results. Trying with ', Da Nang' suffix.")
-        specific_query_for_api = f"{place_name}, Da Nang"
-        # print(f"Attempting to geocode: '{specific_query_for_api}'")
-        geocode_result_attempt2 = gmaps.geocode(specific_query_for_api)
-        
-        # For the second attempt, the query_used_for_api is the specific_query_for_api,
-        # but the original_name_to_match is still the initial place_name.
-        place_found_in_da_nang_specific = _parse_geocode_results(
-            geocode_results=geocode_result_attempt2, 
-            query_used_for_api=specific_query_for_api, 
-            original_name_to_match=place_name, # Important: use original place_name for matching in formatted_address
-            target_city_name="Da Nang"
-        )
-        if place_found_in_da_nang_specific:
-            return place_found_in_da_nang_specific
-
-        print(f"'{place_name}' could not be found in Da Nang even after specific search, or the specific place name was not in the address.")
-        return None
-
+        gmaps = get_gmaps_client(api_key)
+        place_found = _geocode_place_in_da_nang(gmaps, place_name)
     except googlemaps.exceptions.ApiError as e:
         print(f"Google Maps API Error: {e}")
         return None
@@ -63,6 +112,49 @@ def get_place_coords_if_in_da_nang(place_name: str, api_key: str = API_KEY):
         print(f"An unexpected error occurred: {e}")
         return None
 
+    # Only definitive answers reach this point, so they are safe to cache (None = negative entry).
+    geocode_cache.set(GEOCODE_CACHE_NAMESPACE, cache_key, place_found)
+    return place_found
+
+def _geocode_place_in_da_nang(gmaps, place_name: str):
+    """
+    Runs the geocoding attempts for place_name. Returns the place dict or None when the
+    place is not in Da Nang; API and transport errors propagate to the caller.
+    """
+    # Attempt 1: Geocode the place name as is
+    # print(f"Attempting to geocode: '{place_name}'")
+    geocode_result_attempt1 = _rate_limited_geocode(gmaps, place_name)
+    # For the first attempt, the query_used_for_api is the place_name itself,
+    # and the original_name_to_match is also the place_name.
+    place_found_in_da_nang = _parse_geocode_results(
+        geocode_results=geocode_result_attempt1, 
+        query_used_for_api=place_name, 
+        original_name_to_match=place_name, 
+        target_city_name="Da Nang"
+    )
+    if place_found_in_da_nang:
+        return place_found_in_da_nang
+
+    # Attempt 2: If not found, try appending ", Da Nang" to the query
+    # print(f"'{place_name}' not found in Da Nang on first attempt or no results. Trying with ', Da Nang' suffix.")
+    specific_query_for_api = f"{place_name}, Da Nang"
+    # print(f"Attempting to geocode: '{specific_query_for_api}'")
+    geocode_result_attempt2 = _rate_limited_geocode(gmaps, specific_query_for_api)
+    
+    # For the second attempt, the query_used_for_api is the specific_query_for_api,
+    # but the original_name_to_match is still the initial place_name.
+    place_found_in_da_nang_specific = _parse_geocode_results(
+        geocode_results=geocode_result_attempt2, 
+        query_used_for_api=specific_query_for_api, 
+        original_name_to_match=place_name, # Important: use original place_name for matching in formatted_address
+        target_city_name="Da Nang"
+    )
+    if place_found_in_da_nang_specific:
+        return place_found_in_da_nang_specific
+
+    print(f"'{place_name}' could not be found in Da Nang even after specific search, or the specific place name was not in the address.")
+    return None
+
 def _parse_geocode_results(geocode_results, query_used_for_api: str, original_name_to_match: str, target_city_name: str):
     """
     Helper function to parse geocode results.
@@ -0,0 +1,474 @@
+import os
+import signal
+import sqlite3
+import subprocess
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from services.flight_cache import seconds_until_next_scrape
+
+# Background jobs (the scrapers) run as subprocesses started by one dispatcher thread, with every job
+# recorded in a SQLite table. Flask request threads only insert or update rows; they never run a crawl.
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+JOB_RUNNER_DB_PATH = os.getenv("JOB_RUNNER_DB_PATH", os.path.join(PROJECT_ROOT, "scrapper", "data", "jobs", "jobs.sqlite3"))
+JOB_RUNNER_LOG_DIR = os.getenv("JOB_RUNNER_LOG_DIR", os.path.join(PROJECT_ROOT, "scrapper", "data", "jobs", "logs"))
+# Jobs running at once across all job types (a scraper run already drives several browsers)
+JOB_RUNNER_MAX_CONCURRENCY = int(os.getenv("JOB_RUNNER_MAX_CONCURRENCY", 1))
+JOB_RUNNER_POLL_SECONDS = float(os.getenv("JOB_RUNNER_POLL_SECONDS", 2.0))
+# How long a cancelled or timed-out job gets to exit after SIGTERM before it is killed
+JOB_RUNNER_KILL_GRACE_SECONDS = float(os.getenv("JOB_RUNNER_KILL_GRACE_SECONDS", 15))
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+ACTIVE_STATES = (QUEUED, RUNNING)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    job_type TEXT NOT NULL,
+    status TEXT NOT NULL,
+    trigger TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    pid INTEGER,
+    pid_start TEXT,
+    exit_code INTEGER,
+    error TEXT,
+    log_path TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS jobs_created ON jobs (created_at);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+-- Single flight: at most one queued or running job per type, enforced by the database for every process
+CREATE UNIQUE INDEX IF NOT EXISTS jobs_single_flight ON jobs (job_type) WHERE status IN ('queued', 'running');
+"""
+
+
+def _iso(timestamp):
+    return datetime.fromtimestamp(timestamp).isoformat(timespec="seconds") if timestamp else None
+
+
+def _process_stat(pid):
+    """(state, start time in clock ticks since boot) of a process from /proc, or (None, None) where that is not available."""
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            # The fields after the ')' that closes the command name start at field 3 (state); start time is field 22
+            fields = f.read().rsplit(b")", 1)[1].split()
+        return fields[0].decode(), fields[19].decode()
+    except (OSError, IndexError):
+        return None, None
+
+
+def _pid_alive(pid, pid_start=None):
+    """Whether pid is still the job's process; a recorded start time guards against a reused pid."""
+    if not pid:
+        return False
+    if os.name != "posix":
+        return False # No side-effect-free check on Windows; a restarted server treats its old jobs as gone
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    state, start = _process_stat(pid)
+    if state == "Z":
+        return False # Exited; its parent (a stopped dispatcher) has not reaped it
+    return pid_start is None or start in (None, pid_start)
+
+
+def _read_log_tail(path, lines):
+    """The last lines of a job log (reads at most the final 64 KB)."""
+    if not path or lines <= 0:
+        return []
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - 64 * 1024))
+            return f.read().decode("utf-8", errors="replace").splitlines()[-lines:]
+    except OSError:
+        return []
+
+
+class JobType:
+    """A kind of job: the command its subprocess runs, an optional time limit and a hook called when a run ends."""
+
+    def __init__(self, name, command, timeout_seconds=None, on_finish=None, cwd=PROJECT_ROOT):
+        self.name = name
+        self.command = list(command)
+        self.timeout_seconds = timeout_seconds
+        self.on_finish = on_finish # Called with the finished job dict, whatever its status
+        self.cwd = cwd
+
+
+class JobRunner:
+    """
+    Persistent local job queue.
+
+    submit() records a queued job (or returns the job of that type already queued/running, so runs of
+    one type never overlap); the dispatcher thread started by start() launches queued jobs as
+    subprocesses up to max_concurrency, writes their output to a per-job log file, enforces time
+    limits, honours cancel() and queues daily schedules. Running jobs it did not launch (left by a
+    stopped or reloaded server) are watched through their pid until they exit.
+    """
+
+    def __init__(self, db_path=JOB_RUNNER_DB_PATH, log_dir=JOB_RUNNER_LOG_DIR, max_concurrency=JOB_RUNNER_MAX_CONCURRENCY,
+                 poll_seconds=JOB_RUNNER_POLL_SECONDS, kill_grace_seconds=JOB_RUNNER_KILL_GRACE_SECONDS):
+        self.db_path = db_path
+        self.log_dir = log_dir
+        self.max_concurrency = max(1, max_concurrency)
+        self.poll_seconds = poll_seconds
+        self.kill_grace_seconds = kill_grace_seconds
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        os.makedirs(log_dir, exist_ok=True)
+        self._lock = threading.Lock() # One connection, serialised; every write commits before the lock is released
+        # busy_timeout: other server processes may share the file
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=10)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            if "pid_start" not in columns: # Databases created before the column existed
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN pid_start TEXT")
+        self._job_types = {}
+        self._schedules = {} # job_type -> (schedule_time 'HH:MM', next run epoch seconds)
+        self._processes = {} # job_id -> {"process", "log", "deadline", "terminated_at", "timed_out"}; only the dispatcher thread touches it
+        # Running jobs this dispatcher did not launch (started by an earlier or another server process) that it
+        # has signalled: job_id -> {"terminated_at", "timed_out"}
+        self._unwatched_stops = {}
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    # --- Configuration ---
+
+    def register(self, name, command, timeout_seconds=None, on_finish=None, cwd=PROJECT_ROOT):
+        self._job_types[name] = JobType(name, command, timeout_seconds, on_finish, cwd)
+
+    def job_types(self):
+        return sorted(self._job_types)
+
+    def schedule_daily(self, job_type, schedule_time):
+        """Queues job_type every day at schedule_time ('HH:MM', server local time)."""
+        if job_type not in self._job_types:
+            raise ValueError(f"Unknown job type '{job_type}'.")
+        self._schedules[job_type] = (schedule_time, time.time() + seconds_until_next_scrape(schedule_time=schedule_time))
+        print(f"Job '{job_type}' scheduled daily at {schedule_time}")
+
+    # --- Lifecycle ---
+
+    def start(self):
+        """Starts the dispatcher thread (idempotent)."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._dispatch_loop, name="job-runner", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """Stops dispatching. Running subprocesses are left to finish; the next dispatcher watches them until they exit."""
+        self._stopping.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    # --- Public API (safe from request threads) ---
+
+    def submit(self, job_type, trigger="manual"):
+        """
+        Queues a job and returns (job, created). If a job of this type is already queued or running,
+        that job is returned with created=False instead (single flight).
+        """
+        if job_type not in self._job_types:
+            raise ValueError(f"Unknown job type '{job_type}'. Known types: {', '.join(self.job_types())}")
+        for _ in range(3):
+            job_id = uuid.uuid4().hex
+            try:
+                with self._lock, self._conn:
+                    self._conn.execute("INSERT INTO jobs (id, job_type, status, trigger, created_at) VALUES (?, ?, ?, ?, ?)",
+                                       (job_id, job_type, QUEUED, trigger, time.time()))
+                self._wake.set()
+                return self.get(job_id), True
+            except sqlite3.IntegrityError:
+                active = self._active_job(job_type)
+                if active:
+                    return active, False
+                # The active job finished between the insert and the lookup; try again
+        raise RuntimeError(f"Could not queue a '{job_type}' job.")
+
+    def cancel(self, job_id):
+        """
+        Cancels a queued job at once, or asks the dispatcher to stop a running one (SIGTERM, then a
+        kill after the grace period). Returns the job, or None if it does not exist.
+        """
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE jobs SET status = ?, finished_at = ?, error = ? WHERE id = ? AND status = ?",
+                               (CANCELLED, time.time(), "Cancelled before it started.", job_id, QUEUED))
+            self._conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = ?", (job_id, RUNNING))
+        self._wake.set()
+        return self.get(job_id)
+
+    def get(self, job_id, log_lines=0):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = self._to_dict(row)
+        if log_lines:
+            job["log_tail"] = _read_log_tail(row["log_path"], log_lines)
+        return job
+
+    def list(self, job_type=None, status=None, limit=50):
+        query, params = "SELECT * FROM jobs WHERE 1 = 1", []
+        if job_type:
+            query += " AND job_type = ?"
+            params.append(job_type)
+        if status:
+            query += " AND status = ?"
+            params.append(status)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        params.append(max(1, min(int(limit), 500)))
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def stats(self):
+        """Job counts by status, plus per type the last run and the mean duration of recent successful runs."""
+        with self._lock:
+            counts = {row["status"]: row["n"] for row in self._conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")}
+            per_type = {}
+            for name in self.job_types():
+                last = self._conn.execute("SELECT * FROM jobs WHERE job_type = ? AND finished_at IS NOT NULL ORDER BY finished_at DESC LIMIT 1",
+                                          (name,)).fetchone()
+                durations = [row["d"] for row in self._conn.execute(
+                    "SELECT finished_at - started_at AS d FROM jobs WHERE job_type = ? AND status = ? AND started_at IS NOT NULL "
+                    "ORDER BY finished_at DESC LIMIT 20", (name, SUCCEEDED))]
+                schedule = self._schedules.get(name)
+                per_type[name] = {
+                    "last_status": last["status"] if last else None,
+                    "last_finished_at": _iso(last["finished_at"]) if last else None,
+                    "mean_success_seconds": round(sum(durations) / len(durations), 1) if durations else None,
+                    "next_scheduled_at": _iso(schedule[1]) if schedule else None,
+                }
+        return {
+            "dispatcher_running": bool(self._thread and self._thread.is_alive()),
+            "max_concurrency": self.max_concurrency,
+            "counts": counts,
+            "job_types": per_type,
+        }
+
+    def _active_job(self, job_type):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE job_type = ? AND status IN (?, ?)", (job_type, *ACTIVE_STATES)).fetchone()
+        return self._to_dict(row) if row else None
+
+    @staticmethod
+    def _to_dict(row):
+        now = time.time()
+        started, finished = row["started_at"], row["finished_at"]
+        return {
+            "id": row["id"],
+            "type": row["job_type"],
+            "status": row["status"],
+            "trigger": row["trigger"],
+            "created_at": _iso(row["created_at"]),
+            "started_at": _iso(started),
+            "finished_at": _iso(finished),
+            "queued_seconds": round((started or finished or now) - row["created_at"], 1),
+            "run_seconds": round((finished or now) - started, 1) if started else None,
+            "exit_code": row["exit_code"],
+            "error": row["error"],
+            "cancel_requested": bool(row["cancel_requested"]),
+            "log_path": row["log_path"],
+        }
+
+    # --- Dispatcher thread ---
+
+    def _dispatch_loop(self):
+        print(f"Job runner started (max concurrency {self.max_concurrency}, db {self.db_path})")
+        while not self._stopping.is_set():
+            try:
+                self._queue_due_schedules()
+                self._reap()
+                self._check_unwatched()
+                self._launch_queued()
+            except Exception as e:
+                # Keep dispatching; one bad iteration (e.g. a locked database) must not stop every future job
+                print(f"Error in job runner loop: {e}")
+            self._wake.wait(self.poll_seconds)
+            self._wake.clear()
+
+    def _queue_due_schedules(self):
+        now = time.time()
+        for job_type, (schedule_time, next_run) in list(self._schedules.items()):
+            if now >= next_run:
+                job, created = self.submit(job_type, trigger="schedule")
+                print(f"Scheduled '{job_type}' run {'queued' if created else 'skipped; already ' + job['status']} ({job['id']})")
+                self._schedules[job_type] = (schedule_time, now + seconds_until_next_scrape(schedule_time=schedule_time))
+
+    def _launch_queued(self):
+        with self._lock:
+            # Counted across every process sharing the database, so the limit holds for the whole host
+            running = self._conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (RUNNING,)).fetchone()[0]
+            free = self.max_concurrency - running
+            if free <= 0:
+                return
+            candidates = self._conn.execute("SELECT id, job_type FROM jobs WHERE status = ? ORDER BY created_at LIMIT ?",
+                                            (QUEUED, free)).fetchall()
+        for row in candidates:
+            job_type = self._job_types.get(row["job_type"])
+            if job_type is None:
+                continue # Registered by another process only; that one launches it
+            with self._lock, self._conn:
+                claimed = self._conn.execute("UPDATE jobs SET status = ?, started_at = ? WHERE id = ? AND status = ?",
+                                             (RUNNING, time.time(), row["id"], QUEUED)).rowcount
+            if claimed:
+                self._launch(row["id"], job_type)
+
+    def _launch(self, job_id, job_type):
+        log_path = os.path.join(self.log_dir, f"{job_type.name}_{job_id}.log")
+        try:
+            log = open(log_path, "ab")
+            process = subprocess.Popen(
+                job_type.command, cwd=job_type.cwd, stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+                env=dict(os.environ, PYTHONUNBUFFERED="1"),
+                # Own process group, so cancelling also stops the browsers and pool workers the job spawns
+                start_new_session=(os.name == "posix"),
+            )
+        except OSError as e:
+            self._finish(job_id, job_type, FAILED, None, f"Could not start the job: {e}")
+            return
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE jobs SET pid = ?, pid_start = ?, log_path = ? WHERE id = ?",
+                               (process.pid, _process_stat(process.pid)[1], log_path, job_id))
+        deadline = time.monotonic() + job_type.timeout_seconds if job_type.timeout_seconds else None
+        self._processes[job_id] = {"process": process, "log": log, "type": job_type, "deadline": deadline,
+                                   "terminated_at": None, "timed_out": False}
+        print(f"Started job {job_type.name} ({job_id}), pid {process.pid}, log {log_path}")
+
+    def _reap(self):
+        for job_id, entry in list(self._processes.items()):
+            process = entry["process"]
+            exit_code = process.poll()
+            if exit_code is None:
+                self._enforce_limits(job_id, entry)
+                continue
+            entry["log"].close()
+            del self._processes[job_id]
+            with self._lock:
+                cancel_requested = self._conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()[0]
+            if cancel_requested:
+                status, error = CANCELLED, "Cancelled while running."
+            elif entry["timed_out"]:
+                status, error = FAILED, f"Timed out after {entry['type'].timeout_seconds} seconds."
+            elif exit_code == 0:
+                status, error = SUCCEEDED, None
+            else:
+                status, error = FAILED, f"Exited with code {exit_code}."
+            self._finish(job_id, entry["type"], status, exit_code, error)
+
+    def _enforce_limits(self, job_id, entry):
+        now = time.monotonic()
+        if entry["terminated_at"] is None:
+            with self._lock:
+                cancel_requested = self._conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()[0]
+            if entry["deadline"] and now >= entry["deadline"]:
+                entry["timed_out"] = True
+            if cancel_requested or entry["timed_out"]:
+                print(f"Stopping job {entry['type'].name} ({job_id}): {'cancelled' if cancel_requested else 'time limit reached'}")
+                self._signal(entry["process"], signal.SIGTERM)
+                entry["terminated_at"] = now
+        elif now - entry["terminated_at"] >= self.kill_grace_seconds:
+            print(f"Job {entry['type'].name} ({job_id}) did not exit after SIGTERM; killing it")
+            self._signal(entry["process"], signal.SIGKILL if os.name == "posix" else signal.SIGTERM)
+            entry["terminated_at"] = float("inf") # Killed; just wait for it to be reaped
+
+    def _check_unwatched(self):
+        """
+        Running jobs this dispatcher did not launch (left by a stopped or reloaded server, or owned by
+        another server process): marks them finished once their process is gone, and applies
+        cancellation and time limits to them through their process group.
+        """
+        now = time.time()
+        with self._lock:
+            rows = [row for row in self._conn.execute("SELECT * FROM jobs WHERE status = ?", (RUNNING,)).fetchall()
+                    if row["id"] not in self._processes]
+        for row in rows:
+            job_id = row["id"]
+            job_type = self._job_types.get(row["job_type"])
+            stop = self._unwatched_stops.get(job_id)
+            if row["pid"] is None:
+                # Claimed but not launched yet has no pid for a moment; only a stale one was lost
+                if now - (row["started_at"] or now) >= 60:
+                    self._finish(job_id, job_type, FAILED, None, "The server exited before the job was started.", only_if_running=True)
+                continue
+            if not _pid_alive(row["pid"], row["pid_start"]):
+                self._unwatched_stops.pop(job_id, None)
+                if row["cancel_requested"]:
+                    status, error = CANCELLED, "Cancelled while running."
+                elif stop and stop["timed_out"]:
+                    status, error = FAILED, f"Timed out after {job_type.timeout_seconds} seconds."
+                else:
+                    status, error = FAILED, "The job's process exited while no dispatcher was attached to it; its exit status is unknown."
+                self._finish(job_id, job_type, status, None, error, only_if_running=True)
+                continue
+            if stop is None:
+                timed_out = bool(job_type and job_type.timeout_seconds and now - row["started_at"] >= job_type.timeout_seconds)
+                if row["cancel_requested"] or timed_out:
+                    print(f"Stopping job {row['job_type']} ({job_id}): {'cancelled' if row['cancel_requested'] else 'time limit reached'}")
+                    self._signal_group(row["pid"], signal.SIGTERM)
+                    self._unwatched_stops[job_id] = {"terminated_at": time.monotonic(), "timed_out": timed_out}
+            elif time.monotonic() - stop["terminated_at"] >= self.kill_grace_seconds:
+                print(f"Job {row['job_type']} ({job_id}) did not exit after SIGTERM; killing it")
+                self._signal_group(row["pid"], signal.SIGKILL if os.name == "posix" else signal.SIGTERM)
+                stop["terminated_at"] = float("inf") # Killed; just wait for it to disappear
+
+    @staticmethod
+    def _signal(process, sig):
+        try:
+            if os.name == "posix":
+                os.killpg(process.pid, sig)
+            elif sig == signal.SIGTERM:
+                process.terminate()
+        except (ProcessLookupError, PermissionError, OSError) as e:
+            print(f"Could not signal pid {process.pid}: {e}")
+
+    @staticmethod
+    def _signal_group(pid, sig):
+        """Signals the process group of a job this dispatcher has no Popen for (its pid leads the group)."""
+        if os.name != "posix":
+            return # Without process groups there is no safe way to stop another server's job
+        try:
+            os.killpg(pid, sig)
+        except (ProcessLookupError, PermissionError, OSError) as e:
+            print(f"Could not signal process group {pid}: {e}")
+
+    def _finish(self, job_id, job_type, status, exit_code, error, only_if_running=False):
+        query = "UPDATE jobs SET status = ?, finished_at = ?, exit_code = ?, error = ? WHERE id = ?"
+        if only_if_running:
+            query += f" AND status = '{RUNNING}'" # The owning dispatcher may have recorded the real outcome first
+        with self._lock, self._conn:
+            updated = self._conn.execute(query, (status, time.time(), exit_code, error, job_id)).rowcount
+        if not updated:
+            return
+        job = self.get(job_id)
+        print(f"Job {job['type']} ({job_id}) {status} after {job['run_seconds']}s" + (f": {error}" if error else ""))
+        if job_type and job_type.on_finish:
+            try:
+                job_type.on_finish(job)
+            except Exception as e:
+                print(f"Error in on_finish hook of job type '{job_type.name}': {e}")
+        self._wake.set() # A slot is free; launch the next queued job without waiting for the poll
+
+
+job_runner = JobRunner()
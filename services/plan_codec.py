@@ -0,0 +1,194 @@
+import hashlib
+
+from services.geocode_cache import normalize_place_name
+from services.tsp_algorithm import get_planner_catalog
+
+COMPACT_PLAN_FORMAT = "plan-compact/1"
+
+# Route time slots, indexed by position in the compact encoding.
+TIME_SLOTS = ["StartOfDay", "Morning", "Lunch", "Afternoon", "Dinner", "Evening"]
+PLANNED_SLOTS = TIME_SLOTS[1:]
+
+TYPE_PREFIXES = {"hotel": "h", "restaurant": "r", "place": "p"}
+CUSTOM_PREFIX = "c"
+
+# Compact route entry columns after [place_id, slot_index]; extras for a stop go in an optional trailing dict.
+ROUTE_COLUMNS = ["distance_from_previous_km", "travel_minutes", "visit_minutes", "start_time", "end_time"]
+
+
+def make_place_id(name, place_type):
+    """Stable id for a place: a type prefix plus a short hash of the folded name."""
+    digest = hashlib.sha1(normalize_place_name(name).encode("utf-8")).hexdigest()[:10]
+    return TYPE_PREFIXES.get(place_type, CUSTOM_PREFIX) + digest
+
+
+def is_compact_plan_output(data):
+    return isinstance(data, dict) and data.get("format") == COMPACT_PLAN_FORMAT
+
+
+def _catalog_description(name, catalog):
+    if not isinstance(name, str):
+        return None
+    return catalog.description_by_name.get(name.lower())
+
+
+def encode_plan_output(output, catalog=None):
+    """
+    Encodes the planner tool output into the compact form kept in agent state.
+
+    Each distinct stop is stored once in 'places' under a stable id (name, coords, type); days
+    keep only [place_id, slot_index, distance, travel, visit, start, end] rows. Descriptions that
+    the planner catalog can restore are dropped. hydrate_plan_output() reverses this.
+    """
+    if not isinstance(output, dict) or is_compact_plan_output(output):
+        return output
+    catalog = catalog or get_planner_catalog()
+
+    compact = {key: value for key, value in output.items() if key != "base_plan"}
+    compact["format"] = COMPACT_PLAN_FORMAT
+    compact["base_plan"] = None
+    places = {}
+    compact["places"] = places
+
+    base_plan = output.get("base_plan")
+    if not isinstance(base_plan, dict):
+        return compact
+
+    def register(name, coords, place_type, description):
+        place_id = make_place_id(name, place_type)
+        if place_id not in places:
+            entry = {"n": name, "c": coords, "t": place_type}
+            if description != _catalog_description(name, catalog):
+                entry["d"] = description
+            places[place_id] = entry
+        entry = places[place_id]
+        # Anything that differs from the registry entry is kept on the stop itself.
+        extras = {}
+        if entry["c"] != coords:
+            extras["c"] = coords
+        if entry["t"] != place_type:
+            extras["t"] = place_type
+        if entry.get("d", _catalog_description(name, catalog)) != description:
+            extras["d"] = description
+        return place_id, extras
+
+    hotel = base_plan.get("hotel") or {}
+    hotel_id, hotel_extras = register(hotel.get("name"), hotel.get("coords"), "hotel", hotel.get("description"))
+    compact_plan = {"hotel": [hotel_id, hotel_extras] if hotel_extras else hotel_id, "days": []}
+    if "seed" in base_plan:
+        compact_plan["seed"] = base_plan["seed"]
+
+    for day_plan in base_plan.get("daily_plans", []):
+        rows = []
+        for route_stop in day_plan.get("route", []):
+            place_id, extras = register(route_stop.get("name"), route_stop.get("coords"),
+                                        route_stop.get("type"), route_stop.get("description"))
+            slot = route_stop.get("time_slot")
+            row = [place_id, TIME_SLOTS.index(slot) if slot in TIME_SLOTS else slot]
+            row.extend(route_stop.get(column) for column in ROUTE_COLUMNS)
+            if route_stop.get("schedule_note"):
+                extras["note"] = route_stop["schedule_note"]
+            if extras:
+                row.append(extras)
+            rows.append(row)
+        compact_plan["days"].append([day_plan.get("day"), rows])
+
+    compact["base_plan"] = compact_plan
+    return compact
+
+
+def hydrate_plan_output(compact, catalog=None):
+    """Rebuilds the full planner output (with descriptions) from its compact form. Other values pass through."""
+    if not is_compact_plan_output(compact):
+        return compact
+    catalog = catalog or get_planner_catalog()
+
+    output = {key: value for key, value in compact.items() if key not in ("format", "places", "base_plan")}
+    compact_plan = compact.get("base_plan")
+    if not isinstance(compact_plan, dict):
+        output["base_plan"] = compact_plan
+        return output
+
+    places = compact.get("places", {})
+
+    def resolve(place_id, extras):
+        entry = places.get(place_id, {})
+        name = entry.get("n")
+        description = extras.get("d", entry.get("d", _catalog_description(name, catalog)))
+        return name, extras.get("c", entry.get("c")), extras.get("t", entry.get("t")), description
+
+    hotel_ref = compact_plan.get("hotel")
+    hotel_id, hotel_extras = (hotel_ref[0], hotel_ref[1]) if isinstance(hotel_ref, list) else (hotel_ref, {})
+    hotel_name, hotel_coords, _, hotel_description = resolve(hotel_id, hotel_extras)
+    base_plan = {
+        "hotel": {"name": hotel_name, "coords": hotel_coords, "description": hotel_description},
+        "daily_plans": [],
+    }
+    if "seed" in compact_plan:
+        base_plan["seed"] = compact_plan["seed"]
+
+    for day_number, rows in compact_plan.get("days", []):
+        route = []
+        planned_stops = {slot: [] for slot in PLANNED_SLOTS}
+        for step, row in enumerate(rows):
+            place_id, slot_ref = row[0], row[1]
+            extras = row[2 + len(ROUTE_COLUMNS)] if len(row) > 2 + len(ROUTE_COLUMNS) else {}
+            name, coords, place_type, description = resolve(place_id, extras)
+            time_slot = TIME_SLOTS[slot_ref] if isinstance(slot_ref, int) else slot_ref
+            route_stop = {
+                "step": step,
+                "time_slot": time_slot,
+                "name": name,
+                "type": place_type,
+                "coords": coords,
+                "description": description,
+            }
+            for column, value in zip(ROUTE_COLUMNS, row[2:2 + len(ROUTE_COLUMNS)]):
+                if value is not None:
+                    route_stop[column] = value
+            if extras.get("note"):
+                route_stop["schedule_note"] = extras["note"]
+            route.append(route_stop)
+            if time_slot != "StartOfDay":
+                planned_stops.setdefault(time_slot, []).append(name)
+        base_plan["daily_plans"].append({"day": day_number, "planned_stops": planned_stops, "route": route})
+
+    output["base_plan"] = base_plan
+    return output
+
+
+def summarize_plan_output(compact):
+    """
+    Short text version of a compact plan for the LLM: the planner notes plus one line per day
+    with times, slots, stop names and distances. Descriptions are left to the API response.
+    """
+    if not is_compact_plan_output(compact):
+        return str(compact)
+
+    lines = [note for note in compact.get("notes", []) if isinstance(note, str)]
+    compact_plan = compact.get("base_plan")
+    if not isinstance(compact_plan, dict):
+        lines.append("No itinerary was produced.")
+        return "\n".join(lines)
+
+    places = compact.get("places", {})
+    hotel_ref = compact_plan.get("hotel")
+    hotel_id = hotel_ref[0] if isinstance(hotel_ref, list) else hotel_ref
+    header = f"Itinerary for {compact.get('travel_duration_requested')}"
+    if "seed" in compact_plan:
+        header += f" (seed {compact_plan['seed']})"
+    lines.append(f"{header}. Hotel: {places.get(hotel_id, {}).get('n')}.")
+
+    total_km = 0.0
+    for day_number, rows in compact_plan.get("days", []):
+        parts = []
+        for row in rows[1:]:
+            slot_ref = row[1]
+            slot = TIME_SLOTS[slot_ref] if isinstance(slot_ref, int) else slot_ref
+            distance_km, start_time, end_time = row[2], row[5], row[6]
+            total_km += distance_km or 0.0
+            timing = f"{start_time}-{end_time} " if start_time and end_time else ""
+            parts.append(f"{timing}{slot}: {places.get(row[0], {}).get('n')} ({distance_km} km)")
+        lines.append(f"Day {day_number}: " + " | ".join(parts))
+    lines.append(f"Total travel: {round(total_km, 1)} km. Full stop descriptions are shown to the user by the app.")
+    return "\n".join(lines)
@@ -0,0 +1,116 @@
+import numpy as np
+
+PRIORITY_WEIGHT = 3 # Higher chance for priority 1
+OTHER_WEIGHT = 1    # Lower chance for others
+
+
+class CatalogSelection:
+    """
+    Names already used in one plan, mirrored as boolean masks over the catalog arrays.
+
+    Behaves like the set of lower-cased names the planner used before ('in' and add()),
+    so exclusion during sampling is a mask lookup instead of rebuilding filtered lists.
+    """
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.names = set()
+        self.place_mask = np.zeros(len(catalog.must_visit_places), dtype=bool)
+        self.restaurant_mask = np.zeros(len(catalog.restaurants), dtype=bool)
+
+    def add(self, name_lower):
+        self.names.add(name_lower)
+        for index in self.catalog.place_indices_by_name.get(name_lower, ()):
+            self.place_mask[index] = True
+        for index in self.catalog.restaurant_indices_by_name.get(name_lower, ()):
+            self.restaurant_mask[index] = True
+
+    def __contains__(self, name_lower):
+        return name_lower in self.names
+
+    def __len__(self):
+        return len(self.names)
+
+
+class PlannerCatalog:
+    """
+    Planner data prepared once and shared across requests.
+
+    Must-visit places are bucketed per time of day into index arrays, priority weights are
+    precomputed, and candidates are drawn with Efraimidis-Spirakis keys (u ** (1 / w)) in one
+    vectorised pass, which is weighted sampling without replacement.
+    """
+
+    def __init__(self, must_visit_places, restaurants, hotels=None):
+        self.must_visit_places = list(must_visit_places)
+        self.restaurants = list(restaurants)
+        self.hotels = list(hotels or [])
+
+        self.place_weights = np.array(
+            [PRIORITY_WEIGHT if p.get('priority') == 1 else OTHER_WEIGHT for p in self.must_visit_places],
+            dtype=float,
+        )
+        self.restaurant_weights = np.ones(len(self.restaurants), dtype=float)
+
+        slot_members = {}
+        for index, place in enumerate(self.must_visit_places):
+            for time_of_day in place.get('times', set()):
+                slot_members.setdefault(time_of_day, []).append(index)
+        self.slot_pools = {slot: np.array(indices, dtype=np.intp) for slot, indices in slot_members.items()}
+
+        self.place_indices_by_name = self._index_names(self.must_visit_places)
+        self.restaurant_indices_by_name = self._index_names(self.restaurants)
+
+        # Lets compact plans drop catalog descriptions and restore them on demand.
+        self.description_by_name = {}
+        for record in self.must_visit_places + self.restaurants + self.hotels:
+            if isinstance(record.get('place'), str):
+                self.description_by_name.setdefault(record['place'].lower(), record.get('description'))
+
+    @staticmethod
+    def _index_names(records):
+        indices_by_name = {}
+        for index, record in enumerate(records):
+            name = record.get('place')
+            if isinstance(name, str):
+                indices_by_name.setdefault(name.lower(), []).append(index)
+        return indices_by_name
+
+    def new_selection(self):
+        """Returns an empty per-plan selection tracker for this catalog."""
+        return CatalogSelection(self)
+
+    @staticmethod
+    def _weighted_sample(candidates, weights, count, rng):
+        """Picks up to count indices from candidates without replacement, proportionally to weights."""
+        if count <= 0 or candidates.size == 0:
+            return candidates[:0]
+        count = min(count, candidates.size)
+        generator = np.random.default_rng(rng.getrandbits(64))
+        # Largest log(u) / w equals largest u ** (1 / w), without underflow for small weights.
+        keys = np.log(generator.random(candidates.size)) / weights[candidates]
+        if count < candidates.size:
+            top = np.argpartition(-keys, count - 1)[:count]
+            top = top[np.argsort(-keys[top])]
+        else:
+            top = np.argsort(-keys)
+        return candidates[top]
+
+    def sample_places(self, time_of_day, count, selection, rng):
+        """Weighted draw of must-visit places open for time_of_day and not yet in selection."""
+        pool = self.slot_pools.get(time_of_day)
+        if pool is None or pool.size == 0:
+            return []
+        available = pool[~selection.place_mask[pool]]
+        return [self.must_visit_places[i] for i in self._weighted_sample(available, self.place_weights, count, rng)]
+
+    def sample_restaurants(self, count, selection, rng):
+        """Uniform draw of restaurants not yet in selection."""
+        available = np.flatnonzero(~selection.restaurant_mask)
+        return [self.restaurants[i] for i in self._weighted_sample(available, self.restaurant_weights, count, rng)]
+
+    def pick_hotel(self, rng):
+        """Returns a one-element list with a randomly chosen hotel, or [] if there are none."""
+        if not self.hotels:
+            return []
+        return [rng.choice(self.hotels)]
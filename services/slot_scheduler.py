@@ -0,0 +1,212 @@
+import math
+import os
+import re
+
+# Slot windows in minutes after midnight: (earliest start, latest end).
+SLOT_WINDOWS = {
+    "morning": (8 * 60, 11 * 60 + 30),
+    "lunch": (11 * 60 + 30, 13 * 60 + 30),
+    "afternoon": (13 * 60 + 30, 17 * 60 + 30),
+    "dinner": (18 * 60, 20 * 60 + 30),
+    "evening": (20 * 60, 23 * 60),
+}
+DAY_START_MINUTES = SLOT_WINDOWS["morning"][0]
+
+# Default visit length per stop type when the data has no 'visit_duration_minutes'.
+DEFAULT_VISIT_MINUTES = {
+    "place": 90,
+    "restaurant": 60,
+    "custom_verified": 60,
+    "custom_pre_geocoded": 60,
+    "hotel": 0,
+}
+FALLBACK_VISIT_MINUTES = 60
+
+AVERAGE_SPEED_KMH = float(os.environ.get("PLANNER_AVERAGE_SPEED_KMH", 25))
+# Straight-line (haversine) distance understates city road distance.
+ROAD_DISTANCE_FACTOR = float(os.environ.get("PLANNER_ROAD_DISTANCE_FACTOR", 1.3))
+
+# Penalties added to an insertion cost (in km) when the resulting order breaks a window.
+# Missing a closing time is a hard failure; running over the slot is only undesirable.
+CLOSED_PENALTY_KM = 10000.0
+SLOT_OVERFLOW_PENALTY_KM = 1000.0
+
+_TIME_RE = re.compile(r"(\d{1,2})(?:[:h.](\d{2}))?\s*(am|pm)?", re.IGNORECASE)
+
+
+def _parse_clock(text):
+    """Parses '8:00', '08h30', '5 PM' or '17.30' into minutes after midnight, or None."""
+    match = _TIME_RE.search(text or "")
+    if not match:
+        return None
+    hours, minutes, meridiem = int(match.group(1)), int(match.group(2) or 0), (match.group(3) or "").lower()
+    if meridiem == "pm" and hours < 12:
+        hours += 12
+    elif meridiem == "am" and hours == 12:
+        hours = 0
+    if hours > 24 or minutes > 59:
+        return None
+    return hours * 60 + minutes
+
+
+def parse_opening_hours(value):
+    """
+    Normalises an opening-hours value to (open_minutes, close_minutes), or None if unknown.
+
+    Accepts a dict with 'open'/'close', a string such as '08:00 - 17:00' or '7 AM - 10 PM',
+    and 'Open 24 hours'. A closing time at or before the opening time is treated as past midnight.
+    """
+    if not value:
+        return None
+    if isinstance(value, dict):
+        open_minutes, close_minutes = _parse_clock(str(value.get("open", ""))), _parse_clock(str(value.get("close", "")))
+    else:
+        text = str(value).strip().lower()
+        if "24" in text and ("hour" in text or "giờ" in text or "24/7" in text):
+            return 0, 24 * 60
+        parts = re.split(r"\s*(?:-|–|to|đến)\s*", text, maxsplit=1)
+        if len(parts) != 2:
+            return None
+        open_minutes, close_minutes = _parse_clock(parts[0]), _parse_clock(parts[1])
+    if open_minutes is None or close_minutes is None:
+        return None
+    if close_minutes <= open_minutes:
+        close_minutes += 24 * 60
+    return open_minutes, close_minutes
+
+
+def travel_minutes_for_km(distance_km):
+    """Estimated door-to-door travel time for a straight-line distance, rounded up to whole minutes."""
+    if not math.isfinite(distance_km) or distance_km <= 0:
+        return 0
+    return math.ceil(distance_km * ROAD_DISTANCE_FACTOR / AVERAGE_SPEED_KMH * 60)
+
+
+def format_clock(minutes):
+    """Formats minutes after midnight as 'HH:MM' (wrapping past midnight)."""
+    minutes = int(minutes) % (24 * 60)
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def visit_minutes_for(stop_type, constraints=None):
+    """Visit length for a stop: the data's own duration if given, else the per-type default."""
+    if constraints and constraints.get("visit_duration_minutes"):
+        try:
+            return max(0, int(constraints["visit_duration_minutes"]))
+        except (TypeError, ValueError):
+            pass
+    return DEFAULT_VISIT_MINUTES.get(stop_type, FALLBACK_VISIT_MINUTES)
+
+
+def _simulate(order, start_location, start_time, slot_window, distance_fn):
+    """
+    Walks one slot's stops in order. Returns (timings, penalty_km), where timings holds
+    (travel_km, travel_minutes, start, end) per stop and penalty_km prices the broken windows.
+    """
+    slot_start, slot_end = slot_window
+    current_location, current_time = start_location, start_time
+    timings, penalty_km = [], 0.0
+    for stop in order:
+        travel_km = distance_fn(current_location, stop["coords"])
+        travel_time = travel_minutes_for_km(travel_km)
+        start = max(current_time + travel_time, slot_start)
+        if stop["opening_hours"]:
+            start = max(start, stop["opening_hours"][0])
+        end = start + stop["visit_minutes"]
+        if stop["opening_hours"] and end > stop["opening_hours"][1]:
+            penalty_km += CLOSED_PENALTY_KM
+        elif end > slot_end:
+            penalty_km += SLOT_OVERFLOW_PENALTY_KM
+        timings.append((travel_km, travel_time, start, end))
+        current_location, current_time = stop["coords"], end
+    return timings, penalty_km
+
+
+def _order_slot_stops(stops, start_location, start_time, slot_window, distance_fn):
+    """
+    Cheapest-insertion ordering of one slot's stops.
+
+    Stops are inserted farthest-first; each goes where it adds the least travel, with a large
+    penalty for positions that break a slot or opening-hours window. O(k^3) for k stops in a
+    slot, which stays well under a millisecond for realistic slot sizes.
+    """
+    if len(stops) <= 1:
+        return list(stops)
+
+    remaining = sorted(stops, key=lambda s: distance_fn(start_location, s["coords"]), reverse=True)
+    order = []
+    for stop in remaining:
+        best_position, best_cost = 0, float("inf")
+        for position in range(len(order) + 1):
+            previous = order[position - 1]["coords"] if position > 0 else start_location
+            added_km = distance_fn(previous, stop["coords"])
+            if position < len(order):
+                following = order[position]["coords"]
+                added_km += distance_fn(stop["coords"], following) - distance_fn(previous, following)
+            candidate = order[:position] + [stop] + order[position:]
+            _, penalty_km = _simulate(candidate, start_location, start_time, slot_window, distance_fn)
+            cost = added_km + penalty_km
+            if cost < best_cost:
+                best_position, best_cost = position, cost
+        order.insert(best_position, stop)
+    return order
+
+
+def schedule_day_route(route, distance_fn, stop_constraints=None, day_start=DAY_START_MINUTES):
+    """
+    Assigns times to one day's route and reorders stops inside each slot.
+
+    route is the planner's day route (hotel first, then stops with 'time_slot', 'type', 'coords').
+    stop_constraints maps a lower-cased stop name to optional 'opening_hours' and
+    'visit_duration_minutes'. Returns a new route with steps and distances recomputed and
+    'start_time', 'end_time', 'travel_minutes' and 'visit_minutes' on every stop; stops that
+    cannot fit their window also get a 'schedule_note'.
+    """
+    stop_constraints = stop_constraints or {}
+    if not route:
+        return []
+
+    hotel_stop = dict(route[0])
+    hotel_stop.update({"start_time": format_clock(day_start), "end_time": format_clock(day_start),
+                       "travel_minutes": 0, "visit_minutes": 0})
+    scheduled_route = [hotel_stop]
+
+    slots_in_order, stops_by_slot = [], {}
+    for route_stop in route[1:]:
+        slot_key = str(route_stop.get("time_slot", "")).lower()
+        if slot_key not in stops_by_slot:
+            slots_in_order.append(slot_key)
+            stops_by_slot[slot_key] = []
+        constraints = stop_constraints.get(str(route_stop.get("name", "")).lower(), {})
+        stops_by_slot[slot_key].append({
+            "route_stop": route_stop,
+            "coords": tuple(route_stop.get("coords") or (0.0, 0.0)),
+            "opening_hours": parse_opening_hours(constraints.get("opening_hours")),
+            "visit_minutes": visit_minutes_for(route_stop.get("type", "place"), constraints),
+        })
+
+    current_location, current_time = tuple(hotel_stop.get("coords") or (0.0, 0.0)), day_start
+    for slot_key in slots_in_order:
+        slot_window = SLOT_WINDOWS.get(slot_key, (current_time, 24 * 60))
+        order = _order_slot_stops(stops_by_slot[slot_key], current_location, current_time, slot_window, distance_fn)
+        timings, _ = _simulate(order, current_location, current_time, slot_window, distance_fn)
+
+        for stop, (travel_km, travel_time, start, end) in zip(order, timings):
+            scheduled_stop = dict(stop["route_stop"])
+            scheduled_stop.pop("schedule_note", None)
+            scheduled_stop.update({
+                "step": len(scheduled_route),
+                "distance_from_previous_km": round(travel_km, 2),
+                "travel_minutes": travel_time,
+                "visit_minutes": stop["visit_minutes"],
+                "start_time": format_clock(start),
+                "end_time": format_clock(end),
+            })
+            if stop["opening_hours"] and end > stop["opening_hours"][1]:
+                scheduled_stop["schedule_note"] = f"Closes at {format_clock(stop['opening_hours'][1])} before this visit would end."
+            elif end > slot_window[1]:
+                scheduled_stop["schedule_note"] = f"Runs past the usual {slot_key} window (until {format_clock(slot_window[1])})."
+            scheduled_route.append(scheduled_stop)
+            current_location, current_time = stop["coords"], end
+
+    return scheduled_route
@@ -3,39 +3,33 @@ import re
 import json
 import random
 import math # Import math for Haversine
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from services.get_coords import get_place_coords_if_in_da_nang # Added Import
+from services.gazetteer import gazetteer, FOOD_CATEGORIES
+from services.slot_scheduler import schedule_day_route
+from services.planner_catalog import PlannerCatalog
+from services.duration_parser import parse_travel_duration, MAX_TRIP_DAYS
 
 HOTEL_DATA_FILE = "scrapper/data/tripadvisor_da_nang_final_details.json"
 RESTAURANT_DATA_FILE = "scrapper/data/restaurants.json"
 MUST_VISIT_DATA_FILE = "scrapper/data/must.json"
+MAX_STOP_RESOLUTION_WORKERS = int(os.environ.get("PLANNER_STOP_RESOLUTION_WORKERS", 8)) # Bounds concurrent geocoding
+PLANNER_NUM_CANDIDATES = int(os.environ.get("PLANNER_NUM_CANDIDATES", 4)) # Candidate itineraries per planning request
+PLANNER_OBJECTIVES = ("distance", "priority")
+PLANNER_OBJECTIVE = os.environ.get("PLANNER_OBJECTIVE", "distance") # Which candidate wins: lowest km or most priority stops
+# Candidates go to the shared process pool only when there are several workers and at least this much work
+# (candidates x trip days); below it the IPC costs more than it saves. Tune with scripts/benchmark_planner.py --candidates.
+PLANNER_POOL_WORKERS = int(os.environ.get("PLANNER_POOL_WORKERS", os.cpu_count() or 1))
+PLANNER_PARALLEL_MIN_CANDIDATE_DAYS = int(os.environ.get("PLANNER_PARALLEL_MIN_CANDIDATE_DAYS", 28))
 
 # --- Helper functions to load data ---
-def get_location_hotel():
-    """Reads hotel data, selects one randomly, and returns its info."""
-    try:
-        with open(HOTEL_DATA_FILE, "r", encoding='utf-8') as f:
-            hotels = json.load(f)
-        if not hotels:
-            return []
-        selected_hotel = random.choice(hotels)
-        # Convert lat/lon to float
-        lat = float(selected_hotel.get("lat", 0.0))
-        lon = float(selected_hotel.get("lon", 0.0))
-        hotel_name_for_desc = selected_hotel.get("name", "Unknown Hotel")
-        return [{
-            "place": hotel_name_for_desc,
-            "location": (lat, lon),
-            "description": selected_hotel.get("description", f"Accommodation: {hotel_name_for_desc}")
-        }]
-    except FileNotFoundError:
-        print("Error: hotels.json not found.")
-        return []
-    except json.JSONDecodeError:
-        print("Error: Could not decode hotels.json.")
-        return []
-    except Exception as e:
-        print(f"An error occurred in get_location_hotel: {e}")
-        return []
+SCHEDULE_FIELDS = ("opening_hours", "visit_duration_minutes") # Optional per-place fields used by the slot scheduler
+
+def _schedule_fields(record):
+    """Returns the optional scheduling fields present on a raw data record."""
+    return {field: record[field] for field in SCHEDULE_FIELDS if record.get(field)}
 
 def get_restaurants():
     """Reads restaurant data and returns info for all."""
@@ -49,12 +43,14 @@ def get_restaurants():
                 lon = float(r.get("lon", 0.0))
                 name = r.get("name", "Unknown Restaurant") # Get name for fallback description
                 description = r.get("description", f"Enjoy a meal at {name}") # Read description, with a fallback
-                restaurants_list.append({
+                restaurant_entry = {
                     "place": name,
                     "location": (lat, lon),
                     "description": description # Store the description
                     # Add other fields if needed
-                })
+                }
+                restaurant_entry.update(_schedule_fields(r))
+                restaurants_list.append(restaurant_entry)
             except (ValueError, TypeError):
                 print(f"Warning: Skipping restaurant due to invalid coordinates: {r.get('name')}")
                 continue
@@ -85,13 +81,15 @@ def get_must_visit_places():
                 time_str = p.get("time_to_visit", "").lower()
                 times = {t.strip() for t in time_str.split(',') if t.strip()}
                 
-                places_list.append({
+                place_entry = {
                     "place": p.get("name", "Unknown Place"),
                     "location": (lat, lon),
                     "priority": priority,
                     "times": times,
                     "description": description
-                })
+                }
+                place_entry.update(_schedule_fields(p))
+                places_list.append(place_entry)
             except (ValueError, TypeError):
                 print(f"Warning: Skipping place due to invalid coordinates or priority: {p.get('name')}")
                 continue
@@ -106,40 +104,71 @@ def get_must_visit_places():
         print(f"An error occurred in get_must_visit_places: {e}")
         return []
 
+def get_hotels():
+    """Reads hotel data and returns info for all hotels with usable coordinates."""
+    try:
+        with open(HOTEL_DATA_FILE, "r", encoding='utf-8') as f:
+            hotels_data = json.load(f)
+        hotels_list = []
+        for h in hotels_data:
+            try:
+                lat = float(h.get("lat", 0.0))
+                lon = float(h.get("lon", 0.0))
+            except (ValueError, TypeError):
+                print(f"Warning: Skipping hotel due to invalid coordinates: {h.get('name')}")
+                continue
+            hotel_name = h.get("name", "Unknown Hotel")
+            hotels_list.append({
+                "place": hotel_name,
+                "location": (lat, lon),
+                "description": h.get("description", f"Accommodation: {hotel_name}")
+            })
+        return hotels_list
+    except FileNotFoundError:
+        print("Error: hotels.json not found.")
+        return []
+    except json.JSONDecodeError:
+        print("Error: Could not decode hotels.json.")
+        return []
+    except Exception as e:
+        print(f"An error occurred in get_hotels: {e}")
+        return []
+
+# --- Shared planner catalog ---
+_planner_catalog = None
+_planner_catalog_key = None
+_planner_catalog_lock = threading.Lock()
+
+def _data_files_signature():
+    signature = []
+    for path in (MUST_VISIT_DATA_FILE, RESTAURANT_DATA_FILE, HOTEL_DATA_FILE):
+        try:
+            signature.append((path, os.path.getmtime(path)))
+        except OSError:
+            signature.append((path, None))
+    return tuple(signature)
+
+def get_planner_catalog():
+    """
+    Returns the PlannerCatalog built from the data files, rebuilding it only when a file changes.
+    Saves re-reading and re-bucketing every dataset on each planning request.
+    """
+    global _planner_catalog, _planner_catalog_key
+    signature = _data_files_signature()
+    with _planner_catalog_lock:
+        if _planner_catalog is None or _planner_catalog_key != signature:
+            _planner_catalog = PlannerCatalog(get_must_visit_places(), get_restaurants(), get_hotels())
+            _planner_catalog_key = signature
+        return _planner_catalog
+
 # Get detail adress from web searchsearch
 
 
 def process_travel_duration(travel_duration):
+    """Returns the trip length in days for an int or free-text duration, or None if it cannot be read."""
     if type(travel_duration) == int:
-      return travel_duration
-    else:
-      input_str = travel_duration.lower()
-      days = 0
-
-      match = re.match(r"(\d+)\s*ngày\s*(\d+)?\s*đêm?", input_str)
-      if match:
-          days = int(match.group(1))
-          return days
-
-      match = re.match(r"(\d+)\s*days?\s*(\d+)?\s*nights?", input_str)
-      if match:
-          days = int(match.group(1))
-          return days
-
-      match = re.match(r"(\d+)\s*ngày?", input_str)
-      if match:
-          days = int(match.group(1))
-          return days
-
-      match = re.match(r"(\d+)\s*days?", input_str)
-      if match:
-          days = int(match.group(1))
-          return days
-
-      match = re.match(r"(\d+)\s*weeks?", input_str)
-      if match:
-          days = int(match.group(1)) * 7
-          return days
+      return travel_duration if 0 < travel_duration <= MAX_TRIP_DAYS else None
+    return parse_travel_duration(travel_duration)
 
 # --- Distance Calculation ---
 
@@ -173,77 +202,10 @@ def euclidean(point1, point2):
     """Calculate the Euclidean distance between two points."""
     return np.sqrt(np.sum((np.array(point1) - np.array(point2)) ** 2))
 
-# --- Place/Restaurant Selection Helpers ---
-def select_places(places_list, time_of_day, count=1, already_selected_names_lower=None):
-    """Selects places based on time_of_day, biasing towards priority 1, ensuring uniqueness (case-insensitive)."""
-    if already_selected_names_lower is None:
-        already_selected_names_lower = set()
-
-    # Filter by time_of_day and names not already selected (case-insensitive)
-    eligible_places = [
-        p for p in places_list 
-        if time_of_day in p.get('times', set()) and p.get('place', '').lower() not in already_selected_names_lower
-    ]
-    
-    if not eligible_places:
-        return []
-
-    # --- Weighted Selection Logic for DISTINCT items --- 
-    priority_weight = 3 # Higher chance for priority 1
-    other_weight = 1    # Lower chance for others
-
-    num_available = len(eligible_places)
-    num_to_select = min(count, num_available)
-    
-    if num_to_select == 0:
-        return []
-
-    selected_details = []
-    # Create a temporary list of eligible places for iterative selection
-    # This copy is needed so we can remove items from it
-    current_eligible_for_sampling = list(eligible_places) 
-    
-    for _ in range(num_to_select):
-        if not current_eligible_for_sampling:
-            break # No more unique items to select
-
-        # Calculate weights for the *currently available* items for this iteration
-        current_weights = [priority_weight if p.get('priority') == 1 else other_weight for p in current_eligible_for_sampling]
-        
-        if not current_weights: # Should not happen if current_eligible_for_sampling is not empty
-            break
-
-        # Perform a single weighted choice
-        chosen_item = random.choices(current_eligible_for_sampling, weights=current_weights, k=1)[0]
-        selected_details.append(chosen_item)
-        
-        # Remove the chosen item from the list for subsequent selections to ensure uniqueness
-        # This works because chosen_item is a reference to an element in current_eligible_for_sampling
-        current_eligible_for_sampling.remove(chosen_item)
-
-    return selected_details
-
-def select_restaurants(restaurants_list, count=1, already_selected_names_lower=None):
-    """Selects random restaurants, ensuring uniqueness (case-insensitive)."""
-    if already_selected_names_lower is None:
-        already_selected_names_lower = set()
-
-    # Filter out restaurants already selected (case-insensitive)
-    eligible_restaurants = [
-        r for r in restaurants_list 
-        if r.get('place', '').lower() not in already_selected_names_lower
-    ]
-
-    if not eligible_restaurants or count <= 0:
-        return []
-        
-    actual_count = min(count, len(eligible_restaurants))
-    return random.sample(eligible_restaurants, actual_count)
-
 # --- Helper for User Specified Stops ---
 def find_or_create_place_details(stop_spec, must_visit_places_list, all_restaurants_list):
     """
-    Tries to find the specified place in must_visit_places or restaurants.
+    Tries to find the specified place in must_visit_places or restaurants, then in the local gazetteer.
     If not found, uses get_place_coords_if_in_da_nang to verify and get details.
     stop_spec is a dict like {'name': ..., 'day': ..., 'time_of_day': ..., 'address': ..., 'location': (lat,lon) or None, 'original_description': ..., 'original_type': ...}
     The 'location' field in stop_spec is (lat, lon) if present and pre-verified.
@@ -295,16 +257,32 @@ def find_or_create_place_details(stop_spec, must_visit_places_list, all_restaura
                     "priority": stop_spec.get('priority', 0),  # Preserve priority if passed, else default for custom
                     "times": {time_of_day} if time_of_day else set(),
                     "description": description_to_use,
-                    "type": original_type if original_type else "custom_pre_geocoded"
+                    "type": original_type if original_type else "custom_pre_geocoded",
+                    **_schedule_fields(stop_spec)
                 }
             else:
                 print(f"Warning: Pre-specified coordinates for '{place_name}' ({stop_spec['location']}) are out of valid range. Will attempt geocoding via API.")
         except (TypeError, ValueError):
             print(f"Warning: Invalid format for pre-specified coordinates for '{place_name}': {stop_spec['location']}. Will attempt geocoding via API.")
 
+    # Check the wider local datasets (combined_data, hotels) with folded/fuzzy matching before any API call
+    local_match = gazetteer.lookup(place_name, address=stop_spec.get('address'))
+    if local_match:
+        print(f"Matched '{place_name}' to local {local_match['match']} entry '{local_match['name']}' from {local_match['source_file']}.")
+        default_type = "restaurant" if local_match['category'] in FOOD_CATEGORIES else "custom_verified"
+        return {
+            "place": local_match['name'],
+            "location": local_match['location'],
+            "priority": stop_spec.get('priority', 0),
+            "times": {time_of_day} if time_of_day else set(),
+            "description": original_description or local_match['description'] or f"User-specified visit: {local_match['name']}",
+            "type": original_type if original_type else default_type,
+            **_schedule_fields(local_match)
+        }
+
     # If not found in local data AND no valid pre-specified coords, try to geocode using get_coords service
     print(f"Place '{place_name}' not found in local data or pre-specified coords were invalid. Attempting to verify with Google Maps API via get_coords...")
-    verified_place_data = get_place_coords_if_in_da_nang(place_name) 
+    verified_place_data = get_place_coords_if_in_da_nang(place_name, address=stop_spec.get('address'))
 
     if verified_place_data and isinstance(verified_place_data.get('location'), (list, tuple)):
         print(f"Successfully verified and geocoded '{place_name}' in Da Nang: {verified_place_data['location']}")
@@ -321,12 +299,49 @@ def find_or_create_place_details(stop_spec, must_visit_places_list, all_restaura
         return {"error": "not_in_da_nang", "name": place_name, "address": stop_spec.get('address')}
 
 
-def optimize_distance_tour(travel_duration_str, user_specified_stops_for_modification=None, previous_base_plan_data=None):
+def resolve_stop_details_concurrently(stop_specs, must_visit_places_list, all_restaurants_list, max_workers=MAX_STOP_RESOLUTION_WORKERS):
+    """
+    Resolves user stop specs to place details in parallel.
+    Specs are de-duplicated by lower-cased name, so each distinct place is looked up once,
+    and lookups that need geocoding overlap their network round trips.
+    Returns a dict mapping the lower-cased name to the find_or_create_place_details result.
+    """
+    unique_specs = {}
+    for spec in stop_specs or []:
+        if isinstance(spec, dict) and isinstance(spec.get('name'), str) and spec['name']:
+            unique_specs.setdefault(spec['name'].lower(), spec)
+
+    if not unique_specs:
+        return {}
+
+    num_workers = max(1, min(max_workers, len(unique_specs)))
+    if num_workers == 1:
+        return {key: find_or_create_place_details(spec, must_visit_places_list, all_restaurants_list) for key, spec in unique_specs.items()}
+
+    print(f"Resolving {len(unique_specs)} distinct stop(s) with {num_workers} worker(s)...")
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        futures = {
+            key: executor.submit(find_or_create_place_details, spec, must_visit_places_list, all_restaurants_list)
+            for key, spec in unique_specs.items()
+        }
+        return {key: future.result() for key, future in futures.items()}
+
+
+def optimize_distance_tour(travel_duration_str, user_specified_stops_for_modification=None, previous_base_plan_data=None, seed=None, catalog=None):
     travel_duration_days = process_travel_duration(travel_duration_str)
     if travel_duration_days is None or travel_duration_days <= 0:
         return {"plan": None, "message": "Invalid travel duration provided."}
 
+    # All random choices come from one seeded generator; the seed is returned with the plan
+    # so the same itinerary can be regenerated exactly.
+    if seed is None:
+        seed = random.randrange(2**32)
+    rng = random.Random(seed)
+    # Injectable so callers (e.g. benchmarks) can plan against their own datasets.
+    catalog = catalog or get_planner_catalog()
+
     # --- Caching for find_or_create_place_details ---
+    # Per-call memo; geocoding results are additionally persisted across calls by services.geocode_cache.
     place_details_cache = {}
 
     def get_cached_place_details(spec, must_visit_list, restaurant_list):
@@ -342,7 +357,7 @@ def optimize_distance_tour(travel_duration_str, user_specified_stops_for_modific
     # --- End Caching ---
 
     # --- 1. Load Data & Hotel Setup ---
-    location_hotel_list = get_location_hotel()
+    location_hotel_list = catalog.pick_hotel(rng)
     if not location_hotel_list:
         return {"plan": None, "message": "Itinerary generation failed: No hotel data could be loaded."}
     
@@ -365,19 +380,23 @@ def optimize_distance_tour(travel_duration_str, user_specified_stops_for_modific
             print("Warning: Previous hotel data incomplete. Selecting a new one.")
     
     if not hotel_coords: # If no previous hotel or previous hotel data was bad
-        selected_hotel_info = location_hotel_list[0] # get_location_hotel already randomizes if multiple
+        selected_hotel_info = location_hotel_list[0] # pick_hotel already randomizes if multiple
         hotel_name = selected_hotel_info["place"]
         hotel_coords = tuple(selected_hotel_info["location"]) # Ensure it's a tuple
         hotel_description = selected_hotel_info.get("description", f"Accommodation: {hotel_name}")
         print(f"Selected New Hotel: {hotel_name} at {hotel_coords}")
 
 
-    must_visit_places = get_must_visit_places()
-    restaurants = get_restaurants()
+    must_visit_places = catalog.must_visit_places
+    restaurants = catalog.restaurants
 
     modification_stops_map = {}
     # Before building the plan, validate all user_specified_stops
     if user_specified_stops_for_modification:
+        # Resolve every distinct stop up front and concurrently; the loop below then reads from the cache.
+        place_details_cache.update(
+            resolve_stop_details_concurrently(user_specified_stops_for_modification, must_visit_places, restaurants)
+        )
         for stop_item_spec_idx, stop_item_spec in enumerate(user_specified_stops_for_modification):
             if not isinstance(stop_item_spec, dict):
                 print(f"Warning: Invalid stop specification at index {stop_item_spec_idx}: {stop_item_spec}. Skipping.")
@@ -410,11 +429,12 @@ def optimize_distance_tour(travel_duration_str, user_specified_stops_for_modific
                 continue
 
 
-    selected_places_ever = set() 
+    selected_places_ever = catalog.new_selection() # Set-like; also masks used names out of the sampling pools
 
     itinerary_result = {
         "hotel": {"name": hotel_name, "coords": list(hotel_coords), "description": hotel_description},
-        "daily_plans": []
+        "daily_plans": [],
+        "seed": seed
     }
     
     NUM_CANDIDATES_PLACE = 3       
@@ -434,6 +454,7 @@ def optimize_distance_tour(travel_duration_str, user_specified_stops_for_modific
         
         current_location_for_day = hotel_coords 
         step_counter = 0
+        day_stop_constraints = {} # name_lower -> opening hours / visit duration for the slot scheduler
 
         day_data["route"].append({
             "step": step_counter,
@@ -531,12 +552,12 @@ def optimize_distance_tour(travel_duration_str, user_specified_stops_for_modific
                 candidate_pool = []
 
                 if time_slot_lower == 'lunch' or time_slot_lower == 'dinner':
-                    candidate_pool = select_restaurants(restaurants, NUM_CANDIDATES_RESTAURANT, selected_places_ever)
+                    candidate_pool = catalog.sample_restaurants(NUM_CANDIDATES_RESTAURANT, selected_places_ever, rng)
                 elif time_slot_lower == 'evening':
-                    num_stops_to_pick = random.randint(1, MAX_EVENING_STOPS) 
-                    candidate_pool = select_places(must_visit_places, time_slot_lower, NUM_CANDIDATES_EVENING, selected_places_ever)
+                    num_stops_to_pick = rng.randint(1, MAX_EVENING_STOPS) 
+                    candidate_pool = catalog.sample_places(time_slot_lower, NUM_CANDIDATES_EVENING, selected_places_ever, rng)
                 else: # Morning, Afternoon
-                    candidate_pool = select_places(must_visit_places, time_slot_lower, NUM_CANDIDATES_PLACE, selected_places_ever)
+                    candidate_pool = catalog.sample_places(time_slot_lower, NUM_CANDIDATES_PLACE, selected_places_ever, rng)
                 
                 # Log candidate pool for debugging auto-selection
                 # print(f"DEBUG:   Fetched {len(candidate_pool)} candidates for {time_slot_capitalized} ({num_stops_to_pick} stop(s) to pick): {[c.get('place') for c in candidate_pool]}")
@@ -549,7 +570,7 @@ def optimize_distance_tour(travel_duration_str, user_specified_stops_for_modific
                         break
                     best_candidate_for_stop = None
                     if time_slot_lower == 'morning': # Random for morning
-                        best_candidate_for_stop = random.choice(candidate_pool)
+                        best_candidate_for_stop = rng.choice(candidate_pool)
                     else: # Greedy distance-based for others
                         min_dist = float('inf')
                         ref_loc = temp_current_loc_for_multi_stop_slot if i > 0 and chosen_stops_details_for_slot else current_location_for_day
@@ -606,6 +627,15 @@ def optimize_distance_tour(travel_duration_str, user_specified_stops_for_modific
                 day_data["route"].append(route_stop_data)
                 day_data["planned_stops"][time_slot_capitalized].append(stop_name)
                 current_location_for_day = stop_coords 
+                if isinstance(stop_detail, dict):
+                    day_stop_constraints[stop_name.lower()] = _schedule_fields(stop_detail)
+
+        # Order stops within each slot and assign start/end times from visit durations,
+        # opening hours and distance-derived travel time.
+        day_data["route"] = schedule_day_route(day_data["route"], haversine, day_stop_constraints)
+        day_data["planned_stops"] = {slot_name: [] for slot_name in day_data["planned_stops"]}
+        for route_stop in day_data["route"][1:]:
+            day_data["planned_stops"].setdefault(route_stop["time_slot"], []).append(route_stop["name"])
 
         itinerary_result["daily_plans"].append(day_data)
     
@@ -618,6 +648,130 @@ def optimize_distance_tour(travel_duration_str, user_specified_stops_for_modific
     return {"plan": itinerary_result, "message": success_message}
 
 
+# --- Seeded candidate search ---
+def score_itinerary(plan, priority_place_names_lower=None):
+    """
+    Scores a generated plan for candidate comparison.
+    Returns total route distance in km and the number of priority-1 must-visit stops it contains.
+    """
+    priority_place_names_lower = priority_place_names_lower or set()
+    total_distance_km = 0.0
+    priority_stops = 0
+    for day_plan in plan.get("daily_plans", []):
+        for route_stop in day_plan.get("route", []):
+            total_distance_km += route_stop.get("distance_from_previous_km", 0.0)
+            if str(route_stop.get("name", "")).lower() in priority_place_names_lower:
+                priority_stops += 1
+    return {"total_distance_km": round(total_distance_km, 2), "priority_stops": priority_stops}
+
+
+_candidate_pool = None
+_candidate_pool_lock = threading.Lock()
+
+def get_candidate_pool():
+    """The planning process pool, created on first use and shared by every request (workers keep their catalog)."""
+    global _candidate_pool
+    with _candidate_pool_lock:
+        if _candidate_pool is None:
+            _candidate_pool = ProcessPoolExecutor(max_workers=PLANNER_POOL_WORKERS)
+        return _candidate_pool
+
+def _discard_candidate_pool(pool):
+    """Drops a broken pool so the next request starts a fresh one."""
+    global _candidate_pool
+    with _candidate_pool_lock:
+        if _candidate_pool is pool:
+            _candidate_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def use_candidate_pool(num_candidates, travel_days):
+    return PLANNER_POOL_WORKERS > 1 and num_candidates * (travel_days or 1) >= PLANNER_PARALLEL_MIN_CANDIDATE_DAYS
+
+
+def _plan_candidate(candidate_args):
+    """Process-pool worker: builds one seeded itinerary. Must stay module-level to be picklable."""
+    travel_duration_str, stop_specs, previous_base_plan_data, seed = candidate_args
+    return optimize_distance_tour(travel_duration_str, stop_specs, previous_base_plan_data, seed=seed)
+
+
+def _candidate_sort_key(candidate, objective):
+    score = candidate["score"]
+    if objective == "priority":
+        return (-score["priority_stops"], score["total_distance_km"])
+    return (score["total_distance_km"], -score["priority_stops"])
+
+
+def plan_best_itinerary(travel_duration_str, user_specified_stops_for_modification=None, previous_base_plan_data=None,
+                        seed=None, num_candidates=PLANNER_NUM_CANDIDATES, objective=PLANNER_OBJECTIVE):
+    """
+    Generates several seeded candidate itineraries and returns the best one. Large requests run the
+    candidates on the shared process pool; small ones (see use_candidate_pool) run them in-process.
+
+    objective is 'distance' (lowest total km) or 'priority' (most priority-1 must-visit stops).
+    Candidate seeds are derived from seed, so the same seed always yields the same winner;
+    the winning plan carries its own 'seed', and optimize_distance_tour(..., seed=plan['seed'])
+    regenerates it exactly.
+    """
+    if objective not in PLANNER_OBJECTIVES:
+        print(f"Warning: Unknown planner objective '{objective}'. Using 'distance'.")
+        objective = "distance"
+    if seed is None:
+        seed = random.randrange(2**32)
+    if num_candidates <= 1:
+        return optimize_distance_tour(travel_duration_str, user_specified_stops_for_modification, previous_base_plan_data, seed=seed)
+
+    catalog = get_planner_catalog()
+    must_visit_places = catalog.must_visit_places
+    restaurants = catalog.restaurants
+
+    # Resolve user stops once here so the workers never geocode; their coordinates, description and
+    # type are injected into the specs, which find_or_create_place_details then reuses as-is.
+    resolved_specs = []
+    if user_specified_stops_for_modification:
+        resolved = resolve_stop_details_concurrently(user_specified_stops_for_modification, must_visit_places, restaurants)
+        if any(isinstance(detail, dict) and detail.get("error") for detail in resolved.values()):
+            # Let a single run produce the usual validation message.
+            return optimize_distance_tour(travel_duration_str, user_specified_stops_for_modification, previous_base_plan_data, seed=seed)
+        for spec in user_specified_stops_for_modification:
+            spec = dict(spec)
+            detail = resolved.get(spec.get('name', '').lower()) if isinstance(spec.get('name'), str) else None
+            if detail and detail.get('location'):
+                spec.setdefault('location', tuple(detail['location']))
+                spec.setdefault('original_description', detail.get('description'))
+                spec.setdefault('original_type', detail.get('type'))
+                for field, value in _schedule_fields(detail).items():
+                    spec.setdefault(field, value)
+            resolved_specs.append(spec)
+
+    seed_rng = random.Random(seed)
+    candidate_seeds = [seed_rng.randrange(2**32) for _ in range(num_candidates)]
+    candidate_args = [(travel_duration_str, resolved_specs, previous_base_plan_data, s) for s in candidate_seeds]
+
+    results = None
+    if use_candidate_pool(num_candidates, process_travel_duration(travel_duration_str)):
+        pool = get_candidate_pool()
+        try:
+            results = list(pool.map(_plan_candidate, candidate_args))
+        except Exception as e:
+            print(f"Warning: Parallel candidate planning failed ({e}). Generating candidates in-process.")
+            _discard_candidate_pool(pool)
+    if results is None:
+        results = [_plan_candidate(args) for args in candidate_args]
+
+    priority_names = {p['place'].lower() for p in must_visit_places if p.get('priority') == 1}
+    candidates = [
+        {"result": result, "score": score_itinerary(result["plan"], priority_names)}
+        for result in results if result.get("plan") is not None
+    ]
+    if not candidates:
+        return results[0]
+
+    best = min(candidates, key=lambda c: _candidate_sort_key(c, objective))
+    print(f"Selected candidate seed {best['result']['plan']['seed']} out of {len(results)} "
+          f"(objective={objective}, score={best['score']}).")
+    return best["result"]
+
+
 # --- Test function ---
 def test_optimize_distance_tour():
     print("Testing itinerary generation for '3 days 2 nights'...")
@@ -0,0 +1,167 @@
+"""
+Tests for scrapper/fetch_layer.py against saved HTML fixtures (testing/fixtures/fetch_layer).
+No network or browser is used: HTTP responses come from a fake fetcher serving the fixture files.
+
+Run with pytest, or directly: python testing/test_fetch_layer.py
+"""
+import os
+import sys
+import time
+
+TESTING_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(os.path.dirname(TESTING_DIR), "scrapper"))
+
+from fetch_layer import FetchLayer, HttpFetcher, extract_hotel, extract_place, json_ld_nodes, parse_page
+
+FIXTURES_DIR = os.path.join(TESTING_DIR, "fixtures", "fetch_layer")
+HOTEL_URL = "https://www.tripadvisor.com/Hotel_Review-g298085-d7171460-Reviews-Fusion_Suites_Da_Nang-Da_Nang.html"
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+
+class FakeFetcher:
+    """Stands in for HttpFetcher: serves (status, fixture html) per URL and counts requests."""
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.requests = []
+
+    def get(self, url):
+        self.requests.append(url)
+        status, fixture = self.responses[url]
+        return status, load_fixture(fixture) if fixture else None
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, url):
+        self.calls.append(url)
+        return {"name": "From browser", "address": "Rendered address", "url": url}
+
+
+def test_extract_hotel_from_json_ld():
+    hotel = extract_hotel(load_fixture("tripadvisor_hotel_jsonld.html"), HOTEL_URL)
+    assert hotel == {
+        "name": "Fusion Suites Da Nang",
+        "price": "$72 - $118 (Based on Average Rates for a Standard Room)",
+        "rating": "4.5",
+        "rating_count": 2315,
+        "address": "Vo Nguyen Giap Street, Phuoc My Ward, Son Tra District, Da Nang, 550000, Vietnam",
+        "description": "Fusion Suites Da Nang sits on Vo Nguyen Giap street facing My Khe beach. Every suite has a kitchenette & sea view.",
+        "url": HOTEL_URL,
+        "lat": 16.0604,
+        "lon": 108.2465,
+    }
+
+
+def test_extract_hotel_without_embedded_data():
+    assert extract_hotel(load_fixture("tripadvisor_hotel_js_only.html"), HOTEL_URL) is None
+
+
+def test_extract_place_from_json_ld_list():
+    # The second JSON-LD block is invalid JSON and must be skipped, not fail the page
+    place = extract_place(load_fixture("place_restaurant_jsonld.html"), "https://example.com/banh-xeo")
+    assert place == {
+        "name": "Bánh Xèo Bà Dưỡng",
+        "rating": "4.4",
+        "list_rating": "5120",
+        "description": "Quán bánh xèo nổi tiếng trong hẻm K280 Hoàng Diệu.",
+        "address": "K280/23 Hoàng Diệu, Hải Châu, Đà Nẵng",
+        "phone": "0236 3873 168",
+        "lat": 16.0575,
+        "lon": 108.2183,
+    }
+
+
+def test_page_parser_collects_meta_title_and_graph_nodes():
+    page = parse_page(load_fixture("tripadvisor_hotel_jsonld.html"))
+    assert page.title.startswith("FUSION SUITES DA NANG")
+    assert page.h1 == "Fusion Suites Da Nang"
+    assert page.meta["og:description"] == "Beachfront suites on My Khe beach with a rooftop pool."
+    types = [node.get("@type") for node in json_ld_nodes(page.json_ld)]
+    assert types == ["BreadcrumbList", "WebPage", "LodgingBusiness"]
+
+
+def test_fetch_uses_http_when_page_has_data():
+    browser = FakeBrowser()
+    layer = FetchLayer(extract_hotel, required_fields=("name", "address"),
+                       http_fetcher=FakeFetcher({HOTEL_URL: (200, "tripadvisor_hotel_jsonld.html")}))
+    record, source = layer.fetch(HOTEL_URL, browser)
+    assert source == "http"
+    assert record["name"] == "Fusion Suites Da Nang"
+    assert browser.calls == []
+    assert layer.stats()["http"] == 1 and layer.stats()["browser"] == 0
+
+
+def test_fetch_falls_back_to_browser():
+    responses = {
+        "https://a.example/js-only": (200, "tripadvisor_hotel_js_only.html"),
+        "https://a.example/challenge": (200, "bot_challenge.html"),
+        "https://a.example/blocked": (403, "bot_challenge.html"),
+        "https://a.example/down": (None, None),
+    }
+    browser = FakeBrowser()
+    layer = FetchLayer(extract_hotel, required_fields=("name", "address"), http_fetcher=FakeFetcher(responses))
+    for url in responses:
+        record, source = layer.fetch(url, browser)
+        assert source == "browser" and record["name"] == "From browser"
+    assert browser.calls == list(responses)
+    assert layer.fetch("https://a.example/js-only") == (None, None) # No browser to fall back to
+
+
+def test_http_disabled_for_host_after_repeated_misses():
+    url = "https://blocked.example/hotel"
+    fetcher = FakeFetcher({url: (429, None)})
+    layer = FetchLayer(extract_hotel, http_fetcher=fetcher, max_http_failures=2)
+    browser = FakeBrowser()
+    for _ in range(4):
+        layer.fetch(url, browser)
+    assert len(fetcher.requests) == 2
+    assert len(browser.calls) == 4
+    assert layer.stats()["http_skipped"] == 2
+
+
+def test_incomplete_record_is_not_accepted():
+    # A hotel node without an address is not enough when the address is required
+    html = '<script type="application/ld+json">{"@type": "Hotel", "name": "Only a name"}</script>'
+    assert extract_hotel(html, HOTEL_URL)["address"] == "N/A"
+    layer = FetchLayer(lambda page, url: extract_hotel(html, url), required_fields=("name", "address"),
+                       http_fetcher=FakeFetcher({HOTEL_URL: (200, "tripadvisor_hotel_js_only.html")}))
+    assert layer.fetch(HOTEL_URL, FakeBrowser())[1] == "browser"
+
+
+def test_http_fetcher_spaces_requests_to_the_same_host():
+    fetcher = HttpFetcher(min_host_interval=0.05)
+    start = time.monotonic()
+    for _ in range(3):
+        fetcher._throttle("same.example")
+    fetcher._throttle("other.example")
+    assert time.monotonic() - start >= 0.1
+
+
+def test_http_extraction_is_fast():
+    # The point of the HTTP path: parsing a saved detail page takes milliseconds, not seconds of rendering
+    html = load_fixture("tripadvisor_hotel_jsonld.html")
+    start = time.perf_counter()
+    for _ in range(100):
+        extract_hotel(html, HOTEL_URL)
+    assert (time.perf_counter() - start) / 100 < 0.01
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_") and callable(value)]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"✗ {test.__name__}: {e}")
+    print(f"\n{len(tests) - failed}/{len(tests)} passed")
+    sys.exit(1 if failed else 0)